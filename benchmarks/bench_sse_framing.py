@@ -0,0 +1,103 @@
+"""
+Microbenchmark: handler result -> hermod zero mq frame.
+
+Compares the previous serialisation path of OdinWorkerSession (model_dump -> JSONRPCResponse ->
+model_dump_json -> SSE string -> json.dumps of the GRIP item -> encode) with the byte level path in
+odinmcp.hermod.framing, for tool results of increasing size.
+
+    python benchmarks/bench_sse_framing.py [--json]
+"""
+import argparse
+import json
+import sys
+import timeit
+
+from mcp.types import CallToolResult, JSONRPCMessage, JSONRPCResponse, ServerResult, TextContent
+
+from odinmcp.hermod.framing import encode_http_stream_content, encode_jsonrpc_result, encode_sse_event
+
+
+CHANNEL = "channel-" + "x" * 200
+EVENT_ID = "1718000000000-0"
+SIZES = {
+    "small": 256,
+    "medium": 64 * 1024,
+    "large": 1024 * 1024,
+    "huge": 8 * 1024 * 1024,
+}
+
+
+def make_result(size: int) -> ServerResult:
+    # quotes, newlines and backslashes are what make the double escaping expensive
+    chunk = 'line with "quotes", \\backslashes\\ and unicode é\n'
+    text = (chunk * (size // len(chunk) + 1))[:size]
+    return ServerResult(CallToolResult(content=[TextContent(type="text", text=text)]))
+
+
+def legacy_frame(result: ServerResult) -> list:
+    jsonrpc_response = JSONRPCResponse(
+        jsonrpc="2.0",
+        id=1,
+        result=result.model_dump(by_alias=True, mode="json", exclude_none=True),
+    )
+    message = JSONRPCMessage(jsonrpc_response)
+    content = f"id: {EVENT_ID}\nevent: message\ndata: " + message.model_dump_json(by_alias=True, exclude_none=True)
+    item = {
+        "channel": CHANNEL,
+        "formats": {
+            "http-stream": {
+                "content": content + "\n\n"
+            }
+        }
+    }
+    return [CHANNEL.encode(), ("J" + json.dumps(item)).encode()]
+
+
+def byte_frame(result: ServerResult) -> list:
+    data = encode_jsonrpc_result(1, result)
+    return [CHANNEL.encode(), encode_http_stream_content(CHANNEL.encode(), [encode_sse_event(data, EVENT_ID)])]
+
+
+def bench(fn, result, repeat: int = 5) -> float:
+    number = 1
+    # scale the loop so every measurement runs for a reasonable time
+    while timeit.timeit(lambda: fn(result), number=number) < 0.05:
+        number *= 2
+    best = min(timeit.repeat(lambda: fn(result), number=number, repeat=repeat))
+    return best / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    args = parser.parse_args()
+
+    results = {}
+    for name, size in SIZES.items():
+        result = make_result(size)
+        legacy = bench(legacy_frame, result)
+        current = bench(byte_frame, result)
+        results[name] = {
+            "payload_bytes": size,
+            "legacy_us": legacy * 1e6,
+            "bytes_us": current * 1e6,
+            "speedup": legacy / current,
+            "legacy_frame_bytes": len(legacy_frame(result)[1]),
+            "bytes_frame_bytes": len(byte_frame(result)[1]),
+        }
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+
+    print(f"{'payload':>10} {'bytes':>10} {'legacy us':>12} {'bytes us':>12} {'speedup':>8}")
+    for name, row in results.items():
+        print(
+            f"{name:>10} {row['payload_bytes']:>10} {row['legacy_us']:>12.1f} "
+            f"{row['bytes_us']:>12.1f} {row['speedup']:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Startup cost per entry point, from `python -X importtime`.
+
+Every entry point is imported in a fresh interpreter, `--repeat` times. Reports the median total
+import time (interpreter startup included), the median wall time of the whole process and the
+slowest top level imports it pulls in.
+
+    cli       odinmcp --help, setup_asgard, profiles
+    config    settings only (odinmcp.config)
+    web       the web tier (odinmcp.web)
+    worker    the worker (odinmcp.worker)
+    app       a user app module (from odinmcp import OdinMCP)
+
+    python benchmarks/importtime.py [--repeat 5] [--top 8] [--json]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+
+ENTRY_POINTS = {
+    "cli": "import odinmcp.cli",
+    "config": "import odinmcp.config",
+    "web": "import odinmcp.web",
+    "worker": "import odinmcp.worker",
+    "app": "from odinmcp import OdinMCP",
+}
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self us, cumulative us, depth) for every `import time:` line"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def measure(statement: str) -> Dict[str, object]:
+    started_at = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = time.perf_counter() - started_at
+    rows = parse_importtime(process.stderr)
+    # top level imports are the direct children of the interpreter (depth 1 in the output).
+    # parent packages are imported before the module itself, so only their sum is the full cost
+    top_level = sorted(
+        ((name, cumulative_us) for name, _, cumulative_us, depth in rows if depth == 1),
+        key=lambda row: row[1],
+        reverse=True,
+    )
+    return {
+        "import_ms": sum(cumulative_us for _, cumulative_us in top_level) / 1000,
+        "wall_ms": wall * 1000,
+        "modules": len(rows),
+        "top_level": top_level,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per entry point")
+    parser.add_argument("--top", type=int, default=8, help="slowest top level imports to report")
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    parser.add_argument("entry_points", nargs="*", default=list(ENTRY_POINTS), help="entry points to measure")
+    args = parser.parse_args()
+
+    results = {}
+    for entry_point in args.entry_points:
+        statement = ENTRY_POINTS[entry_point]
+        runs = [measure(statement) for _ in range(args.repeat)]
+        results[entry_point] = {
+            "statement": statement,
+            "import_ms": statistics.median(run["import_ms"] for run in runs),
+            "wall_ms": statistics.median(run["wall_ms"] for run in runs),
+            "modules": runs[-1]["modules"],
+            "slowest_imports": [
+                {"module": name, "ms": cumulative_us / 1000} for name, cumulative_us in runs[-1]["top_level"][:args.top]
+            ],
+        }
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+
+    print(f"{'entry':>8} {'import ms':>10} {'wall ms':>10} {'modules':>8}  slowest imports")
+    for entry_point, row in results.items():
+        slowest = ", ".join(f"{item['module']} {item['ms']:.0f}" for item in row["slowest_imports"][:3])
+        print(f"{entry_point:>8} {row['import_ms']:>10.1f} {row['wall_ms']:>10.1f} {row['modules']:>8}  {slowest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""
+End to end load test: simulated MCP clients -> web app -> celery -> worker -> hermod.
+
+Everything runs in one process:
+- The Starlette app from OdinMCP.sse_app() is driven through httpx's ASGI transport.
+- Celery uses the in-memory broker and result backend.
+- Workers run on threads (celery.contrib.testing).
+- A zero mq XSUB socket stands in for pushpin. It decodes the published GRIP items and hands
+  every SSE frame to the client owning the channel.
+
+Each client runs initialize once, then a loop of tools/call. A share of the calls make a
+sampling round trip: the client answers the server's sampling/createMessage request. A share
+of the iterations also send a notification. End to end latency is measured from the POST to
+the SSE frame carrying the matching response.
+
+    python benchmarks/loadtest.py [--clients 20] [--calls 50] [--redis none|memory|redis://...] [--output result.json]
+
+Redis backed features (event log, liveness, cancellation bookkeeping) are off with `--redis none`.
+`--redis memory` needs fakeredis. Results are printed (or written) as JSON.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import zmq
+
+from odinmcp.config import settings
+
+
+HERMOD_URL = "tcp://127.0.0.1:15670"
+ACCEPT = "application/json, text/event-stream"
+
+
+def configure(args: argparse.Namespace) -> None:
+    # settings are read when the worker and publisher are built, so configure before importing the app
+    settings.celery_broker = "memory://"
+    settings.celery_backend = "cache+memory://"
+    settings.hermod_zero_mq_urls = [args.hermod_url]
+    if args.redis == "none":
+        settings.hermod_event_log_enabled = False
+        settings.channel_liveness_enabled = False
+        settings.cancellation_enabled = False
+        settings.session_store_enabled = False
+        settings.idempotency_enabled = False
+    elif args.redis == "memory":
+        try:
+            import fakeredis
+        except ImportError:
+            sys.exit("--redis memory needs fakeredis (pip install fakeredis)")
+        from odinmcp.store import set_redis
+        set_redis(fakeredis.FakeRedis())
+    else:
+        settings.redis_url = args.redis
+
+
+def parse_tnetstring(data: bytes, offset: int = 0) -> Tuple[Any, int]:
+    colon = data.index(b":", offset)
+    length = int(data[offset:colon])
+    start = colon + 1
+    end = start + length
+    kind = data[end:end + 1]
+    payload = data[start:end]
+    if kind == b",":
+        return payload, end + 1
+    if kind == b"}":
+        item = {}
+        position = 0
+        while position < len(payload):
+            key, position = parse_tnetstring(payload, position)
+            value, position = parse_tnetstring(payload, position)
+            item[key.decode()] = value
+        return item, end + 1
+    raise ValueError(f"unsupported tnetstring type {kind!r}")
+
+
+def decode_grip_item(item: bytes) -> Optional[bytes]:
+    """Returns the http-stream content of a GRIP item, or None for other actions (close)"""
+    if item[:1] == b"J":
+        http_stream = json.loads(item[1:])["formats"]["http-stream"]
+        content = http_stream.get("content")
+        return content.encode() if content is not None else None
+    http_stream = parse_tnetstring(item, 1)[0]["formats"]["http-stream"]
+    return http_stream.get("content")
+
+
+class HermodStandIn:
+    """Binds where pushpin would and routes published SSE messages to the client owning the channel"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.socket = zmq.Context.instance().socket(zmq.XSUB)
+        self.socket.bind(url)
+        self.items = 0
+        self.bytes = 0
+        self._clients: Dict[str, "Client"] = {}
+        self._partial: Dict[str, bytes] = defaultdict(bytes)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="hermod-stand-in", daemon=True)
+
+    def start(self) -> None:
+        # subscribe to everything. sent after the publisher connected, XSUB forwards it upstream
+        self.socket.send(b"\x01")
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        self._thread.join()
+
+    def register(self, channel: str, client: "Client") -> None:
+        self._clients[channel] = client
+
+    def _run(self) -> None:
+        while self._running:
+            if not self.socket.poll(50):
+                continue
+            channel, item = self.socket.recv_multipart()
+            received_at = time.perf_counter()
+            self.items += 1
+            self.bytes += len(item)
+            content = decode_grip_item(item)
+            client = self._clients.get(channel.decode())
+            if content is None or client is None:
+                continue
+            # a large frame may be split over several items
+            buffer = self._partial[client.channel] + content
+            *frames, self._partial[client.channel] = buffer.split(b"\n\n")
+            for frame in frames:
+                for line in frame.split(b"\n"):
+                    if line.startswith(b"data: "):
+                        client.deliver(json.loads(line[len(b"data: "):]), received_at)
+
+
+class Client:
+    """A simulated MCP client: one session, requests in sequence"""
+
+    def __init__(self, index: int, http: httpx.AsyncClient, hermod: HermodStandIn, args: argparse.Namespace):
+        self.index = index
+        self.http = http
+        self.hermod = hermod
+        self.args = args
+        self.channel = ""
+        self.loop = asyncio.get_running_loop()
+        self.pending: Dict[Any, asyncio.Future] = {}
+        user_info = {"user_id": f"user-{index}", "sid": f"session-{index}"}
+        self.headers = {
+            settings.user_info_token: base64.b64encode(json.dumps(user_info).encode()).decode(),
+            settings.hermod_streaming_header: "true",
+            "Accept": ACCEPT,
+        }
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors = 0
+
+    def deliver(self, message: Dict[str, Any], received_at: float) -> None:
+        # called from the stand-in thread
+        self.loop.call_soon_threadsafe(self._deliver, message, received_at)
+
+    def _deliver(self, message: Dict[str, Any], received_at: float) -> None:
+        if "method" in message and "id" in message:
+            # a server to client request (sampling)
+            asyncio.ensure_future(self._answer(message))
+            return
+        future = self.pending.pop(message.get("id"), None)
+        if future is not None and not future.done():
+            future.set_result((message, received_at))
+
+    async def _answer(self, request: Dict[str, Any]) -> None:
+        result = {"role": "assistant", "content": {"type": "text", "text": "ok"}, "model": "loadtest"}
+        await self._post({"jsonrpc": "2.0", "id": request["id"], "result": result})
+
+    async def _post(self, body: Dict[str, Any]) -> httpx.Response:
+        headers = {**self.headers, "mcp-session-id": self.channel} if self.channel else self.headers
+        return await self.http.post("/", json=body, headers=headers)
+
+    async def initialize(self) -> None:
+        started_at = time.perf_counter()
+        response = await self._post({
+            "jsonrpc": "2.0", "id": 0, "method": "initialize",
+            "params": {
+                "protocolVersion": "2025-03-26",
+                "capabilities": {"sampling": {}},
+                "clientInfo": {"name": f"loadtest-{self.index}", "version": "1"},
+            },
+        })
+        response.raise_for_status()
+        self.latencies["initialize"].append(time.perf_counter() - started_at)
+        self.channel = response.headers["mcp-session-id"]
+        self.hermod.register(self.channel, self)
+
+    async def call(self, request_id: int, tool: str, arguments: Dict[str, Any]) -> None:
+        future = self.loop.create_future()
+        self.pending[request_id] = future
+        started_at = time.perf_counter()
+        response = await self._post({
+            "jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+            "params": {"name": tool, "arguments": arguments},
+        })
+        if response.status_code != 202:
+            self.pending.pop(request_id, None)
+            self.errors += 1
+            return
+        try:
+            message, received_at = await asyncio.wait_for(future, self.args.timeout)
+        except asyncio.TimeoutError:
+            self.pending.pop(request_id, None)
+            self.errors += 1
+            return
+        if "error" in message or message.get("result", {}).get("isError"):
+            self.errors += 1
+        self.latencies[tool].append(received_at - started_at)
+
+    async def notify(self) -> None:
+        started_at = time.perf_counter()
+        await self._post({"jsonrpc": "2.0", "method": "notifications/roots/list_changed"})
+        self.latencies["notification"].append(time.perf_counter() - started_at)
+
+    async def run(self) -> None:
+        await self.initialize()
+        payload = "x" * self.args.payload_bytes
+        for request_id in range(1, self.args.calls + 1):
+            if random.random() < self.args.sampling_ratio:
+                await self.call(request_id, "sample", {"prompt": payload})
+            else:
+                await self.call(request_id, "echo", {"text": payload})
+            if random.random() < self.args.notification_ratio:
+                await self.notify()
+
+
+def build_app():
+    from mcp.server.fastmcp import Context
+    from mcp.types import SamplingMessage, TextContent
+
+    from odinmcp import OdinMCP
+
+    mcp = OdinMCP("loadtest")
+
+    @mcp.tool()
+    def echo(text: str) -> str:
+        return text
+
+    @mcp.tool()
+    async def sample(prompt: str, ctx: Context) -> str:
+        result = await ctx.session.create_message(
+            messages=[SamplingMessage(role="user", content=TextContent(type="text", text=prompt))],
+            max_tokens=16,
+        )
+        return result.content.text
+
+    return mcp.sse_app()
+
+
+def percentiles(values: List[float]) -> Dict[str, Any]:
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def at(q: float) -> float:
+        return values[min(int(q * len(values)), len(values) - 1)] * 1000
+
+    return {
+        "count": len(values),
+        "mean_ms": statistics.fmean(values) * 1000,
+        "p50_ms": at(0.50),
+        "p90_ms": at(0.90),
+        "p99_ms": at(0.99),
+        "max_ms": values[-1] * 1000,
+    }
+
+
+async def drive(web, hermod: HermodStandIn, args: argparse.Namespace) -> Tuple[List[Client], float]:
+    transport = httpx.ASGITransport(app=web)
+    async with httpx.AsyncClient(transport=transport, base_url="http://odinmcp") as http:
+        clients = [Client(index, http, hermod, args) for index in range(args.clients)]
+        started_at = time.perf_counter()
+        await asyncio.gather(*(client.run() for client in clients))
+        return clients, time.perf_counter() - started_at
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20, help="concurrent simulated clients")
+    parser.add_argument("--calls", type=int, default=50, help="tools/call per client")
+    parser.add_argument("--worker-concurrency", type=int, default=8, help="worker threads")
+    parser.add_argument("--payload-bytes", type=int, default=256, help="size of the tool argument")
+    parser.add_argument("--sampling-ratio", type=float, default=0.0, help="share of calls making a sampling round trip")
+    parser.add_argument("--notification-ratio", type=float, default=0.2, help="share of iterations sending a notification")
+    parser.add_argument("--redis", default="none", help="none, memory (fakeredis) or a redis url")
+    parser.add_argument("--hermod-url", default=HERMOD_URL, help="where the pushpin stand-in binds")
+    parser.add_argument("--poll-interval", type=float, default=0.001, help="in-memory broker polling interval, seconds")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for a response frame")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON result to this file instead of stdout")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    configure(args)
+    from celery.contrib.testing.worker import start_worker
+    from celery.signals import task_postrun, task_prerun
+
+    from odinmcp.hermod import get_hermod_publisher
+
+    web, worker = build_app()
+    # the memory transport polls its queues, once a second by default
+    worker.conf.broker_transport_options = {"polling_interval": args.poll_interval}
+
+    # worker cpu: thread time spent inside tasks
+    task_cpu = {"seconds": 0.0, "tasks": 0}
+    task_started = threading.local()
+
+    def on_prerun(**kwargs):
+        task_started.at = time.thread_time()
+
+    def on_postrun(**kwargs):
+        task_cpu["seconds"] += time.thread_time() - task_started.at
+        task_cpu["tasks"] += 1
+
+    task_prerun.connect(on_prerun, weak=False)
+    task_postrun.connect(on_postrun, weak=False)
+
+    hermod = HermodStandIn(args.hermod_url)
+    # connect the publisher before subscribing, so the subscription reaches it
+    get_hermod_publisher().socket
+    hermod.start()
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    with start_worker(
+        worker,
+        pool="threads",
+        concurrency=args.worker_concurrency,
+        perform_ping_check=False,
+        loglevel="ERROR",
+    ):
+        clients, duration = asyncio.run(drive(web, hermod, args))
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    hermod.stop()
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    for client in clients:
+        for operation, values in client.latencies.items():
+            latencies[operation].extend(values)
+    calls = len(latencies["echo"]) + len(latencies["sample"])
+    end_to_end = latencies["echo"] + latencies["sample"]
+
+    try:
+        from importlib.metadata import version
+        odinmcp_version = version("odinmcp")
+    except Exception:
+        odinmcp_version = "unknown"
+
+    result = {
+        "benchmark": "loadtest",
+        "odinmcp_version": odinmcp_version,
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "duration_s": duration,
+        "calls": calls,
+        "errors": sum(client.errors for client in clients),
+        "calls_per_s": calls / duration if duration else 0,
+        "latency": {
+            "end_to_end": percentiles(end_to_end),
+            **{operation: percentiles(values) for operation, values in sorted(latencies.items())},
+        },
+        "hermod": {"items": hermod.items, "bytes": hermod.bytes},
+        "cpu": {
+            # web tier, workers and clients share the process
+            "process_user_s": usage_after.ru_utime - usage_before.ru_utime,
+            "process_system_s": usage_after.ru_stime - usage_before.ru_stime,
+            "worker_task_s": task_cpu["seconds"],
+            "worker_task_ms_per_task": task_cpu["seconds"] * 1000 / task_cpu["tasks"] if task_cpu["tasks"] else None,
+        },
+        # ru_maxrss is in KiB on linux, bytes on macos
+        "max_rss_mb": usage_after.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+    }
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Microbenchmarks of the per message costs on the request path.
+
+    http.parse        POST body -> json.loads -> JSONRPCMessage (OdinHttpStreamingTransport._handle_post)
+    user.dump         CurrentUser.model_dump_json (web tier, into the celery task)
+    user.load         CurrentUser.model_validate_json (worker)
+    token.create      streaming token (JWT) carrying the client's initialize params
+    token.validate    streaming token validation, on every request
+    worker.parse      task payload -> JSONRPCRequest + ClientRequest -> handler lookup
+    tool.convert      _convert_to_content of a tool's return value
+    sse.frame         JSON-RPC response -> SSE event -> GRIP item (OdinWorkerSession.send_sse_message)
+
+Payload dependent cases run for small, medium and huge payloads.
+
+    python benchmarks/micro.py [--filter token] [--json]
+    python benchmarks/micro.py --save           # record benchmarks/micro_baseline.json
+    python benchmarks/micro.py --check          # exit 1 if a case regressed against the baseline
+
+Timings are also reported relative to a fixed pure python calibration loop, which is what
+`--check` compares, so a baseline recorded on one machine is usable on another (within reason).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+from mcp.server.fastmcp.server import _convert_to_content
+from mcp.server.lowlevel.server import Server as MCPServer
+from mcp.types import (
+    CallToolRequest,
+    CallToolResult,
+    ClientRequest,
+    JSONRPCMessage,
+    JSONRPCRequest,
+    ServerResult,
+    TextContent,
+)
+
+from odinmcp.config import settings
+from odinmcp.hermod.framing import encode_http_stream_content, encode_jsonrpc_result, encode_sse_event
+from odinmcp.models.auth import CurrentUser
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "micro_baseline.json")
+CHANNEL = b"channel-" + b"x" * 200
+EVENT_ID = "1718000000000-0"
+SIZES = {
+    "small": 256,
+    "medium": 64 * 1024,
+    "huge": 4 * 1024 * 1024,
+}
+
+
+def make_text(size: int) -> str:
+    # quotes, newlines and backslashes make escaping do real work
+    chunk = 'line with "quotes", \\backslashes\\ and unicode é\n'
+    return (chunk * (size // len(chunk) + 1))[:size]
+
+
+def make_user() -> CurrentUser:
+    return CurrentUser.from_info({"user_id": "user-1", "sid": "session-1", "scope": "mcp:read mcp:write offline"})
+
+
+def make_client_params(size: int) -> Dict[str, Any]:
+    return {
+        "protocolVersion": "2025-03-26",
+        "capabilities": {"sampling": {}, "roots": {"listChanged": True}, "experimental": {"blob": {"data": make_text(size)}}},
+        "clientInfo": {"name": "micro", "version": "1"},
+    }
+
+
+def make_request_body(size: int) -> bytes:
+    return json.dumps({
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "tools/call",
+        "params": {"name": "echo", "arguments": {"text": make_text(size)}},
+    }).encode()
+
+
+def case_http_parse(size: int) -> Callable[[], Any]:
+    body = make_request_body(size)
+    return lambda: JSONRPCMessage.model_validate(json.loads(body))
+
+
+def case_user_dump(size: int) -> Callable[[], Any]:
+    user = make_user()
+    return lambda: user.model_dump_json(by_alias=True, exclude_none=True)
+
+
+def case_user_load(size: int) -> Callable[[], Any]:
+    data = make_user().model_dump_json(by_alias=True, exclude_none=True)
+    return lambda: CurrentUser.model_validate_json(data)
+
+
+def case_token_create(size: int) -> Callable[[], Any]:
+    user = make_user()
+    params = make_client_params(size)
+    return lambda: user.create_hermod_streaming_token(params)
+
+
+def case_token_validate(size: int) -> Callable[[], Any]:
+    user = make_user()
+    token = user.create_hermod_streaming_token(make_client_params(size))
+    return lambda: user.validate_hermod_streaming_token(token)
+
+
+def case_worker_parse(size: int) -> Callable[[], Any]:
+    # mirrors OdinWorker.task_async_handle_mcp_request up to the handler call
+    request = make_request_body(size).decode()
+    handlers = MCPServer("micro").request_handlers
+    handlers.setdefault(CallToolRequest, None)
+
+    def run():
+        rpc_request = JSONRPCRequest.model_validate_json(request)
+        cli_req = ClientRequest(json.loads(request))
+        return rpc_request, handlers.get(type(cli_req.root))
+
+    return run
+
+
+def case_tool_convert(size: int) -> Callable[[], Any]:
+    # a structured result, serialised to JSON text by _convert_to_content
+    row = {"id": 1, "name": "row", "text": make_text(200)}
+    value = [row] * max(size // 256, 1)
+    return lambda: _convert_to_content(value)
+
+
+def case_sse_frame(size: int) -> Callable[[], Any]:
+    result = ServerResult(CallToolResult(content=[TextContent(type="text", text=make_text(size))]))
+
+    def run():
+        data = encode_jsonrpc_result(1, result)
+        return encode_http_stream_content(CHANNEL, [encode_sse_event(data, EVENT_ID)])
+
+    return run
+
+
+# name -> (case factory, whether it depends on the payload size)
+CASES: Dict[str, Tuple[Callable[[int], Callable[[], Any]], bool]] = {
+    "http.parse": (case_http_parse, True),
+    "user.dump": (case_user_dump, False),
+    "user.load": (case_user_load, False),
+    "token.create": (case_token_create, True),
+    "token.validate": (case_token_validate, True),
+    "worker.parse": (case_worker_parse, True),
+    "tool.convert": (case_tool_convert, True),
+    "sse.frame": (case_sse_frame, True),
+}
+
+
+def bench(fn: Callable[[], Any], repeat: int = 5) -> float:
+    number = 1
+    # scale the loop so every measurement runs for a reasonable time
+    while timeit.timeit(fn, number=number) < 0.05:
+        number *= 2
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def calibrate() -> float:
+    # fixed pure python work, to express timings in machine independent units
+    def work():
+        total = 0
+        for i in range(10000):
+            total += i * i % 7
+        return json.dumps({"total": total, "items": list(range(100))})
+    return bench(work)
+
+
+def run(name_filter: str = "") -> Dict[str, Any]:
+    settings.session_store_enabled = False
+    # a key of the recommended length, so jwt does not warn on every call
+    settings.hermod_streaming_token_secret = "micro-benchmark-secret-" + "x" * 16
+    calibration = calibrate()
+    results = {}
+    for name, (factory, sized) in CASES.items():
+        sizes = SIZES.items() if sized else [("-", 0)]
+        for size_name, size in sizes:
+            key = f"{name}[{size_name}]" if sized else name
+            if name_filter and name_filter not in key:
+                continue
+            seconds = bench(factory(size))
+            results[key] = {
+                "payload_bytes": size,
+                "us": seconds * 1e6,
+                "relative": seconds / calibration,
+            }
+    return {
+        "python": platform.python_version(),
+        "calibration_us": calibration * 1e6,
+        "results": results,
+    }
+
+
+def check(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for key, row in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        ratio = row["relative"] / base["relative"]
+        if ratio > tolerance:
+            regressions.append(f"{key}: {ratio:.2f}x the baseline ({row['us']:.1f}us, baseline {base['us']:.1f}us)")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="fail if a case regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown for --check")
+    args = parser.parse_args()
+
+    current = run(args.filter)
+
+    if args.json:
+        json.dump(current, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"{'case':>24} {'bytes':>10} {'us':>12} {'relative':>10}")
+        for key, row in current["results"].items():
+            print(f"{key:>24} {row['payload_bytes']:>10} {row['us']:>12.1f} {row['relative']:>10.3f}")
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+            f.write("\n")
+    if args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = check(current, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Redis commands per MCP call, by command and key namespace.
+
+Runs the load test's in-process setup (see loadtest.py): simulated clients -> web app -> celery
+-> workers -> hermod stand-in. Shared state and the celery result backend both use one in-memory
+redis (fakeredis), which counts every command it executes. The broker stays in memory and is
+not counted.
+
+    python benchmarks/redis_ops.py [--clients 5] [--calls 20] [--sampling-ratio 0.2] [--json]
+    python benchmarks/redis_ops.py --store-all-results    # celery's default retention, for comparison
+    python benchmarks/redis_ops.py --compare              # both, side by side
+
+Needs fakeredis.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+from collections import Counter
+from typing import Any, Dict
+
+from celery.backends.redis import RedisBackend
+
+import loadtest
+from odinmcp.config import settings
+
+
+_fake_redis: Any = None
+_lock = threading.Lock()
+_commands: Counter = Counter()
+_namespaces: Counter = Counter()
+
+
+class FakeRedisBackend(RedisBackend):
+    """Celery's redis result backend on the shared fakeredis client"""
+
+    def _create_client(self, **params):
+        return _fake_redis
+
+
+def namespace(key: bytes) -> str:
+    key = key.decode(errors="replace")
+    if key.startswith("celery-task-meta-"):
+        return "celery-task-meta"
+    if key.startswith(f"{settings.redis_key_prefix}:"):
+        return ":".join(key.split(":")[:2])
+    return "other"
+
+
+def count_commands() -> None:
+    from fakeredis._socket._base import BaseFakeSocket
+
+    process_command = BaseFakeSocket._process_command
+
+    def counting(self, fields):
+        if fields:
+            with _lock:
+                _commands[fields[0].decode().upper()] += 1
+                if len(fields) > 1:
+                    _namespaces[namespace(fields[1])] += 1
+        return process_command(self, fields)
+
+    BaseFakeSocket._process_command = counting
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    global _fake_redis
+    # "memory" runs on fakeredis (and exits if it is missing)
+    args.redis = "memory"
+    args.worker_concurrency = args.clients
+    args.payload_bytes = 256
+    args.timeout = 30
+    loadtest.configure(args)
+    from odinmcp.store import get_redis
+    _fake_redis = get_redis()
+    settings.celery_backend = f"{__name__}:FakeRedisBackend"
+    if args.store_all_results:
+        # celery's defaults: every task stores its (None) result for a day
+        settings.celery_store_request_results = True
+        settings.celery_store_notification_results = True
+        settings.celery_result_expires = 24 * 60 * 60
+
+    from celery.contrib.testing.worker import start_worker
+    from odinmcp.hermod import get_hermod_publisher
+
+    web, worker = loadtest.build_app()
+    worker.conf.broker_transport_options = {"polling_interval": args.poll_interval}
+    hermod = loadtest.HermodStandIn(args.hermod_url)
+    get_hermod_publisher().socket
+    hermod.start()
+
+    count_commands()
+    with start_worker(worker, pool="threads", concurrency=args.worker_concurrency, perform_ping_check=False, loglevel="ERROR"):
+        clients, _ = asyncio.run(loadtest.drive(web, hermod, args))
+    hermod.stop()
+
+    calls = sum(len(client.latencies["echo"]) + len(client.latencies["sample"]) for client in clients)
+    total = sum(_commands.values())
+    keys = _fake_redis.keys("celery-task-meta-*")
+    return {
+        "policy": "store all results" if args.store_all_results else "default",
+        "calls": calls,
+        "errors": sum(client.errors for client in clients),
+        "commands": total,
+        "commands_per_call": total / calls if calls else None,
+        "result_keys_left": len(keys),
+        "by_command": dict(_commands.most_common()),
+        "by_namespace": dict(_namespaces.most_common()),
+    }
+
+
+def compare(argv: list) -> None:
+    script = os.path.abspath(__file__)
+    results = []
+    for extra in (["--store-all-results"], []):
+        process = subprocess.run(
+            [sys.executable, script, *argv, *extra, "--json"], capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(process.stdout))
+    before, after = results
+    print(f"{'':>24} {'store all':>12} {'default':>12}")
+    for key in ("calls", "errors", "commands", "commands_per_call", "result_keys_left"):
+        print(f"{key:>24} {before[key]:>12.1f} {after[key]:>12.1f}")
+    for command in sorted(set(before["by_command"]) | set(after["by_command"])):
+        print(f"{command:>24} {before['by_command'].get(command, 0):>12} {after['by_command'].get(command, 0):>12}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=5, help="concurrent simulated clients")
+    parser.add_argument("--calls", type=int, default=20, help="tools/call per client")
+    parser.add_argument("--sampling-ratio", type=float, default=0.2, help="share of calls making a sampling round trip")
+    parser.add_argument("--notification-ratio", type=float, default=0.2, help="share of iterations sending a notification")
+    parser.add_argument("--hermod-url", default=loadtest.HERMOD_URL, help="where the pushpin stand-in binds")
+    parser.add_argument("--poll-interval", type=float, default=0.001, help="in-memory broker polling interval, seconds")
+    parser.add_argument("--store-all-results", action="store_true", help="store every task result (celery's default)")
+    parser.add_argument("--compare", action="store_true", help="run with both policies and compare")
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare([arg for arg in sys.argv[1:] if arg != "--compare"])
+        return
+
+    loadtest.random.seed(args.seed)
+    result = run(args)
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+        return
+    print(f"{result['policy']}: {result['calls']} calls, {result['commands']} redis commands, "
+          f"{result['commands_per_call']:.1f} per call, {result['result_keys_left']} result keys left")
+    for command, count in result["by_command"].items():
+        print(f"{command:>24} {count:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,20 @@
 
 # This makes the odin directory a Python package
-from .main import OdinMCP
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .main import OdinMCP
+
+
+def __getattr__(name: str):
+    # OdinMCP pulls in the mcp server stack, celery and starlette. import it on first use so the
+    # cli and light modules (config, store, metrics) start fast
+    if name == "OdinMCP":
+        from .main import OdinMCP
+        return OdinMCP
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "OdinMCP"
 ]
-    
\ No newline at end of file
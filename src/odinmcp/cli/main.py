@@ -1,13 +1,12 @@
 
-import importlib
-from starlette.applications import Starlette
 import typer
-import asyncio
 import importlib.resources as pkg_resources
 from pathlib import Path
 from typing import List
 import os
 import shutil
+import json
+import time
 
 
 app = typer.Typer(
@@ -19,47 +18,36 @@ app = typer.Typer(
 
 
 @app.command(name="web")
-def web(app_path: str, params: List[str] = typer.Argument(None)):
+def web(
+    app_path: str,
+    params: List[str] = typer.Argument(None),
+    host: str = typer.Option(None, "--host", help="Bind address. Defaults to the web_host setting."),
+    port: int = typer.Option(None, "--port", help="Bind port. Defaults to the web_port setting."),
+    workers: int = typer.Option(None, "--workers", help="Web processes to fork. Defaults to the web_workers setting."),
+    loop: str = typer.Option(None, "--loop", help="Event loop: auto, uvloop or asyncio. Defaults to the web_loop setting."),
+    http: str = typer.Option(None, "--http", help="HTTP parser: auto, httptools or h11. Defaults to the web_http setting."),
+    reuse_port: bool = typer.Option(None, "--reuse-port/--no-reuse-port", help="One SO_REUSEPORT socket per process."),
+    backlog: int = typer.Option(None, "--backlog", help="Listen backlog. Defaults to the web_backlog setting."),
+    graceful_timeout: float = typer.Option(None, "--graceful-timeout", help="Seconds to drain a process on shutdown or reload."),
+    preload: bool = typer.Option(None, "--preload/--no-preload", help="Import the app once before forking."),
+):
     """
-    Run a web app with uvicorn. 
+    Run a web app with uvicorn, in one or more forked processes.
     app_path should be in the format 'module:attr', e.g., 'test_app.main:web'
-    Any additional CLI arguments will be passed as kwargs to uvicorn.Config, e.g.:
-    odinmcp web test_app.main:web --host 0.0.0.0 --port 8080
+    e.g. odinmcp web test_app.main:web --host 0.0.0.0 --port 8080 --workers 4 --reuse-port
+    Send SIGHUP to reload the processes one at a time, SIGTERM to stop.
+    Any additional arguments are passed to uvicorn.Config as key value pairs, e.g.:
+    odinmcp web test_app.main:web -- log_level debug
     """
-    import uvicorn
-
-    if ':' not in app_path:
-        raise typer.BadParameter("app_path must be in the format 'module:attr', e.g., 'test_app.main:web'")
-
-    import sys
-    import os
-    module_path, app_attr = app_path.split(':', 1)
-
-    # Support file path or module path
-    if module_path.endswith('.py') or os.path.isfile(module_path):
-        file_path = os.path.abspath(module_path)
-        module_dir = os.path.dirname(file_path)
-        module_file = os.path.basename(file_path)
-        module_name = os.path.splitext(module_file)[0]
-        if module_dir not in sys.path:
-            sys.path.insert(0, module_dir)
-        module = importlib.import_module(module_name)
-    else:
-        module = importlib.import_module(module_path)
+    from odinmcp.web.server import serve
 
-    asgi_app = getattr(module, app_attr, None)
-    if asgi_app is None:
-        raise typer.BadParameter(f"Module '{module_path}' does not have attribute '{app_attr}'")
-    if not isinstance(asgi_app, Starlette):
-        raise typer.BadParameter(f"Attribute '{app_attr}' is not a Starlette app")
-    
     # Parse params as key-value pairs
     extra_kwargs = {}
     if params:
         if len(params) % 2 != 0:
-            raise typer.BadParameter("Additional arguments must be key value pairs, e.g., --host 0.0.0.0 --port 8080")
+            raise typer.BadParameter("Additional arguments must be key value pairs, e.g., log_level debug")
         for i in range(0, len(params), 2):
-            key = params[i].lstrip('-')
+            key = params[i].lstrip('-').replace('-', '_')
             value = params[i + 1]
             # Try to convert value to int or float if possible
             if value.isdigit():
@@ -71,16 +59,22 @@ def web(app_path: str, params: List[str] = typer.Argument(None)):
                     pass
             extra_kwargs[key] = value
 
-    # Default port to 80 if not provided
-    if "port" not in extra_kwargs:
-        extra_kwargs["port"] = 80
-
-    config = uvicorn.Config(
-        asgi_app,
-        **extra_kwargs
-    )
-    server = uvicorn.Server(config)
-    asyncio.run(server.serve())
+    try:
+        serve(
+            app_path,
+            host=host,
+            port=port,
+            workers=workers,
+            loop=loop,
+            http=http,
+            reuse_port=reuse_port,
+            backlog=backlog,
+            graceful_timeout=graceful_timeout,
+            preload=preload,
+            **extra_kwargs,
+        )
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
 
 
 def ensure_folder(path):
@@ -200,3 +194,62 @@ def worker(app_path: str, params: List[str] = typer.Argument(None)):
     argv = ["worker"] + (params or [])
     celery_app.worker_main(argv=argv)
 
+
+
+profiles_app = typer.Typer(
+    name="profiles",
+    help="Inspect tool call profiles captured by the profiling hook",
+    no_args_is_help=True,
+)
+app.add_typer(profiles_app, name="profiles")
+
+
+@profiles_app.command(name="list")
+def profiles_list(
+    profile_dir: str = typer.Option(None, "--dir", help="Profile directory. Defaults to the profiling_dir setting."),
+    tool: str = typer.Option(None, "--tool", help="Only list profiles of this tool."),
+):
+    """
+    List captured profiles, oldest first.
+    """
+    from odinmcp.profiling import ProfileStore
+
+    for profile in ProfileStore(profile_dir).list():
+        if tool and profile.get("tool") != tool:
+            continue
+        created_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(profile["created_at"]))
+        arguments_size = sum(profile.get("argument_sizes", {}).values())
+        typer.echo(
+            f"{profile['id']}  {created_at}  {profile['kind']:<8}  {profile['duration_ms']:>10.1f}ms  "
+            f"{profile['tool']}  user={profile.get('user_id')}  args={arguments_size}B"
+        )
+
+
+@profiles_app.command(name="dump")
+def profiles_dump(
+    profile_id: str = typer.Argument(..., help="Id of the profile, as shown by `odinmcp profiles list`"),
+    profile_dir: str = typer.Option(None, "--dir", help="Profile directory. Defaults to the profiling_dir setting."),
+    sort: str = typer.Option("cumulative", "--sort", help="pstats sort key for cProfile profiles."),
+    limit: int = typer.Option(30, "--limit", help="Number of functions to print for cProfile profiles."),
+    output: str = typer.Option(None, "--output", help="Write the raw profile (pstats or folded stacks) to this file."),
+):
+    """
+    Print a captured profile. cProfile profiles are printed as pstats, slow call samples as folded stacks.
+    """
+    from odinmcp.profiling import ProfileStore, format_profile
+
+    try:
+        metadata, data = ProfileStore(profile_dir).get(profile_id)
+    except KeyError:
+        typer.echo(f"Profile not found: {profile_id}")
+        raise typer.Exit(code=1)
+
+    if output:
+        # cProfile data is a regular pstats file (readable by pstats, snakeviz etc.)
+        with open(output, "wb") as f:
+            f.write(data)
+        typer.echo(f"Wrote {metadata['kind']} profile to {output}")
+        return
+
+    typer.echo(json.dumps(metadata, indent=2))
+    typer.echo(format_profile(metadata, data, sort=sort, limit=limit))
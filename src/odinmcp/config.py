@@ -1,7 +1,10 @@
-from typing import Generic, Optional, List
+from typing import Generic, Optional, List, TypeVar
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from mcp.server.lowlevel.server import LifespanResultT
+
+# same as mcp.server.lowlevel.server.LifespanResultT. importing that module here would load the
+# whole mcp server stack for every process that only needs settings
+LifespanResultT = TypeVar("LifespanResultT")
 
 
 class OdenSettings(BaseSettings, Generic[LifespanResultT]):
@@ -25,14 +28,156 @@ class OdenSettings(BaseSettings, Generic[LifespanResultT]):
     hermod_streaming_token_secret: Optional[str] = "secret"
     hermod_zero_mq_urls: Optional[List[str]] = ["tcp://localhost:5562"]
     hermod_streaming_keep_alive_timeout: Optional[int] = 10
-    
+
+    # hermod publishing (frames of a channel are coalesced within the window or until max bytes)
+    hermod_publish_window_ms: Optional[int] = 10
+    hermod_publish_max_bytes: Optional[int] = 64 * 1024
+    # "tnetstring" avoids re-escaping the SSE payload. "json" for GRIP proxies that only accept JSON items
+    hermod_publish_format: Optional[str] = "tnetstring"
+    # larger publishes are streamed to the client as consecutive items of at most this size
+    hermod_publish_chunk_bytes: Optional[int] = 1024 * 1024
+
+    # hermod routing: "broadcast" publishes to every hermod node, "hash" (experimental, the load balancer must
+    # reproduce its rendezvous hashing) maps each channel to one node, "registry" publishes to the node
+    # recorded (from hermod_node_header) when the stream hold was issued
+    hermod_routing_mode: Optional[str] = "broadcast"
+    hermod_node_header: Optional[str] = "x-hermod-node"
+    hermod_routing_ttl: Optional[int] = 24 * 60 * 60
+    hermod_routing_cache_ttl: Optional[int] = 30
+
+    # hermod broadcast groups: every stream hold also subscribes to a deployment wide and a per user channel,
+    # so one publish reaches every session (list_changed notifications). the prefix names the deployment
+    hermod_broadcast_enabled: Optional[bool] = True
+    hermod_broadcast_prefix: Optional[str] = "odinmcp-broadcast"
+
+    # resumable streams (per channel event log for Last-Event-ID replay)
+    hermod_event_log_enabled: Optional[bool] = True
+    hermod_event_log_max_len: Optional[int] = 1000
+    hermod_event_log_ttl: Optional[int] = 300
+    # held streams carry prev-id and a next link, so hermod re-fetches events it missed (e.g. published
+    # between the replay and its subscribe). with a timeout it also re-fetches after that many idle seconds
+    hermod_stream_recover_timeout: Optional[int] = 60
+
     
     # state variables
     current_user_state: Optional[str] = "current_user"
     supports_hermod_streaming_state: Optional[str] = "supports_hermod_streaming"
     
+    # cancellation of in-flight requests
+    cancellation_enabled: Optional[bool] = True
+    cancellation_ttl: Optional[int] = 60 * 60
+    # margin for clock skew between web and worker hosts when deciding that the cancellation listener has
+    # heard about every cancellation of a task (so the task skips the redis check before it starts)
+    cancellation_clock_skew: Optional[float] = 1.0
+
+    # channel liveness: tombstones for closed sessions, checked by workers through a local cache
+    channel_liveness_enabled: Optional[bool] = True
+    channel_liveness_ttl: Optional[int] = 24 * 60 * 60
+    channel_liveness_cache_ttl: Optional[float] = 1
+
+    # server side sessions: compact opaque session ids instead of JWTs carrying the client params
+    session_store_enabled: Optional[bool] = False
+    session_ttl: Optional[int] = 24 * 60 * 60
+    session_store_cache_ttl: Optional[float] = 60
+    session_id_bytes: Optional[int] = 24
+
+    # metrics: prometheus text format on the web app's metrics_path and a sidecar port per worker process
+    metrics_enabled: Optional[bool] = False
+    metrics_path: Optional[str] = "/metrics"
+    metrics_worker_port: Optional[int] = 9400
+    metrics_max_series: Optional[int] = 1000
+
+    # tracing: W3C traceparent propagated from the http request through celery to hermod publishes
+    tracing_enabled: Optional[bool] = False
+    # "memory" keeps recent spans in process, "file" appends them as JSON lines to tracing_file_path
+    tracing_exporter: Optional[str] = "memory"
+    tracing_file_path: Optional[str] = "/tmp/odinmcp/spans.jsonl"
+    tracing_memory_max_spans: Optional[int] = 10000
+
+    # profiling: cProfile a sample of tool calls, stack sample the slow ones. kept in a ring under profiling_dir
+    profiling_enabled: Optional[bool] = False
+    profiling_sample_rate: Optional[float] = 0.01
+    profiling_slow_call_ms: Optional[float] = 1000
+    profiling_sample_interval_ms: Optional[float] = 5
+    profiling_dir: Optional[str] = "/tmp/odinmcp/profiles"
+    profiling_max_profiles: Optional[int] = 200
+
+    # web serving (odinmcp web): forked processes, each with its own event loop. "auto" picks uvloop / httptools
+    # when installed. with web_reuse_port every process binds its own SO_REUSEPORT socket
+    web_host: Optional[str] = "0.0.0.0"
+    web_port: Optional[int] = 80
+    web_workers: Optional[int] = 1
+    web_loop: Optional[str] = "auto"
+    web_http: Optional[str] = "auto"
+    web_reuse_port: Optional[bool] = False
+    web_backlog: Optional[int] = 2048
+    web_graceful_timeout: Optional[float] = 30
+    # import the app once before forking. turn off for SIGHUP reloads to pick up code changes
+    web_preload: Optional[bool] = True
+
+    # worker warm up: before the pool forks (tool validators, gc.freeze) and in each pool process before it
+    # takes tasks (hermod and redis connections, lifespan)
+    worker_warm_up_enabled: Optional[bool] = True
+    # enter the server lifespan once per worker process (thread) and keep it open, instead of once per request
+    worker_persistent_lifespan: Optional[bool] = True
+    # how long warm up waits for the lifespan before leaving it to the first task. celery kills a prefork child
+    # that takes longer than worker_proc_alive_timeout (4s) to init. 0 always enters it on the first task
+    worker_warm_up_lifespan_timeout: Optional[float] = 2.0
+
+    # pools for tools registered with executor="process" / "thread", per worker process. sizes default to the cpu count
+    # (process) and python's default (thread). forkserver keeps pool processes free of the worker's threads and sockets
+    tool_process_pool_size: Optional[int] = None
+    tool_process_pool_start_method: Optional[str] = "forkserver"
+    tool_thread_pool_size: Optional[int] = None
+    tool_executor_timeout: Optional[float] = None
+    # stop a running process pool call on cancellation or timeout by replacing the pool
+    tool_process_pool_kill_on_cancel: Optional[bool] = True
+
+    # reject tools/call with an unknown tool or invalid arguments in the web tier, before it is enqueued
+    edge_validation_enabled: Optional[bool] = True
+
+    # deduplication of retried POSTs by (channel, Idempotency-Key header or JSON-RPC id) within the TTL.
+    # without the header a request is keyed by its id and a digest of its body, and kept for the shorter
+    # idempotency_id_ttl: a client that restarts its id counter must not have new requests acked and dropped
+    idempotency_enabled: Optional[bool] = True
+    idempotency_ttl: Optional[int] = 10 * 60
+    idempotency_id_ttl: Optional[int] = 30
+    idempotency_cache_size: Optional[int] = 10000
+
+    # logging/setLevel: log notifications below the channel's level are dropped in the worker instead of published.
+    # log_level_default applies until the client sets a level (None sends everything)
+    log_level_filter_enabled: Optional[bool] = True
+    log_level_default: Optional[str] = None
+    log_level_cache_ttl: Optional[float] = 5
+
+    # resources/subscribe: subscribers per uri in redis, cached per process for notify_resource_updated fan out
+    resource_subscriptions_cache_ttl: Optional[float] = 1
+
+    # send_request (sampling, elicitation) polls the result backend for the client's response, starting at the
+    # min interval and doubling up to the max
+    client_response_poll_min_interval: Optional[float] = 0.005
+    client_response_poll_max_interval: Optional[float] = 0.1
+
     # celery settngs
     celery_broker: Optional[str] = "redis://localhost:6379/0"
     celery_backend: Optional[str] = "redis://localhost:6379/0"
-    
+    # result retention. request and notification tasks return nothing, so no result is stored for them unless
+    # turned on. what remains are client responses and progress (read by send_request), kept for
+    # celery_result_expires seconds: keep it above the longest send_request timeout
+    celery_store_request_results: Optional[bool] = False
+    celery_store_notification_results: Optional[bool] = False
+    celery_result_expires: Optional[int] = 5 * 60
+
+    # redis settings (event log and other shared state)
+    redis_url: Optional[str] = "redis://localhost:6379/0"
+    redis_key_prefix: Optional[str] = "odinmcp"
+
+    # large payload offload: payloads above the threshold travel by reference ("redis" or "file" blob store)
+    blob_offload_threshold_bytes: Optional[int] = 256 * 1024
+    blob_store_backend: Optional[str] = "redis"
+    blob_store_redis_url: Optional[str] = None
+    blob_store_path: Optional[str] = "/tmp/odinmcp/blobs"
+    blob_store_ttl: Optional[int] = 60 * 60
+    blob_chunk_bytes: Optional[int] = 512 * 1024
+
 settings = OdenSettings()
\ No newline at end of file
@@ -3,12 +3,18 @@ MCP_SESSION_ID_HEADER = "mcp-session-id"
 LAST_EVENT_ID_HEADER = "last-event-id"
 CONTENT_TYPE_HEADER = "Content-Type"
 ACCEPT_HEADER = "Accept"
+IDEMPOTENCY_KEY_HEADER = "idempotency-key"
 
 #  Hermod headers
 HERMOD_GRIP_HOLD_HEADER = "Grip-Hold"
 HERMOD_GRIP_HOLD_MODE = "stream"
 HERMOD_GRIP_CHANNEL_HEADER = "Grip-Channel"
 HERMOD_GRIP_KEEP_ALIVE_HEADER = "Grip-Keep-Alive"
+HERMOD_GRIP_LINK_HEADER = "Grip-Link"
+# sent by hermod when it follows a stream's next link: "<channel>; last-id=<id>, ..."
+HERMOD_GRIP_LAST_HEADER = "Grip-Last"
+# where the next link resumes a stream
+LAST_EVENT_ID_QUERY_PARAM = "last_event_id"
 
 
 # Content types
@@ -16,3 +22,6 @@ CONTENT_TYPE_JSON = "application/json"
 CONTENT_TYPE_SSE = "text/event-stream"
 
 MCP_CELERY_PROGRESS_STATE = "ODINMCP_PROGRESS"
+
+# Celery task headers
+ENQUEUED_AT_HEADER = "odinmcp_enqueued_at"
@@ -0,0 +1,12 @@
+from odinmcp.hermod.event_log import HermodEventLog
+from odinmcp.hermod.framing import encode_sse_event
+from odinmcp.hermod.publisher import HermodPublisher, get_hermod_publisher
+from odinmcp.hermod.routing import HermodRouter
+
+__all__ = [
+    "HermodEventLog",
+    "HermodPublisher",
+    "HermodRouter",
+    "encode_sse_event",
+    "get_hermod_publisher",
+]
@@ -0,0 +1,138 @@
+import logging
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+import redis
+
+from odinmcp.config import settings
+from odinmcp.store import get_redis, redis_key
+from odinmcp.store.blobs import offload, resolve
+
+
+logger = logging.getLogger(__name__)
+
+# redis stream ids: <milliseconds>-<sequence>
+EVENT_ID_PATTERN = re.compile(r"^\d+-\d+$")
+# the last id of a log with no events. smaller than any id redis assigns
+EMPTY_LOG_ID = "0-0"
+
+
+def _decode(value: Union[bytes, str]) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _last_id(entries: List[Tuple[bytes, Dict[bytes, bytes]]]) -> str:
+    """The id of the entry an XREVRANGE with COUNT 1 returned"""
+    return _decode(entries[0][0]) if entries else EMPTY_LOG_ID
+
+
+class HermodEventLog:
+    """
+    Bounded, TTL'd log of the SSE events published on a channel.
+    Backed by a redis stream per channel, so event ids are monotonically increasing
+    and can be used as SSE `id:` fields for Last-Event-ID replay.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self._redis = redis_client
+
+    @property
+    def redis(self) -> redis.Redis:
+        return self._redis or get_redis()
+
+    def append(self, channel_id: str, data: bytes) -> Optional[str]:
+        """Append an event to the channel log. Returns the event id, or None if it could not be logged."""
+        _, event_ids = self.append_batch({channel_id: [data]})[channel_id]
+        return event_ids[0]
+
+    def append_batch(self, events: Dict[str, List[bytes]]) -> Dict[str, Tuple[Optional[str], List[Optional[str]]]]:
+        """
+        Append the events of many channels in one round trip, e.g. everything a publisher flush sends.
+        Returns, per channel, the id of the event logged before the batch and the ids of the batch in
+        order. Ids are None for events that could not be logged.
+
+        The previous id and the appends are one transaction, so (previous id, batch ids) chain up with
+        the batches other processes log on the channel. Publishes carry them as the GRIP prev-id and id.
+        """
+        events = {channel_id: datas for channel_id, datas in events.items() if datas}
+        not_logged = {channel_id: (None, [None] * len(datas)) for channel_id, datas in events.items()}
+        if not settings.hermod_event_log_enabled or not events:
+            return not_logged
+        # an event fanned out to many channels is offloaded once, every log references the same blob
+        values: Dict[int, Union[bytes, str]] = {}
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            for channel_id, datas in events.items():
+                key = redis_key("events", channel_id)
+                pipe.xrevrange(key, count=1)
+                for data in datas:
+                    value = values.get(id(data))
+                    if value is None:
+                        # large events are kept in the blob store, the stream only holds a reference
+                        value = values[id(data)] = offload(data)
+                    pipe.xadd(key, {"data": value}, maxlen=settings.hermod_event_log_max_len, approximate=True)
+                pipe.expire(key, settings.hermod_event_log_ttl)
+            results = iter(pipe.execute())
+        except redis.RedisError as e:
+            # losing resumability is better than losing the messages
+            logger.warning("Could not append events to the logs of %s channels: %s", len(events), e)
+            return not_logged
+        batches = {}
+        for channel_id, datas in events.items():
+            previous_id = _last_id(next(results))
+            batches[channel_id] = (previous_id, [_decode(next(results)) for _ in datas])
+            next(results)  # expire
+        return batches
+
+    def resume(self, channel_id: str, last_event_id: Optional[str] = None) -> Tuple[Optional[str], List[Tuple[str, Union[bytes, memoryview]]]]:
+        """
+        Where a (re)connecting stream picks up: the id of the channel's latest event and the events
+        after last_event_id, read in one transaction. The id is None if the log can't be read.
+        """
+        if not settings.hermod_event_log_enabled:
+            return None, []
+        key = redis_key("events", channel_id)
+        replay = last_event_id is not None and EVENT_ID_PATTERN.match(last_event_id)
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.xrevrange(key, count=1)
+            if replay:
+                pipe.xrange(key, min=last_event_id, max="+")
+            results = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Could not read event log for channel: %s", e)
+            return None, []
+        return _last_id(results[0]), self._resolve(results[1], last_event_id) if replay else []
+
+    def replay(self, channel_id: str, last_event_id: str) -> List[Tuple[str, Union[bytes, memoryview]]]:
+        """Returns (event_id, data) for every logged event after last_event_id."""
+        if not settings.hermod_event_log_enabled or not EVENT_ID_PATTERN.match(last_event_id):
+            return []
+        key = redis_key("events", channel_id)
+        try:
+            entries = self.redis.xrange(key, min=last_event_id, max="+")
+        except redis.RedisError as e:
+            logger.warning("Could not replay event log for channel: %s", e)
+            return []
+        return self._resolve(entries, last_event_id)
+
+    def _resolve(self, entries: List[Tuple[bytes, Dict[bytes, bytes]]], last_event_id: str) -> List[Tuple[str, Union[bytes, memoryview]]]:
+        events = []
+        for event_id, fields in entries:
+            event_id = _decode(event_id)
+            # xrange is inclusive. skip the event the client already has
+            if event_id == last_event_id:
+                continue
+            try:
+                events.append((event_id, resolve(fields[b"data"])))
+            except KeyError:
+                logger.warning("Offloaded event %s expired before it was replayed", event_id)
+        return events
+
+    def delete(self, channel_id: str) -> None:
+        if not settings.hermod_event_log_enabled:
+            return
+        try:
+            self.redis.delete(redis_key("events", channel_id))
+        except redis.RedisError as e:
+            logger.warning("Could not delete event log for channel: %s", e)
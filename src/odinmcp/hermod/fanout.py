@@ -0,0 +1,31 @@
+from typing import List, Optional
+
+from odinmcp.hermod.framing import encode_sse_event
+from odinmcp.hermod.publisher import get_hermod_publisher
+from odinmcp.hermod.routing import deployment_channel, user_channel
+from odinmcp.store.liveness import get_channel_liveness
+
+
+def publish_to_channels(channel_ids: List[str], data: bytes) -> List[str]:
+    """
+    Publish one serialised JSON-RPC message to many channels, e.g. a notification to every
+    subscriber of a resource. Closed channels are skipped. Their tombstones are read in one redis
+    round trip and the event logs are appended in another (by the publisher's flush), then the
+    frames are sent back to back. Returns the channels published to.
+    """
+    channel_ids = get_channel_liveness().alive_channels(channel_ids)
+    if not channel_ids:
+        return []
+    get_hermod_publisher().publish_many(channel_ids, data)
+    return channel_ids
+
+
+def broadcast(data: bytes, user_id: Optional[str] = None) -> str:
+    """
+    Publish one serialised JSON-RPC message to every live session of the deployment, or of one
+    user, with a single GRIP item on the broadcast group. Returns the group's channel.
+    Broadcasts carry no event id: they are not logged per channel, so Last-Event-ID replay skips them.
+    """
+    channel_id = user_channel(user_id) if user_id else deployment_channel()
+    get_hermod_publisher().publish(channel_id, encode_sse_event(data), flush=True)
+    return channel_id
@@ -0,0 +1,150 @@
+"""
+Byte level SSE and GRIP framing for hermod publishes.
+
+Messages are serialised once, straight to bytes, and spliced into pre-built templates.
+GRIP items are encoded as TNetStrings (pushpin accepts them with a "T" prefix), which carry
+the SSE content length-prefixed instead of re-escaping it inside a second JSON document.
+"""
+import json
+from typing import Any, Dict, Iterable, Optional
+
+from pydantic_core import to_json
+
+from odinmcp.config import settings
+
+
+# SSE templates
+SSE_ID_PREFIX = b"id: "
+SSE_MESSAGE_PREFIX = b"event: message\ndata: "
+SSE_TERMINATOR = b"\n\n"
+
+# JSON-RPC templates
+JSONRPC_RESULT_PREFIX = b'{"jsonrpc":"2.0","id":'
+JSONRPC_RESULT_INFIX = b',"result":'
+JSONRPC_ERROR_INFIX = b',"error":'
+JSONRPC_NOTIFICATION_PREFIX = b'{"jsonrpc":"2.0",'
+JSONRPC_SUFFIX = b"}"
+
+
+def _tnet(data: bytes, kind: bytes) -> bytes:
+    return b"%d:%s%s" % (len(data), data, kind)
+
+
+def _tnet_string(value: bytes) -> bytes:
+    return _tnet(value, b",")
+
+
+# GRIP templates (TNetString)
+GRIP_TNET_PREFIX = b"T"
+GRIP_KEY_CHANNEL = _tnet_string(b"channel")
+GRIP_KEY_FORMATS = _tnet_string(b"formats")
+GRIP_KEY_META = _tnet_string(b"meta")
+GRIP_KEY_ID = _tnet_string(b"id")
+GRIP_KEY_PREV_ID = _tnet_string(b"prev-id")
+GRIP_KEY_HTTP_STREAM = _tnet_string(b"http-stream")
+GRIP_KEY_CONTENT = _tnet_string(b"content")
+GRIP_CLOSE_FORMATS = _tnet(
+    GRIP_KEY_HTTP_STREAM + _tnet(_tnet_string(b"action") + _tnet_string(b"close"), b"}"),
+    b"}",
+)
+
+
+def encode_sse_event(data: bytes, event_id: Optional[str] = None) -> bytes:
+    """Format a single SSE message event. Stamps the `id:` field when an event id is given."""
+    if event_id:
+        return b"".join((SSE_ID_PREFIX, event_id.encode(), b"\n", SSE_MESSAGE_PREFIX, data, SSE_TERMINATOR))
+    return b"".join((SSE_MESSAGE_PREFIX, data, SSE_TERMINATOR))
+
+
+def dump_json(model: Any) -> bytes:
+    """Serialise a pydantic model (or plain value) to JSON bytes in one pass"""
+    return to_json(model, by_alias=True, exclude_none=True)
+
+
+def encode_jsonrpc_result(request_id: Any, result: Any) -> bytes:
+    """JSON-RPC response bytes for a handler result, without an intermediate dict"""
+    return b"".join((JSONRPC_RESULT_PREFIX, dump_json(request_id), JSONRPC_RESULT_INFIX, dump_json(result), JSONRPC_SUFFIX))
+
+
+def encode_jsonrpc_error(request_id: Any, error: Any) -> bytes:
+    """JSON-RPC error bytes for an ErrorData"""
+    return b"".join((JSONRPC_RESULT_PREFIX, dump_json(request_id), JSONRPC_ERROR_INFIX, dump_json(error), JSONRPC_SUFFIX))
+
+
+def encode_jsonrpc_notification(notification: Any) -> bytes:
+    """JSON-RPC notification bytes. The notification always dumps to a non empty object ({"method": ...})"""
+    return JSONRPC_NOTIFICATION_PREFIX + dump_json(notification)[1:]
+
+
+def encode_http_stream_content(
+    channel: bytes,
+    content: Iterable[bytes],
+    meta: Optional[Dict[str, str]] = None,
+    item_id: Optional[str] = None,
+    prev_id: Optional[str] = None,
+) -> bytes:
+    """
+    GRIP item publishing the content (a sequence of SSE frames) on the channel's http streams.
+    meta (e.g. the traceparent) travels with the item but is not sent to clients.
+    item_id and prev_id let pushpin notice an item it missed (its prev-id is not the last id
+    pushpin saw on the channel) and recover the gap from the stream's next link.
+    """
+    frames = list(content)
+    if settings.hermod_publish_format == "json":
+        item = {"channel": channel.decode()}
+        if item_id:
+            item["id"] = item_id
+        if prev_id:
+            item["prev-id"] = prev_id
+        item["formats"] = {"http-stream": {"content": b"".join(frames).decode()}}
+        if meta:
+            item["meta"] = meta
+        return ("J" + json.dumps(item)).encode()
+
+    # {"channel": channel, "formats": {"http-stream": {"content": content}}}
+    # every level is "<len>:<payload><type>", so lengths are computed inside out
+    # and the frames are copied exactly once, into the final message
+    content_len = sum(len(frame) for frame in frames)
+    content_header = b"%d:" % content_len
+    http_stream_len = len(GRIP_KEY_CONTENT) + len(content_header) + content_len + 1
+    http_stream_header = b"%d:" % http_stream_len
+    formats_len = len(GRIP_KEY_HTTP_STREAM) + len(http_stream_header) + http_stream_len + 1
+    formats_header = b"%d:" % formats_len
+    channel_value = _tnet_string(channel)
+    ids_value = b""
+    if item_id:
+        ids_value += GRIP_KEY_ID + _tnet_string(item_id.encode())
+    if prev_id:
+        ids_value += GRIP_KEY_PREV_ID + _tnet_string(prev_id.encode())
+    meta_value = b""
+    if meta:
+        meta_value = GRIP_KEY_META + _tnet(
+            b"".join(_tnet_string(key.encode()) + _tnet_string(value.encode()) for key, value in meta.items()),
+            b"}",
+        )
+    item_len = (
+        len(GRIP_KEY_CHANNEL) + len(channel_value) + len(ids_value) + len(meta_value)
+        + len(GRIP_KEY_FORMATS) + len(formats_header) + formats_len + 1
+    )
+    return b"".join((
+        GRIP_TNET_PREFIX, b"%d:" % item_len,
+        GRIP_KEY_CHANNEL, channel_value,
+        ids_value,
+        meta_value,
+        GRIP_KEY_FORMATS, formats_header,
+        GRIP_KEY_HTTP_STREAM, http_stream_header,
+        GRIP_KEY_CONTENT, content_header,
+        *frames,
+        b",}}}",
+    ))
+
+
+def encode_http_stream_close(channel: bytes) -> bytes:
+    """GRIP item closing every http stream held on the channel"""
+    if settings.hermod_publish_format == "json":
+        item = {
+            "channel": channel.decode(),
+            "formats": {"http-stream": {"action": "close"}},
+        }
+        return ("J" + json.dumps(item)).encode()
+    return GRIP_TNET_PREFIX + _tnet(GRIP_KEY_CHANNEL + _tnet_string(channel) + GRIP_KEY_FORMATS + GRIP_CLOSE_FORMATS, b"}")
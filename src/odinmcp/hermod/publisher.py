@@ -0,0 +1,291 @@
+import asyncio
+import os
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import zmq
+
+from odinmcp import metrics
+from odinmcp.config import settings
+from odinmcp.hermod.event_log import HermodEventLog
+from odinmcp.hermod.framing import encode_http_stream_close, encode_http_stream_content, encode_sse_event
+from odinmcp.hermod.routing import ROUTING_MODE_BROADCAST, HermodRouter
+from odinmcp.tracing import TRACEPARENT_HEADER, TraceContext, current_traceparent, start_span
+
+
+FLUSH_LOCK_STRIPES = 64
+
+
+class HermodPublisher:
+    """
+    Process local publisher for hermod (pushpin) over a persistent zero mq PUB socket.
+
+    SSE frames published on the same channel within `hermod_publish_window_ms` are coalesced
+    into a single GRIP http-stream item. A channel's buffer is flushed when the window elapses,
+    when it grows past `hermod_publish_max_bytes`, or explicitly (responses and terminate).
+    Frames of a channel are always sent in the order they were published.
+
+    Messages published with `publish_event` are appended to the event log when they are flushed:
+    everything a flush sends is logged in one redis round trip, which also gives the frames their ids.
+
+    Publishes only reach the hermod nodes the router maps the channel to (see HermodRouter).
+    """
+
+    def __init__(
+        self,
+        urls: Optional[List[str]] = None,
+        router: Optional[HermodRouter] = None,
+        event_log: Optional[HermodEventLog] = None,
+    ):
+        self._urls = urls or settings.hermod_zero_mq_urls
+        self.router = router or HermodRouter(self._urls)
+        self.event_log = event_log or HermodEventLog()
+        # guards the buffers and the sockets (zero mq sockets are not thread safe)
+        self._lock = threading.RLock()
+        # held while a socket is connected, so the slow joiner wait doesn't hold up publishes on other sockets
+        self._connect_lock = threading.Lock()
+        # held by a flush from taking the buffer until its frames are sent, so a channel's flushes
+        # can't overtake each other while they wait for the event log. striped by channel
+        self._flush_locks = [threading.Lock() for _ in range(FLUSH_LOCK_STRIPES)]
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._sockets: Dict[Tuple[str, ...], zmq.Socket] = {}
+        # (content, is_event): an event is a serialised message, framed and logged when it is flushed
+        self._buffers: Dict[str, List[Tuple[bytes, bool]]] = {}
+        self._buffer_sizes: Dict[str, int] = {}
+        self._timers: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.TimerHandle]] = {}
+        # trace context of the latest frame buffered per channel
+        self._traceparents: Dict[str, str] = {}
+
+    def _check_pid(self) -> None:
+        # never reuse a socket or buffers inherited through a fork
+        if self._pid != os.getpid():
+            self._reset()
+
+    @property
+    def socket(self) -> zmq.Socket:
+        """Socket connected to every hermod node"""
+        return self._connect(tuple(self._urls))
+
+    def connect(self) -> None:
+        """
+        Open every socket publishes may need, e.g. before the first request. The socket connected to
+        every node and, unless every publish is broadcast, one socket per node
+        """
+        self._connect(tuple(self._urls))
+        if self.router.mode != ROUTING_MODE_BROADCAST:
+            for url in self._urls:
+                self._connect((url,))
+
+    def _connect(self, urls: Tuple[str, ...]) -> zmq.Socket:
+        """The socket for a set of nodes, connected on first use. Never call with self._lock held"""
+        with self._lock:
+            self._check_pid()
+            hermod_socket = self._sockets.get(urls)
+        if hermod_socket is not None:
+            return hermod_socket
+        with self._connect_lock:
+            with self._lock:
+                hermod_socket = self._sockets.get(urls)
+            if hermod_socket is not None:
+                return hermod_socket
+            hermod_socket = zmq.Context.instance().socket(zmq.PUB)
+            for url in urls:
+                hermod_socket.connect(url)
+            # PUB sockets drop messages until the connection is established (slow joiner).
+            # The socket is persistent, so this is only paid once per process and node
+            # TODO: wait till socket is ready instead of time
+            time.sleep(0.1)
+            with self._lock:
+                self._sockets[urls] = hermod_socket
+            return hermod_socket
+
+    def publish(self, channel_id: str, content: bytes, flush: bool = False) -> None:
+        """Queue an SSE frame for the channel. The frame is sent with the next flush of the channel"""
+        self._buffer(channel_id, content, False, flush)
+
+    def publish_event(self, channel_id: str, data: bytes, flush: bool = False) -> None:
+        """
+        Queue a serialised JSON-RPC message for the channel. It is appended to the channel's event
+        log and framed as an SSE event carrying its id with the next flush of the channel
+        """
+        self._buffer(channel_id, data, True, flush)
+
+    def _buffer(self, channel_id: str, content: bytes, is_event: bool, flush: bool) -> None:
+        with self._lock:
+            self._check_pid()
+            self._buffers.setdefault(channel_id, []).append((content, is_event))
+            self._buffer_sizes[channel_id] = self._buffer_sizes.get(channel_id, 0) + len(content)
+            traceparent = current_traceparent()
+            if traceparent:
+                self._traceparents[channel_id] = traceparent
+
+            flush = (
+                flush
+                or settings.hermod_publish_window_ms <= 0
+                or self._buffer_sizes[channel_id] >= settings.hermod_publish_max_bytes
+            )
+            if not flush:
+                flush = not self._schedule_flush(channel_id)
+        # flushed outside of the lock, a flush waits for the channel's flush lock
+        if flush:
+            self.flush(channel_id)
+
+    def publish_many(self, channel_ids: List[str], data: bytes) -> None:
+        """
+        Send a serialised JSON-RPC message to each of many channels right away (fan out). It is logged
+        for every channel, together with anything already buffered for them, in one redis round trip
+        """
+        with self._lock:
+            self._check_pid()
+            traceparent = current_traceparent()
+            for channel_id in channel_ids:
+                self._buffers.setdefault(channel_id, []).append((data, True))
+                self._buffer_sizes[channel_id] = self._buffer_sizes.get(channel_id, 0) + len(data)
+                if traceparent:
+                    self._traceparents[channel_id] = traceparent
+        self._flush_channels(channel_ids)
+
+    def _schedule_flush(self, channel_id: str) -> bool:
+        """Flush the channel when the window elapses. False if it has to be flushed right away instead"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # nothing would fire the timer outside of an event loop
+            return False
+        timer_loop, _ = self._timers.get(channel_id, (None, None))
+        if timer_loop is loop:
+            return True
+        # a timer left on another (finished) loop would never fire
+        self._timers[channel_id] = (
+            loop,
+            loop.call_later(settings.hermod_publish_window_ms / 1000, self.flush, channel_id),
+        )
+        return True
+
+    def flush(self, channel_id: Optional[str] = None) -> None:
+        """Send the buffered frames of a channel, or of every channel if none is given"""
+        if channel_id:
+            self._flush_channels([channel_id])
+            return
+        with self._lock:
+            self._check_pid()
+            channel_ids = list(self._buffers)
+        self._flush_channels(channel_ids)
+
+    def close(self, channel_id: str) -> None:
+        """Flush the channel and close every held stream subscribed to it"""
+        self._flush_channels([channel_id], close=True)
+
+    def _flush_channels(self, channel_ids: List[str], close: bool = False) -> None:
+        # stripes are always taken in the same order, so flushes of overlapping channels can't deadlock
+        flush_locks = [self._flush_locks[stripe] for stripe in sorted({self._stripe(channel) for channel in channel_ids})]
+        for flush_lock in flush_locks:
+            flush_lock.acquire()
+        try:
+            pending: Dict[str, Tuple[List[Tuple[bytes, bool]], Optional[str]]] = {}
+            with self._lock:
+                self._check_pid()
+                for channel in channel_ids:
+                    _, timer = self._timers.pop(channel, (None, None))
+                    if timer is not None:
+                        timer.cancel()
+                    entries = self._buffers.pop(channel, None)
+                    self._buffer_sizes.pop(channel, None)
+                    traceparent = self._traceparents.pop(channel, None)
+                    if entries:
+                        pending[channel] = (entries, traceparent)
+
+            # outside of the lock: other channels keep publishing while the events are logged
+            # and while a socket not connected yet waits for its nodes
+            if pending or close:
+                node_sets = {tuple(self._urls)}
+                node_sets.update(tuple(self.router.nodes_for(channel)) for channel in [*pending, *(channel_ids if close else [])])
+                for urls in node_sets:
+                    self._connect(urls)
+            event_ids = self.event_log.append_batch({
+                channel: [content for content, is_event in entries if is_event]
+                for channel, (entries, _) in pending.items()
+            })
+
+            with self._lock:
+                self._check_pid()
+                for channel, (entries, traceparent) in pending.items():
+                    prev_id, ids = event_ids.get(channel, (None, []))
+                    frame_ids = iter(ids)
+                    frames = [
+                        encode_sse_event(content, next(frame_ids)) if is_event else content
+                        for content, is_event in entries
+                    ]
+                    # the item chains on to the channel's previous event, if every event was logged
+                    item_id = ids[-1] if ids and None not in ids else None
+                    self._send_content(
+                        channel, frames, sum(len(frame) for frame in frames), traceparent,
+                        item_id=item_id, prev_id=prev_id if item_id else None,
+                    )
+                if close:
+                    for channel in channel_ids:
+                        self._send(channel, encode_http_stream_close(channel.encode()))
+        finally:
+            for flush_lock in reversed(flush_locks):
+                flush_lock.release()
+
+    @staticmethod
+    def _stripe(channel_id: str) -> int:
+        return zlib.crc32(channel_id.encode()) % FLUSH_LOCK_STRIPES
+
+    def _send_content(
+        self,
+        channel_id: str,
+        frames: List[bytes],
+        size: int,
+        traceparent: Optional[str] = None,
+        item_id: Optional[str] = None,
+        prev_id: Optional[str] = None,
+    ) -> None:
+        channel = channel_id.encode()
+        chunk_size = settings.hermod_publish_chunk_bytes
+        # flushes may run from a timer, outside of the publishing request. so the span's parent is explicit
+        with start_span("hermod.publish", TraceContext.from_traceparent(traceparent), frames=len(frames), bytes=size):
+            meta = {TRACEPARENT_HEADER: traceparent} if traceparent else None
+            # json items can't carry a utf-8 sequence split in half, so they are never chunked
+            if not chunk_size or size <= chunk_size or settings.hermod_publish_format == "json":
+                self._send(channel_id, encode_http_stream_content(channel, frames, meta, item_id, prev_id))
+                return
+            # stream large content to the client as consecutive items, sent back to back on one socket.
+            # the chunks chain on to each other, the last one carries the id of the flush
+            content = memoryview(b"".join(frames))
+            offsets = range(0, len(content), chunk_size)
+            for number, offset in enumerate(offsets):
+                chunk_id = item_id if not item_id or number == len(offsets) - 1 else f"{item_id}.{number}"
+                self._send(channel_id, encode_http_stream_content(
+                    channel, [content[offset:offset + chunk_size]], meta, chunk_id, prev_id,
+                ))
+                prev_id = chunk_id
+
+    def _send(self, channel_id: str, item: bytes) -> None:
+        # one socket per set of nodes, connected by the flush. broadcast publishes share the socket connected to every node
+        hermod_socket = self._sockets.get(tuple(self.router.nodes_for(channel_id)))
+        if hermod_socket is None:
+            # the channel's route changed since the flush connected. every node is always a correct target
+            hermod_socket = self._sockets[tuple(self._urls)]
+        # zero copy: the frame is handed to zmq as is
+        with metrics.hermod_publish_seconds.time():
+            hermod_socket.send_multipart([channel_id.encode(), item], copy=False)
+        metrics.hermod_publishes.inc()
+        metrics.hermod_publish_bytes.inc(len(item))
+
+
+_publisher: Optional[HermodPublisher] = None
+
+
+def get_hermod_publisher() -> HermodPublisher:
+    """Returns the process wide hermod publisher"""
+    global _publisher
+    if _publisher is None:
+        _publisher = HermodPublisher()
+    return _publisher
@@ -0,0 +1,126 @@
+import hashlib
+import logging
+from typing import List, Optional
+
+import redis
+
+from odinmcp.config import settings
+from odinmcp.store import LocalCache, get_redis, redis_key
+from odinmcp import metrics
+
+
+logger = logging.getLogger(__name__)
+
+ROUTING_MODE_BROADCAST = "broadcast"
+ROUTING_MODE_HASH = "hash"
+ROUTING_MODE_REGISTRY = "registry"
+
+
+def deployment_channel() -> str:
+    """Broadcast group of every session of the deployment"""
+    return f"{settings.hermod_broadcast_prefix}:all"
+
+
+def user_channel(user_id: str) -> str:
+    """Broadcast group of every session of a user. Hashed, user ids can hold any character"""
+    return f"{settings.hermod_broadcast_prefix}:user:{hashlib.sha256(user_id.encode()).hexdigest()[:32]}"
+
+
+def broadcast_channels(user_id: Optional[str]) -> List[str]:
+    """The broadcast groups a session's stream hold subscribes to"""
+    if not settings.hermod_broadcast_enabled:
+        return []
+    channels = [deployment_channel()]
+    if user_id:
+        channels.append(user_channel(user_id))
+    return channels
+
+
+def is_broadcast_channel(channel_id: str) -> bool:
+    return channel_id.startswith(f"{settings.hermod_broadcast_prefix}:")
+
+
+class HermodRouter:
+    """
+    Maps channels to the hermod (pushpin) nodes that hold their subscribers.
+
+    - broadcast: every node receives every publish (default)
+    - hash (experimental): each channel belongs to exactly one node, chosen by rendezvous hashing
+      over `hermod_zero_mq_urls`. The load balancer in front of hermod must route every stream to
+      that same node, which means reproducing `hash_node` over the zero mq urls. Nothing here does
+      that for you, prefer registry.
+    - registry: the node that forwarded the stream hold (`hermod_node_header`) is recorded per
+      channel. Channels without a registered node fall back to broadcast.
+    """
+
+    def __init__(self, urls: Optional[List[str]] = None, redis_client: Optional[redis.Redis] = None):
+        self.urls = list(urls or settings.hermod_zero_mq_urls)
+        self._redis = redis_client
+        self._cache = LocalCache(ttl=settings.hermod_routing_cache_ttl)
+        metrics.registry.register_cache("hermod_routes", self._cache)
+        if self.mode == ROUTING_MODE_HASH:
+            logger.warning(
+                "hermod_routing_mode 'hash' is experimental: streams are lost unless the load balancer "
+                "routes each session to the node HermodRouter.hash_node picks"
+            )
+
+    @property
+    def redis(self) -> redis.Redis:
+        return self._redis or get_redis()
+
+    @property
+    def mode(self) -> str:
+        return settings.hermod_routing_mode
+
+    def nodes_for(self, channel_id: str) -> List[str]:
+        """Returns the urls of the hermod nodes a publish on the channel has to reach"""
+        if is_broadcast_channel(channel_id):
+            # broadcast groups have subscribers on every node
+            return self.urls
+        if self.mode == ROUTING_MODE_HASH:
+            return [self.hash_node(channel_id)]
+        if self.mode == ROUTING_MODE_REGISTRY:
+            node = self.lookup(channel_id)
+            return [node] if node else self.urls
+        return self.urls
+
+    def hash_node(self, channel_id: str) -> str:
+        # rendezvous hashing: adding or removing a node only moves the channels of that node
+        return max(
+            self.urls,
+            key=lambda url: hashlib.sha1(f"{url}|{channel_id}".encode()).digest(),
+        )
+
+    def register(self, channel_id: str, node: str) -> bool:
+        """Record the node holding the channel's stream. Unknown nodes are ignored"""
+        if node not in self.urls:
+            return False
+        try:
+            self.redis.set(redis_key("route", channel_id), node, ex=settings.hermod_routing_ttl)
+        except redis.RedisError as e:
+            logger.warning("Could not register hermod node for channel: %s", e)
+            return False
+        self._cache.set(channel_id, node)
+        return True
+
+    def lookup(self, channel_id: str) -> Optional[str]:
+        node = self._cache.get(channel_id)
+        if node is not None:
+            return node
+        try:
+            node = self.redis.get(redis_key("route", channel_id))
+        except redis.RedisError as e:
+            logger.warning("Could not look up hermod node for channel: %s", e)
+            return None
+        node = node.decode() if isinstance(node, bytes) else node
+        if node not in self.urls:
+            return None
+        self._cache.set(channel_id, node)
+        return node
+
+    def forget(self, channel_id: str) -> None:
+        self._cache.delete(channel_id)
+        try:
+            self.redis.delete(redis_key("route", channel_id))
+        except redis.RedisError as e:
+            logger.warning("Could not delete hermod route for channel: %s", e)
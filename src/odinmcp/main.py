@@ -1,46 +1,15 @@
-from http import HTTPStatus
-import json
-from typing import Any, Generic, List, Optional, Type
+from typing import Any, List, Optional, Type
 from mcp.server.lowlevel.server import LifespanResultT
-from uuid import uuid4
-from mcp.server.fastmcp import FastMCP 
 from starlette.applications import Starlette
-from starlette.requests import Request
-from starlette.responses import Response
-from starlette.routing import Mount, Route
-from starlette.exceptions import HTTPException
-from starlette.types import Receive, Scope, Send
-from mcp.types import JSONRPCMessage, JSONRPCResponse, InitializeResult, JSONRPCRequest, JSONRPCError, ErrorData, PARSE_ERROR, INVALID_REQUEST, INVALID_PARAMS, INTERNAL_ERROR, LATEST_PROTOCOL_VERSION, LoggingCapability, PromptsCapability, ResourcesCapability, ToolsCapability, JSONRPCNotification
 from mcp.server.lowlevel.server import Server as MCPServer, lifespan as default_lifespan
-from contextlib import AbstractAsyncContextManager, AsyncExitStack, asynccontextmanager
-from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
-from pydantic_settings import BaseSettings, SettingsConfigDict
-from starlette.middleware.base import BaseHTTPMiddleware
+from contextlib import AbstractAsyncContextManager
 from starlette.middleware import Middleware
 
-from odinmcp.models.auth import CurrentUser
-from odinmcp.web.middleware.heimdall import HeimdallCurrentUserMiddleware
-from odinmcp.web.middleware.hermod import HermodStreamingMiddleware
 from odinmcp.config import settings
-from odinmcp.web.transports.http_streaming import OdinHttpStreamingTransport
+from odinmcp.models.auth import CurrentUser
 from odinmcp.web import OdinWeb
-from odinmcp.constants import (
-    MCP_SESSION_ID_HEADER,
-    LAST_EVENT_ID_HEADER,
-    CONTENT_TYPE_HEADER,
-    ACCEPT_HEADER,
-    CONTENT_TYPE_JSON,
-    CONTENT_TYPE_SSE,
-    HERMOD_GRIP_HOLD_HEADER,
-    HERMOD_GRIP_HOLD_MODE,
-    HERMOD_GRIP_CHANNEL_HEADER
-)
-
-from odinmcp.config import settings
-from celery import Celery
-from celery.contrib.abortable import AbortableTask
 from odinmcp.worker import OdinWorker
-from mcp.server.fastmcp.server import FastMCP, Context
+from mcp.server.fastmcp.server import Context
 from mcp.server.fastmcp.server import ToolManager, ResourceManager, PromptManager, _convert_to_content
 from mcp.types import Prompt as MCPPrompt
 from mcp.types import PromptArgument as MCPPromptArgument
@@ -52,11 +21,24 @@ from mcp.types import (
     EmbeddedResource,
     GetPromptResult,
     ImageContent,
+    LoggingLevel,
+    PromptListChangedNotification,
+    ResourceListChangedNotification,
+    ResourceUpdatedNotification,
+    ResourceUpdatedNotificationParams,
+    ServerNotification,
     TextContent,
     ToolAnnotations,
+    ToolListChangedNotification,
 )
 from odinmcp.worker.session import OdinWorkerSession
-from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Sequence
+from odinmcp.profiling import profile_tool_call
+from odinmcp.worker.pool import pooled
+from odinmcp.store.log_levels import get_channel_log_levels
+from odinmcp.store.subscriptions import get_resource_subscriptions
+from odinmcp.hermod.fanout import broadcast, publish_to_channels
+from odinmcp.hermod.framing import encode_jsonrpc_notification
+from collections.abc import Callable, Iterable, Sequence
 from pydantic.networks import AnyUrl
 from mcp.server.lowlevel.helper_types import ReadResourceContents
 from mcp.server.fastmcp.exceptions import ResourceError
@@ -92,6 +74,10 @@ class OdinMCP:
         self._setup_handlers()
 
 
+        self._tool_manager = ToolManager()
+        self._resource_manager = ResourceManager()
+        self._prompt_manager = PromptManager()
+
         self.worker = OdinWorker(
             self.mcp_server,
             current_user_model,
@@ -100,13 +86,11 @@ class OdinMCP:
             self.mcp_server,
             current_user_model,
             self.worker,
+            tool_manager=self._tool_manager,
         )
 
         self.current_user_model = current_user_model
-
-        self._tool_manager = ToolManager()
-        self._resource_manager = ResourceManager()
-        self._prompt_manager = PromptManager()
+        self.worker.add_warm_up(self._warm_up)
         
         self.extra_middleware = extra_middleware
 
@@ -124,6 +108,13 @@ class OdinMCP:
         return self.web.build(extra_middleware=self.extra_middleware), self.worker.get_worker()
         
 
+    def _warm_up(self) -> None:
+        """Finish building the argument models of the tools (deferred on forward references)"""
+        for tool in self._tool_manager.list_tools():
+            arg_model = tool.fn_metadata.arg_model
+            if not arg_model.__pydantic_complete__:
+                arg_model.model_rebuild()
+
     def _setup_handlers(self) -> None:
         """Set up core MCP protocol handlers."""
         self.mcp_server.list_tools()(self.list_tools)
@@ -133,6 +124,9 @@ class OdinMCP:
         self.mcp_server.list_prompts()(self.list_prompts)
         self.mcp_server.get_prompt()(self.get_prompt)
         self.mcp_server.list_resource_templates()(self.list_resource_templates)
+        self.mcp_server.set_logging_level()(self.set_logging_level)
+        self.mcp_server.subscribe_resource()(self.subscribe_resource)
+        self.mcp_server.unsubscribe_resource()(self.unsubscribe_resource)
 
 
 
@@ -160,15 +154,73 @@ class OdinMCP:
             request_context = None
         return Context(request_context=request_context, fastmcp=self)
 
+    async def set_logging_level(self, level: LoggingLevel) -> None:
+        """Store the client's minimum log level for its channel"""
+        session: OdinWorkerSession = self.mcp_server.request_context.session
+        get_channel_log_levels().set_level(session.channel_id, level)
+
+    async def subscribe_resource(self, uri: AnyUrl) -> None:
+        """Subscribe the client's channel to updates of the resource"""
+        session: OdinWorkerSession = self.mcp_server.request_context.session
+        get_resource_subscriptions().subscribe(str(uri), session.channel_id)
+
+    async def unsubscribe_resource(self, uri: AnyUrl) -> None:
+        session: OdinWorkerSession = self.mcp_server.request_context.session
+        get_resource_subscriptions().unsubscribe(str(uri), session.channel_id)
+
+    def notify_resource_updated(self, uri: AnyUrl | str) -> int:
+        """
+        Send notifications/resources/updated to every channel subscribed to the resource.
+        Needs no request: call it from a tool, a worker or any process sharing redis and hermod.
+        Returns the number of channels notified.
+        """
+        uri = str(uri)
+        channel_ids = get_resource_subscriptions().subscribers(uri)
+        if not channel_ids:
+            return 0
+        notification = ServerNotification(
+            ResourceUpdatedNotification(
+                method="notifications/resources/updated",
+                params=ResourceUpdatedNotificationParams(uri=uri),
+            )
+        )
+        return len(publish_to_channels(channel_ids, encode_jsonrpc_notification(notification)))
+
+    def notify_tools_list_changed(self, user_id: str | None = None) -> None:
+        """
+        Send notifications/tools/list_changed to every connected session, or to every session of
+        one user, with a single hermod publish. Needs no request, like notify_resource_updated.
+        """
+        self._broadcast(ToolListChangedNotification(method="notifications/tools/list_changed"), user_id)
+
+    def notify_prompts_list_changed(self, user_id: str | None = None) -> None:
+        self._broadcast(PromptListChangedNotification(method="notifications/prompts/list_changed"), user_id)
+
+    def notify_resources_list_changed(self, user_id: str | None = None) -> None:
+        self._broadcast(ResourceListChangedNotification(method="notifications/resources/list_changed"), user_id)
+
+    def _broadcast(self, notification: Any, user_id: str | None) -> None:
+        if not settings.hermod_broadcast_enabled:
+            raise RuntimeError("hermod_broadcast_enabled is off, sessions are not subscribed to broadcast groups")
+        broadcast(encode_jsonrpc_notification(ServerNotification(notification)), user_id)
+
     async def call_tool(
         self, name: str, arguments: dict[str, Any]
     ) -> Sequence[TextContent | ImageContent | EmbeddedResource]:
         """Call a tool by name with arguments."""
         context = self.get_context()
-        result = await self._tool_manager.call_tool(name, arguments, context=context)
+        with profile_tool_call(name, arguments, self._profiled_user_id(context)):
+            result = await self._tool_manager.call_tool(name, arguments, context=context)
         converted_result = _convert_to_content(result)
         return converted_result
 
+    def _profiled_user_id(self, context: Context) -> str | None:
+        # only looked up for the profiler. outside a request there is no session, and no user
+        if not settings.profiling_enabled or context._request_context is None:
+            return None
+        current_user = getattr(context._request_context.session, "current_user", None)
+        return current_user.user_id if current_user else None
+
     async def list_resources(self) -> list[MCPResource]:
         """List all available resources."""
 
@@ -213,6 +265,8 @@ class OdinMCP:
         name: str | None = None,
         description: str | None = None,
         annotations: ToolAnnotations | None = None,
+        executor: str | None = None,
+        timeout: float | None = None,
     ) -> None:
         """Add a tool to the server.
 
@@ -224,16 +278,29 @@ class OdinMCP:
             name: Optional name for the tool (defaults to function name)
             description: Optional description of what the tool does
             annotations: Optional ToolAnnotations providing additional tool information
+            executor: Optional "process" or "thread" to run a synchronous, CPU bound tool in a
+                pool of the worker process instead of on its event loop
+            timeout: Optional seconds before a pooled call is stopped (defaults to tool_executor_timeout)
         """
-        self._tool_manager.add_tool(
+        tool = self._tool_manager.add_tool(
             fn, name=name, description=description, annotations=annotations
         )
+        if executor is not None:
+            if tool.is_async:
+                raise ValueError(f"Tool {tool.name}: only synchronous tools can run in an executor")
+            if tool.context_kwarg is not None:
+                raise ValueError(f"Tool {tool.name}: tools running in an executor can't take a Context")
+            # validated against the original signature, then awaited from the pool
+            tool.fn = pooled(fn, executor, timeout)
+            tool.is_async = True
 
     def tool(
         self,
         name: str | None = None,
         description: str | None = None,
         annotations: ToolAnnotations | None = None,
+        executor: str | None = None,
+        timeout: float | None = None,
     ) -> Callable[[AnyFunction], AnyFunction]:
         """Decorator to register a tool.
 
@@ -245,6 +312,9 @@ class OdinMCP:
             name: Optional name for the tool (defaults to function name)
             description: Optional description of what the tool does
             annotations: Optional ToolAnnotations providing additional tool information
+            executor: Optional "process" or "thread" for synchronous, CPU bound tools. "process"
+                tools must be module level functions (they are pickled by reference)
+            timeout: Optional seconds before a pooled call is stopped
 
         Example:
             @server.tool()
@@ -260,6 +330,10 @@ class OdinMCP:
             async def async_tool(x: int, context: Context) -> str:
                 await context.report_progress(50, 100)
                 return str(x)
+
+            @server.tool(executor="process", timeout=30)
+            def cpu_heavy_tool(document: str) -> dict:
+                return parse(document)
         """
         # Check if user passed function directly instead of calling decorator
         if callable(name):
@@ -270,7 +344,8 @@ class OdinMCP:
 
         def decorator(fn: AnyFunction) -> AnyFunction:
             self.add_tool(
-                fn, name=name, description=description, annotations=annotations
+                fn, name=name, description=description, annotations=annotations,
+                executor=executor, timeout=timeout,
             )
             return fn
 
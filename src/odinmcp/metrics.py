@@ -0,0 +1,266 @@
+"""
+Dependency free metrics in the prometheus text exposition format.
+
+Metrics are process local. The web app serves them on `/metrics` and every worker process on a
+sidecar http endpoint (`metrics_worker_port` + the pool process index). With `metrics_enabled`
+off, recording is a single attribute check.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from odinmcp.config import settings
+from odinmcp.store.cache import LocalCache
+
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE_METRICS = "text/plain; version=0.0.4; charset=utf-8"
+# label values past `metrics_max_series` per metric are folded into this one, to bound memory
+OVERFLOW_LABEL_VALUE = "__overflow__"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str], series: Dict[LabelValues, object]) -> LabelValues:
+        values = tuple(str(labels.get(label, "")) for label in self.labels)
+        if values not in series and len(series) >= settings.metrics_max_series:
+            return (OVERFLOW_LABEL_VALUE,) * len(self.labels)
+        return values
+
+    def _format_labels(self, values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labels, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{label}="{_escape(value)}"' for label, value in pairs) + "}"
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.type}\n"
+        return header + "".join(f"{sample}\n" for sample in self.samples())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if not settings.metrics_enabled:
+            return
+        with self._lock:
+            key = self._label_values(labels, self._values)
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{self._format_labels(key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per series: [count per bucket (the last one is +Inf), sum]
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not settings.metrics_enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            key = self._label_values(labels, self._series)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        if not settings.metrics_enabled:
+            yield
+            return
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            series = [(key, list(counts), total[0]) for key, (counts, total) in self._series.items()]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{self._format_labels(key, ('le', _format_value(float(bound))))} {cumulative}"
+            yield f"{self.name}_sum{self._format_labels(key)} {_format_value(total)}"
+            yield f"{self.name}_count{self._format_labels(key)} {cumulative}"
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._caches: Dict[str, LocalCache] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def register_cache(self, name: str, cache: LocalCache) -> None:
+        """Report hits, misses and size of a local cache on every scrape"""
+        with self._lock:
+            self._caches[name] = cache
+
+    def _render_caches(self) -> str:
+        with self._lock:
+            caches = sorted(self._caches.items())
+        lines = []
+        for metric, metric_type, documentation, read in (
+            ("odinmcp_cache_hits_total", "counter", "Local cache hits", lambda cache: cache.hits),
+            ("odinmcp_cache_misses_total", "counter", "Local cache misses", lambda cache: cache.misses),
+            ("odinmcp_cache_entries", "gauge", "Entries in the local cache", len),
+        ):
+            lines.append(f"# HELP {metric} {documentation}\n# TYPE {metric} {metric_type}\n")
+            lines.extend(f'{metric}{{cache="{_escape(name)}"}} {read(cache)}\n' for name, cache in caches)
+        return "".join(lines)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(metric.render() for metric in metrics) + self._render_caches()
+
+
+registry = MetricsRegistry()
+
+# web tier
+web_requests = registry.counter(
+    "odinmcp_web_requests_total", "Requests handled by the mcp endpoint", ("http_method", "rpc_method", "status"),
+)
+web_request_seconds = registry.histogram(
+    "odinmcp_web_request_seconds", "Time spent in the web transport", ("http_method", "rpc_method"),
+)
+web_rejected_requests = registry.counter(
+    "odinmcp_web_rejected_requests_total", "Requests rejected by the web tier instead of being enqueued", ("rpc_method",),
+)
+web_duplicate_requests = registry.counter(
+    "odinmcp_web_duplicate_requests_total", "Retried requests acknowledged without being enqueued again", ("rpc_method",),
+)
+
+# workers
+requests = registry.counter(
+    "odinmcp_requests_total", "Requests handled by workers, by outcome (ok, error code, cancelled or skipped)",
+    ("method", "tool", "status"),
+)
+request_stage_seconds = registry.histogram(
+    "odinmcp_request_stage_seconds", "Time a request spent in each stage (queue, lifespan, handler, response)",
+    ("stage", "method", "tool"),
+)
+cancelled_requests = registry.counter(
+    "odinmcp_cancelled_requests_total", "Requests cancelled, by how far they got (queued, before_start, running)",
+    ("stage",),
+)
+cancelled_elapsed_seconds = registry.counter(
+    "odinmcp_cancelled_elapsed_seconds_total",
+    "Time cancelled requests had already run when they were stopped (not the work their cancellation saved)",
+)
+suppressed_log_messages = registry.counter(
+    "odinmcp_suppressed_log_messages_total", "Log notifications dropped below the channel's logging/setLevel level",
+    ("level",),
+)
+
+# hermod
+hermod_publishes = registry.counter("odinmcp_hermod_publishes_total", "GRIP items sent to hermod")
+hermod_publish_bytes = registry.counter("odinmcp_hermod_publish_bytes_total", "Bytes of GRIP items sent to hermod")
+hermod_publish_seconds = registry.histogram(
+    "odinmcp_hermod_publish_seconds", "Time spent sending a GRIP item to hermod",
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.1),
+)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE_METRICS)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server_pid: Optional[int] = None
+
+
+def start_metrics_server(port: int) -> None:
+    """Serve the registry over http on a daemon thread. Once per process"""
+    global _server_pid
+    if _server_pid == os.getpid():
+        return
+    _server_pid = os.getpid()
+    try:
+        server = ThreadingHTTPServer(("", port), _MetricsHandler)
+    except OSError as e:
+        logger.warning("Could not start the metrics server on port %s: %s", port, e)
+        return
+    threading.Thread(target=server.serve_forever, name="odinmcp-metrics", daemon=True).start()
@@ -1,8 +1,9 @@
 from pydantic import BaseModel, Field
-from typing import Any, Dict, List, TypeVar
+from typing import Any, Dict, List, Optional, TypeVar
 import jwt
 import time
 from odinmcp.config import settings
+from odinmcp.store.sessions import get_session_store, is_opaque_session_id
 
 
 class Organization(BaseModel):
@@ -28,7 +29,15 @@ class CurrentUser(BaseModel):
         
     # method to create a streaming token for the user
     # {user_id + session_id + timestamp}
-    def create_hermod_streaming_token(self, initialization_params: dict) -> str:
+    def create_hermod_streaming_token(self, initialization_params: dict, initialize_result: Optional[dict] = None) -> str:
+        if settings.session_store_enabled:
+            # opaque id, the client params and the negotiated capabilities stay on the server
+            channel_id = get_session_store().create(
+                self.user_id, self.session_id, initialization_params, initialize_result=initialize_result,
+            )
+            if channel_id is not None:
+                return channel_id
+            # the store is unavailable. a self contained token still lets the client in
         payload = {
             "user_id": self.user_id,
             "session_id": self.session_id,
@@ -42,6 +51,11 @@ class CurrentUser(BaseModel):
     # check with jwt secret and also check if the user_id, session_id are valid
     
     def validate_hermod_streaming_token(self, token:str) -> bool:
+        if is_opaque_session_id(token):
+            record = get_session_store().get(token)
+            if not record or record["user_id"] != self.user_id or record["session_id"] != self.session_id:
+                return False
+            return record
         try:
             payload = jwt.decode(token, settings.hermod_streaming_token_secret, algorithms=["HS256"])
             if payload["user_id"] != self.user_id or payload["session_id"] != self.session_id:
@@ -0,0 +1,221 @@
+"""
+Per tool profiling and a flight recorder for slow calls.
+
+With `profiling_enabled`, `profiling_sample_rate` of all tool calls run under cProfile. Calls
+slower than `profiling_slow_call_ms` are captured by a low overhead stack sampler. Captured
+profiles are kept in a bounded ring of files under `profiling_dir`, together with the tool
+name, the argument sizes and the user. `odinmcp profiles list|dump` reads them back.
+"""
+import cProfile
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from odinmcp.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_KIND_CPROFILE = "cprofile"
+PROFILE_KIND_SAMPLED = "sampled"
+
+
+class StackSampler:
+    """
+    Samples the stacks of registered threads every `interval` seconds, on one daemon thread
+    per process. The thread sleeps while nothing is being recorded.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._recordings: Dict[int, Counter] = {}
+        self._wakeup = threading.Event()
+        self._pid: Optional[int] = None
+
+    def start(self, thread_id: int) -> Counter:
+        """Start recording a thread. Returns the folded stack counts, filled in as it runs"""
+        samples: Counter = Counter()
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name="odinmcp-profiler", daemon=True).start()
+            self._recordings[thread_id] = samples
+        self._wakeup.set()
+        return samples
+
+    def stop(self, thread_id: int) -> None:
+        with self._lock:
+            self._recordings.pop(thread_id, None)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                if not self._recordings:
+                    self._wakeup.clear()
+                    continue
+                # under the lock, so a stopped recording is never written to again
+                frames = sys._current_frames()
+                for thread_id, samples in self._recordings.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[_fold(frame)] += 1
+            time.sleep(self.interval)
+
+
+def _fold(frame) -> str:
+    # "outer;inner;innermost", the folded format flame graph tools read
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class ProfileStore:
+    """Bounded on disk ring of captured profiles. Each profile is a metadata file and a data file"""
+
+    def __init__(self, path: Optional[str] = None, max_profiles: Optional[int] = None):
+        self.path = path or settings.profiling_dir
+        self.max_profiles = max_profiles or settings.profiling_max_profiles
+
+    def save(self, metadata: Dict[str, Any], data: bytes) -> str:
+        os.makedirs(self.path, exist_ok=True)
+        # ids sort by creation time
+        profile_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        metadata = {**metadata, "id": profile_id}
+        with open(os.path.join(self.path, f"{profile_id}.data"), "wb") as f:
+            f.write(data)
+        # metadata last: a profile is only listed once its data is complete
+        with open(os.path.join(self.path, f"{profile_id}.json"), "w") as f:
+            json.dump(metadata, f)
+        self._trim()
+        return profile_id
+
+    def list(self) -> List[Dict[str, Any]]:
+        profiles = []
+        for profile_id in self._ids():
+            try:
+                with open(os.path.join(self.path, f"{profile_id}.json")) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def get(self, profile_id: str) -> tuple[Dict[str, Any], bytes]:
+        try:
+            with open(os.path.join(self.path, f"{profile_id}.json")) as f:
+                metadata = json.load(f)
+            with open(os.path.join(self.path, f"{profile_id}.data"), "rb") as f:
+                return metadata, f.read()
+        except FileNotFoundError:
+            raise KeyError(profile_id)
+
+    def _ids(self) -> List[str]:
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len(".json")] for name in names if name.endswith(".json"))
+
+    def _trim(self) -> None:
+        ids = self._ids()
+        for profile_id in ids[:max(len(ids) - self.max_profiles, 0)]:
+            for suffix in (".json", ".data"):
+                try:
+                    os.unlink(os.path.join(self.path, profile_id + suffix))
+                except FileNotFoundError:
+                    pass
+
+
+class _LoadedStats:
+    # pstats loads from profiler like objects too, which saves writing the data to a temp file
+    def __init__(self, stats: Dict):
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+def format_profile(metadata: Dict[str, Any], data: bytes, sort: str = "cumulative", limit: int = 30) -> str:
+    """Human readable report of a captured profile"""
+    if metadata.get("kind") == PROFILE_KIND_CPROFILE:
+        out = io.StringIO()
+        stats = pstats.Stats(_LoadedStats(marshal.loads(data)), stream=out)
+        stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+    return data.decode()
+
+
+_sampler: Optional[StackSampler] = None
+
+
+def _get_sampler() -> StackSampler:
+    global _sampler
+    if _sampler is None:
+        _sampler = StackSampler(settings.profiling_sample_interval_ms / 1000)
+    return _sampler
+
+
+def _argument_sizes(arguments: Dict[str, Any]) -> Dict[str, int]:
+    return {key: len(json.dumps(value, default=str)) for key, value in (arguments or {}).items()}
+
+
+@contextmanager
+def profile_tool_call(tool: str, arguments: Dict[str, Any], user_id: Optional[str] = None) -> Iterator[None]:
+    """Profile the tool call in the block, if it is sampled or turns out to be slow"""
+    if not settings.profiling_enabled:
+        yield
+        return
+    slow_call_ms = settings.profiling_slow_call_ms
+
+    profiler = None
+    samples = None
+    thread_id = threading.get_ident()
+    if random.random() < settings.profiling_sample_rate:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif slow_call_ms:
+        samples = _get_sampler().start(thread_id)
+
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - started_at) * 1000
+        if profiler is not None:
+            profiler.disable()
+        if samples is not None:
+            _get_sampler().stop(thread_id)
+        if profiler is not None or (samples and duration_ms >= slow_call_ms):
+            metadata = {
+                "tool": tool,
+                "user_id": user_id,
+                "duration_ms": duration_ms,
+                "argument_sizes": _argument_sizes(arguments),
+                "kind": PROFILE_KIND_CPROFILE if profiler is not None else PROFILE_KIND_SAMPLED,
+                "created_at": time.time(),
+                "pid": os.getpid(),
+            }
+            if profiler is not None:
+                profiler.create_stats()
+                data = marshal.dumps(profiler.stats)
+            else:
+                data = "".join(f"{stack} {count}\n" for stack, count in samples.most_common()).encode()
+            try:
+                ProfileStore().save(metadata, data)
+            except OSError as e:
+                logger.warning("Could not save profile of tool %s: %s", tool, e)
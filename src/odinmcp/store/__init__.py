@@ -0,0 +1,87 @@
+import hashlib
+import logging
+import os
+from contextlib import contextmanager
+from typing import Callable, Generic, Iterator, Optional, TypeVar
+
+import redis
+
+from odinmcp.config import settings
+from odinmcp.store.cache import LocalCache
+
+
+_redis_client: redis.Redis | None = None
+_redis_client_pid: int | None = None
+
+
+def get_redis() -> redis.Redis:
+    """
+    Returns a process local redis client.
+    The client is re-created after a fork so connections are never shared between processes.
+    """
+    global _redis_client, _redis_client_pid
+    if _redis_client is None or _redis_client_pid != os.getpid():
+        _redis_client = redis.Redis.from_url(settings.redis_url)
+        _redis_client_pid = os.getpid()
+    return _redis_client
+
+
+def set_redis(client: redis.Redis) -> None:
+    """Use the given client in this process, e.g. an in-memory stand-in for benchmarks"""
+    global _redis_client, _redis_client_pid
+    _redis_client = client
+    _redis_client_pid = os.getpid()
+
+
+def redis_key(namespace: str, identifier: str) -> str:
+    """
+    Build a namespaced redis key.
+    Identifiers (channel ids are JWTs) are hashed to keep keys short.
+    """
+    digest = hashlib.sha256(identifier.encode()).hexdigest()
+    return f"{settings.redis_key_prefix}:{namespace}:{digest}"
+
+
+@contextmanager
+def fail_open(logger: logging.Logger, action: str) -> Iterator[None]:
+    """
+    Log a redis error raised in the block as a warning ("Could not <action>") instead of raising it.
+    Whatever the block did not get to assign keeps its fallback value.
+    """
+    try:
+        yield
+    except redis.RedisError as e:
+        logger.warning("Could not %s: %s", action, e)
+
+
+T = TypeVar("T")
+
+
+class ProcessLocal(Generic[T]):
+    """
+    Accessor for one instance per process, built on first use.
+    Stores are shared through it so their local caches are too.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._instance: Optional[T] = None
+
+    def __call__(self) -> T:
+        if self._instance is None:
+            self._instance = self._factory()
+        return self._instance
+
+    def reset(self) -> None:
+        """Drop the instance (and its cache), the next call builds a new one"""
+        self._instance = None
+
+
+__all__ = [
+    "LocalCache",
+    "ProcessLocal",
+    "fail_open",
+    "get_redis",
+    "redis_key",
+    "set_redis",
+]
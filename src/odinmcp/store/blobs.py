@@ -0,0 +1,184 @@
+"""
+Large payload offload.
+
+Payloads above `blob_offload_threshold_bytes` (tool arguments, client responses, logged events) are
+written to a blob store and only a small reference travels through celery, the result backend and
+the event log. References are resolved lazily, where the payload is actually used.
+"""
+import json
+import logging
+import mmap
+import os
+import time
+import uuid
+from typing import Optional, Union
+
+import redis
+
+from odinmcp.config import settings
+from odinmcp.store import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+BLOB_REF_KEY = "$odinmcp_blob"
+# references are always dumped with the key first, so they can be detected without parsing
+BLOB_REF_PREFIX = '{"' + BLOB_REF_KEY + '"'
+
+Payload = Union[str, bytes]
+
+
+class BlobStore:
+    """Stores immutable blobs for a limited time"""
+
+    def put(self, data: bytes) -> str:
+        raise NotImplementedError
+
+    def get(self, blob_id: str) -> Union[bytes, memoryview]:
+        raise NotImplementedError
+
+    def delete(self, blob_id: str) -> None:
+        raise NotImplementedError
+
+
+class RedisBlobStore(BlobStore):
+    """
+    Stores blobs as fixed size chunks in redis, written and read in a single pipeline.
+    Point `blob_store_redis_url` at a separate instance to keep blobs away from the broker.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self._redis = redis_client
+
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None and settings.blob_store_redis_url:
+            self._redis = redis.Redis.from_url(settings.blob_store_redis_url)
+        return self._redis or get_redis()
+
+    def _key(self, blob_id: str) -> str:
+        return f"{settings.redis_key_prefix}:blob:{blob_id}"
+
+    def put(self, data: bytes) -> str:
+        blob_id = uuid.uuid4().hex
+        key = self._key(blob_id)
+        chunk_size = settings.blob_chunk_bytes
+        view = memoryview(data)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(key)
+        for offset in range(0, len(view), chunk_size):
+            pipe.rpush(key, view[offset:offset + chunk_size].tobytes())
+        pipe.expire(key, settings.blob_store_ttl)
+        pipe.execute()
+        return blob_id
+
+    def get(self, blob_id: str) -> bytes:
+        chunks = self.redis.lrange(self._key(blob_id), 0, -1)
+        if not chunks:
+            raise KeyError(blob_id)
+        return b"".join(chunks)
+
+    def delete(self, blob_id: str) -> None:
+        self.redis.delete(self._key(blob_id))
+
+
+class FileBlobStore(BlobStore):
+    """
+    Stores blobs as files under `blob_store_path`, read back through a memory map.
+    Only usable when the web server and every worker share that filesystem.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.blob_store_path
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, blob_id: str) -> str:
+        return os.path.join(self.path, blob_id)
+
+    def put(self, data: bytes) -> str:
+        blob_id = uuid.uuid4().hex
+        # write then rename so readers never see a partial blob
+        tmp_file = self._file(blob_id) + ".tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(data)
+        os.replace(tmp_file, self._file(blob_id))
+        self._expire()
+        return blob_id
+
+    def get(self, blob_id: str) -> memoryview:
+        """Returns a zero copy view of the mapped file. Pages are only read when they are used"""
+        try:
+            with open(self._file(blob_id), "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return memoryview(b"")
+                return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except FileNotFoundError:
+            raise KeyError(blob_id)
+
+    def delete(self, blob_id: str) -> None:
+        try:
+            os.unlink(self._file(blob_id))
+        except FileNotFoundError:
+            pass
+
+    def _expire(self) -> None:
+        # cheap TTL: remove blobs older than blob_store_ttl whenever a new one is written
+        deadline = time.time() - settings.blob_store_ttl
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                try:
+                    if entry.stat().st_mtime < deadline:
+                        os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+
+
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    global _blob_store
+    if _blob_store is None:
+        if settings.blob_store_backend == "file":
+            _blob_store = FileBlobStore()
+        else:
+            _blob_store = RedisBlobStore()
+    return _blob_store
+
+
+def offload(data: Payload) -> Payload:
+    """Replace a payload above the threshold with a reference to it. Keeps the type of data (str or bytes)"""
+    threshold = settings.blob_offload_threshold_bytes
+    if not threshold or len(data) <= threshold:
+        return data
+    raw = data.encode() if isinstance(data, str) else data
+    reference = json.dumps({BLOB_REF_KEY: get_blob_store().put(raw), "size": len(raw)})
+    return reference if isinstance(data, str) else reference.encode()
+
+
+def is_blob_reference(data: Payload) -> bool:
+    prefix = BLOB_REF_PREFIX if isinstance(data, str) else BLOB_REF_PREFIX.encode()
+    return data[:len(prefix)] == prefix
+
+
+def resolve(data: Payload) -> Union[Payload, memoryview]:
+    """Returns the payload a reference points to, or data itself if it is not a reference"""
+    if not is_blob_reference(data):
+        return data
+    return get_blob_store().get(json.loads(data)[BLOB_REF_KEY])
+
+
+def resolve_bytes(data: Payload) -> Payload:
+    """Like resolve, but always returns something json parsers accept"""
+    resolved = resolve(data)
+    return resolved.tobytes() if isinstance(resolved, memoryview) else resolved
+
+
+def discard(data: Payload) -> None:
+    """Delete the blob behind a reference once it is no longer needed"""
+    if not is_blob_reference(data):
+        return
+    try:
+        get_blob_store().delete(json.loads(data)[BLOB_REF_KEY])
+    except Exception as e:
+        logger.warning("Could not delete blob: %s", e)
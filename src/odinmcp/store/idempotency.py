@@ -0,0 +1,61 @@
+import logging
+from typing import Optional
+
+import redis
+
+from odinmcp.config import settings
+from odinmcp.store import ProcessLocal, fail_open, get_redis, redis_key
+from odinmcp.store.cache import LocalCache
+from odinmcp import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestDeduplicator:
+    """
+    Claims for requests, so a retried POST is acknowledged instead of enqueued again.
+
+    A request is identified by its channel and its idempotency key (the client's header, or the
+    JSON-RPC id and a digest of the request). The first claim is an atomic SET NX with a TTL in redis. Keys claimed through this process are also kept in a local cache,
+    so repeated retries to the same web process don't reach redis.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self._redis = redis_client
+        self._cache = LocalCache(max_size=settings.idempotency_cache_size, ttl=settings.idempotency_ttl)
+        metrics.registry.register_cache("idempotency", self._cache)
+
+    @property
+    def redis(self) -> redis.Redis:
+        return self._redis or get_redis()
+
+    def claim(self, channel_id: str, key: str, ttl: Optional[int] = None) -> bool:
+        """True the first time a key is seen on the channel within the TTL, False for duplicates"""
+        if not settings.idempotency_enabled:
+            return True
+        ttl = settings.idempotency_ttl if ttl is None else ttl
+        cache_key = (channel_id, key)
+        if self._cache.get(cache_key) is not None:
+            return False
+        # without redis every request counts as new: a retry may run twice, but none is dropped
+        claimed = True
+        with fail_open(logger, "claim idempotency key"):
+            claimed = bool(self.redis.set(
+                redis_key("idempotency", f"{channel_id}\n{key}"), 1, nx=True, ex=ttl,
+            ))
+            if claimed:
+                # a claim held by another process is not cached: it may be released
+                self._cache.set(cache_key, True, ttl=ttl)
+        return claimed
+
+    def release(self, channel_id: str, key: str) -> None:
+        """Forget a claim, e.g. when the request could not be enqueued, so a retry goes through"""
+        if not settings.idempotency_enabled:
+            return
+        self._cache.delete((channel_id, key))
+        with fail_open(logger, "release idempotency key"):
+            self.redis.delete(redis_key("idempotency", f"{channel_id}\n{key}"))
+
+
+get_request_deduplicator = ProcessLocal(RequestDeduplicator)
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+import redis
+
+from odinmcp.config import settings
+from odinmcp.store import ProcessLocal, fail_open, get_redis, redis_key
+from odinmcp.store.cache import LocalCache
+from odinmcp import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelClosedError(asyncio.CancelledError):
+    """Raised into a request whose channel no longer has a listener"""
+
+
+class ChannelLiveness:
+    """
+    Per channel liveness registry.
+
+    A closed channel (its session was deleted) gets a tombstone in redis with a TTL. Workers check it, through a short lived local cache, before running a request
+    and before publishing, so work for abandoned sessions is skipped or aborted.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self._redis = redis_client
+        self._cache = LocalCache(ttl=settings.channel_liveness_cache_ttl)
+        metrics.registry.register_cache("channel_liveness", self._cache)
+
+    @property
+    def redis(self) -> redis.Redis:
+        return self._redis or get_redis()
+
+    def mark_closed(self, channel_id: str) -> None:
+        if not settings.channel_liveness_enabled:
+            return
+        self._cache.set(channel_id, False)
+        with fail_open(logger, "mark channel as closed"):
+            self.redis.set(redis_key("closed", channel_id), 1, ex=settings.channel_liveness_ttl)
+
+    def is_alive(self, channel_id: str) -> bool:
+        if not settings.channel_liveness_enabled:
+            return True
+        alive = self._cache.get(channel_id)
+        if alive is not None:
+            return alive
+        # unknown until redis answers. a channel that might be open still gets its work done
+        alive = True
+        with fail_open(logger, "check channel liveness"):
+            alive = not self.redis.exists(redis_key("closed", channel_id))
+            self._cache.set(channel_id, alive)
+        return alive
+
+    def alive_channels(self, channel_ids: List[str]) -> List[str]:
+        """The channels of the list that are still open, in order. One redis round trip for the uncached ones"""
+        if not settings.channel_liveness_enabled:
+            return list(channel_ids)
+        alive = {channel_id: self._cache.get(channel_id) for channel_id in channel_ids}
+        unknown = [channel_id for channel_id, is_alive in alive.items() if is_alive is None]
+        if unknown:
+            for channel_id in unknown:
+                alive[channel_id] = True
+            with fail_open(logger, "check channel liveness"):
+                tombstones = self.redis.mget([redis_key("closed", channel_id) for channel_id in unknown])
+                for channel_id, tombstone in zip(unknown, tombstones):
+                    alive[channel_id] = tombstone is None
+                    self._cache.set(channel_id, alive[channel_id])
+        return [channel_id for channel_id in channel_ids if alive[channel_id]]
+
+
+get_channel_liveness = ProcessLocal(ChannelLiveness)
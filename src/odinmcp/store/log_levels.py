@@ -0,0 +1,64 @@
+import logging
+from typing import Dict, Optional, get_args
+
+import redis
+from mcp.types import LoggingLevel
+
+from odinmcp.config import settings
+from odinmcp.store import ProcessLocal, fail_open, get_redis, redis_key
+from odinmcp.store.cache import LocalCache
+from odinmcp import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# syslog severities, least severe first
+LOG_LEVEL_RANKS: Dict[str, int] = {level: rank for rank, level in enumerate(get_args(LoggingLevel))}
+
+# cached for channels that never set a level
+_NOT_SET = ""
+
+
+class ChannelLogLevels:
+    """
+    Per channel minimum log level, set by the client with `logging/setLevel`.
+
+    Stored in redis for the session's lifetime and read by workers through a short lived local
+    cache, so log notifications below the level are dropped before they are published.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self._redis = redis_client
+        self._cache = LocalCache(ttl=settings.log_level_cache_ttl)
+        metrics.registry.register_cache("log_levels", self._cache)
+
+    @property
+    def redis(self) -> redis.Redis:
+        return self._redis or get_redis()
+
+    def set_level(self, channel_id: str, level: LoggingLevel) -> None:
+        self._cache.set(channel_id, level)
+        with fail_open(logger, "store log level"):
+            self.redis.set(redis_key("log_level", channel_id), level, ex=settings.session_ttl)
+
+    def get_level(self, channel_id: str) -> Optional[str]:
+        """The channel's level, or log_level_default if the client never set one"""
+        level = self._cache.get(channel_id)
+        if level is None:
+            # a level redis could not tell us about filters like one never set
+            level = _NOT_SET
+            with fail_open(logger, "read log level"):
+                stored = self.redis.get(redis_key("log_level", channel_id))
+                level = stored.decode() if stored else _NOT_SET
+                self._cache.set(channel_id, level)
+        return level or settings.log_level_default
+
+
+def is_enabled(level: str, minimum: Optional[str]) -> bool:
+    """Whether a message at `level` passes a `minimum` level (None lets everything through)"""
+    if minimum is None:
+        return True
+    return LOG_LEVEL_RANKS.get(level, 0) >= LOG_LEVEL_RANKS.get(minimum, 0)
+
+
+get_channel_log_levels = ProcessLocal(ChannelLogLevels)
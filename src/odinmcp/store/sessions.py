@@ -0,0 +1,88 @@
+import json
+import logging
+import secrets
+import time
+from typing import Any, Dict, Optional
+
+import redis
+
+from odinmcp.config import settings
+from odinmcp.store import ProcessLocal, get_redis, redis_key
+from odinmcp.store.cache import LocalCache
+from odinmcp import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """
+    Server side session records, keyed by a compact opaque session id.
+
+    A record holds the owner (user_id, session_id), the client's initialize params and what the
+    server answered to initialize (protocol version and capabilities).
+    Records live in redis with a TTL and are cached in a local LRU, so validating a session id
+    on every request is a dict lookup most of the time.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self._redis = redis_client
+        self._cache = LocalCache(ttl=settings.session_store_cache_ttl)
+        metrics.registry.register_cache("sessions", self._cache)
+
+    @property
+    def redis(self) -> redis.Redis:
+        return self._redis or get_redis()
+
+    def create(
+        self, user_id: str, session_id: str, client_params: dict, initialize_result: Optional[dict] = None,
+    ) -> Optional[str]:
+        """Store a new session. Returns its id, or None if it could not be stored"""
+        channel_id = secrets.token_urlsafe(settings.session_id_bytes)
+        initialize_result = initialize_result or {}
+        record = {
+            "user_id": user_id,
+            "session_id": session_id,
+            "client_params": client_params,
+            "protocol_version": initialize_result.get("protocolVersion"),
+            "server_capabilities": initialize_result.get("capabilities"),
+            "created_at": int(time.time()),
+        }
+        try:
+            self.redis.set(redis_key("session", channel_id), json.dumps(record), ex=settings.session_ttl)
+        except redis.RedisError as e:
+            # an id only this process knows would be rejected by every other web node
+            logger.warning("Could not store session: %s", e)
+            return None
+        self._cache.set(channel_id, record)
+        return channel_id
+
+    def get(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        record = self._cache.get(channel_id)
+        if record is not None:
+            return record
+        try:
+            record = self.redis.get(redis_key("session", channel_id))
+        except redis.RedisError as e:
+            logger.warning("Could not load session: %s", e)
+            return None
+        if record is None:
+            return None
+        record = json.loads(record)
+        self._cache.set(channel_id, record)
+        return record
+
+    def delete(self, channel_id: str) -> None:
+        self._cache.delete(channel_id)
+        try:
+            self.redis.delete(redis_key("session", channel_id))
+        except redis.RedisError as e:
+            logger.warning("Could not delete session: %s", e)
+
+
+get_session_store = ProcessLocal(SessionStore)
+
+
+def is_opaque_session_id(channel_id: str) -> bool:
+    # streaming tokens are JWTs (header.payload.signature). opaque ids never contain a dot
+    return "." not in channel_id
@@ -0,0 +1,81 @@
+import logging
+from typing import Iterable, List, Optional
+
+import redis
+
+from odinmcp.config import settings
+from odinmcp.store import ProcessLocal, fail_open, get_redis, redis_key
+from odinmcp.store.cache import LocalCache
+from odinmcp import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceSubscriptions:
+    """
+    Index of the channels subscribed to a resource (`resources/subscribe`).
+
+    A redis set of channel ids per uri, plus the set of uris per channel so a terminated session
+    can be removed from every index. Both expire with the session. Subscriber lookups go through a
+    short lived local cache, dropped for a uri when this process changes its subscriptions.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self._redis = redis_client
+        self._cache = LocalCache(ttl=settings.resource_subscriptions_cache_ttl)
+        metrics.registry.register_cache("resource_subscriptions", self._cache)
+
+    @property
+    def redis(self) -> redis.Redis:
+        return self._redis or get_redis()
+
+    def subscribe(self, uri: str, channel_id: str) -> None:
+        subscribers_key = redis_key("subscribers", uri)
+        channel_key = redis_key("subscriptions", channel_id)
+        with fail_open(logger, "subscribe to resource"):
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.sadd(subscribers_key, channel_id)
+            pipe.expire(subscribers_key, settings.session_ttl)
+            pipe.sadd(channel_key, uri)
+            pipe.expire(channel_key, settings.session_ttl)
+            pipe.execute()
+        self._cache.delete(uri)
+
+    def unsubscribe(self, uri: str, channel_id: str) -> None:
+        self._remove(channel_id, [uri])
+
+    def remove_channel(self, channel_id: str) -> None:
+        """Drop every subscription of a channel, e.g. when its session is terminated"""
+        with fail_open(logger, "read the channel's resource subscriptions"):
+            uris = [uri.decode() for uri in self.redis.smembers(redis_key("subscriptions", channel_id))]
+            self._remove(channel_id, uris, forget_channel=True)
+
+    def _remove(self, channel_id: str, uris: Iterable[str], forget_channel: bool = False) -> None:
+        uris = list(uris)
+        channel_key = redis_key("subscriptions", channel_id)
+        with fail_open(logger, "unsubscribe from resource"):
+            pipe = self.redis.pipeline(transaction=False)
+            for uri in uris:
+                pipe.srem(redis_key("subscribers", uri), channel_id)
+            if forget_channel:
+                pipe.delete(channel_key)
+            elif uris:
+                pipe.srem(channel_key, *uris)
+            pipe.execute()
+        for uri in uris:
+            self._cache.delete(uri)
+
+    def subscribers(self, uri: str) -> List[str]:
+        channel_ids = self._cache.get(uri)
+        if channel_ids is not None:
+            return channel_ids
+        # nobody is notified while redis is down. an update notification is a hint, not state
+        channel_ids = []
+        with fail_open(logger, "read resource subscribers"):
+            channel_ids = sorted(channel_id.decode() for channel_id in self.redis.smembers(redis_key("subscribers", uri)))
+            self._cache.set(uri, channel_ids)
+        return channel_ids
+
+
+get_resource_subscriptions = ProcessLocal(ResourceSubscriptions)
@@ -0,0 +1,209 @@
+"""
+Request tracing across the web tier, celery and hermod.
+
+Trace context follows the W3C `traceparent` format. It is taken from (or created at) the http
+request, carried in the celery task headers and the request's `_meta`, and attached to every
+hermod publish. Each hop is recorded as a span and handed to the configured exporter.
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from odinmcp.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class TraceContext:
+    """Position in a trace: the trace id and the id of the current span"""
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool = True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    @classmethod
+    def new(cls) -> "TraceContext":
+        return cls(secrets.token_hex(16), secrets.token_hex(8))
+
+    @classmethod
+    def from_traceparent(cls, traceparent: Optional[str]) -> Optional["TraceContext"]:
+        match = TRACEPARENT_PATTERN.match(traceparent.strip().lower()) if traceparent else None
+        if match is None:
+            return None
+        trace_id, span_id, flags = match.groups()
+        # all zero ids are invalid
+        if trace_id == "0" * 32 or span_id == "0" * 16:
+            return None
+        return cls(trace_id, span_id, bool(int(flags, 16) & 1))
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+class Span:
+
+    def __init__(
+        self,
+        name: str,
+        parent: Optional[TraceContext] = None,
+        start_time: Optional[float] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.context = TraceContext(
+            parent.trace_id if parent else secrets.token_hex(16),
+            secrets.token_hex(8),
+            parent.sampled if parent else True,
+        )
+        self.parent_id = parent.span_id if parent else None
+        self.start_time = time.time() if start_time is None else start_time
+        self.end_time: Optional[float] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self, end_time: Optional[float] = None) -> None:
+        self.end_time = time.time() if end_time is None else end_time
+        if self.context.sampled:
+            get_exporter().export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": (self.end_time - self.start_time) * 1000 if self.end_time else None,
+            "attributes": self.attributes,
+            "status": self.status,
+            "pid": os.getpid(),
+        }
+
+
+class SpanExporter:
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+
+class NoopSpanExporter(SpanExporter):
+    def export(self, span: Span) -> None:
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    """Keeps the latest `tracing_memory_max_spans` spans of this process"""
+
+    def __init__(self, max_spans: Optional[int] = None):
+        self._spans: Deque[Span] = deque(maxlen=max_spans or settings.tracing_memory_max_spans)
+
+    def export(self, span: Span) -> None:
+        self._spans.append(span)
+
+    @property
+    def spans(self) -> List[Span]:
+        return list(self._spans)
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends spans as JSON lines to `tracing_file_path`. Safe to share between processes"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.tracing_file_path
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        # a single write of one line per span, so lines from concurrent processes don't interleave
+        line = (json.dumps(span.to_dict(), default=str) + "\n").encode()
+        try:
+            with self._lock:
+                fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+        except OSError as e:
+            logger.warning("Could not export span: %s", e)
+
+
+_exporter: Optional[SpanExporter] = None
+
+
+def get_exporter() -> SpanExporter:
+    global _exporter
+    if _exporter is None:
+        if settings.tracing_exporter == "file":
+            _exporter = FileSpanExporter()
+        elif settings.tracing_exporter == "memory":
+            _exporter = InMemorySpanExporter()
+        else:
+            _exporter = NoopSpanExporter()
+    return _exporter
+
+
+def set_exporter(exporter: SpanExporter) -> None:
+    """Use a custom exporter, e.g. one forwarding spans to an OpenTelemetry collector"""
+    global _exporter
+    _exporter = exporter
+
+
+_current: contextvars.ContextVar[Optional[TraceContext]] = contextvars.ContextVar("odinmcp_trace", default=None)
+
+
+def current_context() -> Optional[TraceContext]:
+    return _current.get()
+
+
+def current_traceparent() -> Optional[str]:
+    context = _current.get()
+    return context.traceparent if context else None
+
+
+@contextmanager
+def start_span(
+    name: str,
+    parent: Optional[TraceContext] = None,
+    start_time: Optional[float] = None,
+    **attributes: Any,
+) -> Iterator[Optional[Span]]:
+    """
+    Record a span around the block and make it the current context.
+    The parent defaults to the current context. Yields None when tracing is disabled.
+    """
+    if not settings.tracing_enabled:
+        yield None
+        return
+    span = Span(name, parent or _current.get(), start_time, attributes)
+    token = _current.set(span.context)
+    try:
+        yield span
+    except BaseException as e:
+        span.status = "error"
+        span.set_attribute("error", repr(e))
+        raise
+    finally:
+        _current.reset(token)
+        span.end()
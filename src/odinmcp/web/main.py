@@ -1,16 +1,19 @@
 from odinmcp.web.transports.http_streaming import OdinHttpStreamingTransport
 from odinmcp.web.middleware.heimdall import HeimdallCurrentUserMiddleware
 from odinmcp.web.middleware.hermod import HermodStreamingMiddleware
+from odinmcp.web.validation import ToolCallValidator
 from odinmcp.config import settings
+from odinmcp import metrics
 from starlette.applications import Starlette
 from starlette.requests import Request
 from starlette.responses import Response
-from starlette.routing import Route
+from starlette.routing import Mount, Route
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware import Middleware
 from odinmcp.models.auth import CurrentUser
 from mcp.server.lowlevel.server import Server as MCPServer
-from typing import Type, List
+from mcp.server.fastmcp.tools import ToolManager
+from typing import Optional, Type, List
 from celery import Celery
 
 class OdinWeb:
@@ -20,10 +23,12 @@ class OdinWeb:
         mcp_server: MCPServer,
         current_user_model: Type[CurrentUser],
         worker: Celery,
+        tool_manager: Optional[ToolManager] = None,
     ):
         self.mcp_server = mcp_server
         self.worker = worker
         self.current_user_model = current_user_model
+        self.tool_manager = tool_manager
 
     
     def build(
@@ -31,11 +36,14 @@ class OdinWeb:
         extra_middleware:List[Middleware] = [] 
     ):
 
+        validator = None
+        if settings.edge_validation_enabled and self.tool_manager is not None:
+            validator = ToolCallValidator(self.tool_manager)
 
         async def handle_mcp_request(
             request: Request,
         ) -> Response:
-            transport = OdinHttpStreamingTransport(self.mcp_server, request, self.worker)
+            transport = OdinHttpStreamingTransport(self.mcp_server, request, self.worker, validator)
             return await transport.get_response()
         
 
@@ -56,5 +64,18 @@ class OdinWeb:
             ],
         )
         
-        return mcp_app
+        if not settings.metrics_enabled:
+            return mcp_app
+
+        async def handle_metrics(request: Request) -> Response:
+            return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE_METRICS)
+
+        # outside of mcp_app, so scrapes skip the auth middleware
+        return Starlette(
+            debug=settings.debug,
+            routes=[
+                Route(settings.metrics_path, endpoint=handle_metrics, methods=["GET"]),
+                Mount("", app=mcp_app),
+            ],
+        )
         
\ No newline at end of file
@@ -0,0 +1,292 @@
+"""
+Prefork http server for the web tier.
+
+The supervisor imports the app once (unless preload is off), then forks `web_workers` processes,
+each running its own uvicorn server and event loop. With `web_reuse_port` every process binds its
+own SO_REUSEPORT socket and the kernel spreads connections over them. Otherwise they accept on one
+socket bound by the supervisor.
+
+Signals to the supervisor: SIGHUP replaces the processes one at a time (graceful reload; with
+preload off the replacements import the app again), SIGTERM / SIGINT stop them gracefully. A
+process that dies is replaced.
+"""
+import importlib
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from odinmcp.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def import_app(app_path: str) -> Any:
+    """Import `module:attr`. The module can also be a path to a python file"""
+    if ":" not in app_path:
+        raise ValueError("app_path must be in the format 'module:attr', e.g., 'test_app.main:web'")
+    module_path, app_attr = app_path.split(":", 1)
+
+    if module_path.endswith(".py") or os.path.isfile(module_path):
+        file_path = os.path.abspath(module_path)
+        module_dir = os.path.dirname(file_path)
+        module_name = os.path.splitext(os.path.basename(file_path))[0]
+        if module_dir not in sys.path:
+            sys.path.insert(0, module_dir)
+        module = importlib.import_module(module_name)
+    else:
+        module = importlib.import_module(module_path)
+
+    app = getattr(module, app_attr, None)
+    if app is None:
+        raise ValueError(f"Module '{module_path}' does not have attribute '{app_attr}'")
+
+    from starlette.applications import Starlette
+    if not isinstance(app, Starlette):
+        raise ValueError(f"Attribute '{app_attr}' is not a Starlette app")
+    return app
+
+
+def resolve_loop(loop: str) -> str:
+    # uvicorn resolves "auto" the same way. resolved here so the choice can be logged
+    if loop != "auto":
+        return loop
+    try:
+        import uvloop  # noqa: F401
+        return "uvloop"
+    except ImportError:
+        return "asyncio"
+
+
+def resolve_http(http: str) -> str:
+    if http != "auto":
+        return http
+    try:
+        import httptools  # noqa: F401
+        return "httptools"
+    except ImportError:
+        return "h11"
+
+
+def bind_socket(host: str, port: int, reuse_port: bool = False, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        if not hasattr(socket, "SO_REUSEPORT"):
+            raise RuntimeError("SO_REUSEPORT is not supported on this platform")
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+
+    def __init__(
+        self,
+        load_app: Callable[[], Any],
+        config: Dict[str, Any],
+        workers: int,
+        reuse_port: bool = False,
+        preload: bool = True,
+        graceful_timeout: float = 30,
+    ):
+        self.load_app = load_app
+        # uvicorn.Config kwargs, host and port included
+        self.config = config
+        self.workers = workers
+        self.reuse_port = reuse_port
+        self.preload = preload
+        self.graceful_timeout = graceful_timeout
+        self.app: Any = None
+        self._socket: Optional[socket.socket] = None
+        self._children: Dict[int, float] = {}
+        self._signals: List[int] = []
+        self._stopping = False
+        self._wakeup: Optional[int] = None
+
+    def run(self) -> None:
+        if self.preload:
+            # shared copy on write by the forked processes
+            self.app = self.load_app()
+        if not self.reuse_port:
+            self._socket = bind_socket(self.config["host"], self.config["port"], backlog=self.config["backlog"])
+        # signals wake the supervisor through a pipe, instead of waiting for the next poll
+        self._wakeup, wakeup_w = os.pipe()
+        os.set_blocking(wakeup_w, False)
+        signal.set_wakeup_fd(wakeup_w)
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, self._on_signal)
+
+        logger.info(
+            "Starting %s web processes on %s:%s (loop=%s, http=%s, reuse_port=%s)",
+            self.workers, self.config["host"], self.config["port"],
+            self.config["loop"], self.config["http"], self.reuse_port,
+        )
+        for _ in range(self.workers):
+            self._spawn()
+        try:
+            self._supervise()
+        finally:
+            self._stop()
+
+    def _on_signal(self, signum, frame) -> None:
+        self._signals.append(signum)
+
+    def _supervise(self) -> None:
+        while True:
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    return
+                if signum == signal.SIGHUP:
+                    self._reload()
+            self._reap(respawn=True)
+            if select.select([self._wakeup], [], [], 1)[0]:
+                os.read(self._wakeup, 4096)
+
+    def _spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._serve()
+            except BaseException:
+                logger.exception("Web process failed")
+                code = 1
+            finally:
+                os._exit(code)
+        self._children[pid] = time.monotonic()
+        return pid
+
+    def _serve(self) -> None:
+        import uvicorn
+
+        signal.set_wakeup_fd(-1)
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        # per process resources (publisher sockets, redis clients, broker pools) are re-created on
+        # first use after the fork: they check the pid, or reset in an os.register_at_fork hook
+        app = self.app if self.preload else self.load_app()
+        if self.reuse_port:
+            sock = bind_socket(self.config["host"], self.config["port"], True, self.config["backlog"])
+        else:
+            sock = self._socket
+        uvicorn.Server(uvicorn.Config(app, **self.config)).run(sockets=[sock])
+
+    def _reap(self, respawn: bool) -> None:
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started_at = self._children.pop(pid, None)
+            if started_at is None:
+                continue
+            if respawn and not self._stopping:
+                logger.warning("Web process %s exited with status %s, replacing it", pid, status)
+                if time.monotonic() - started_at < 1:
+                    # failing right away (bad app, port in use). don't spin
+                    time.sleep(1)
+                self._spawn()
+
+    def _reload(self) -> None:
+        # one process at a time, so the others keep serving
+        logger.info("Reloading web processes")
+        for pid in list(self._children):
+            self._spawn()
+            self._terminate(pid)
+
+    def _terminate(self, pid: int) -> None:
+        # removed first, so _reap does not replace it
+        self._children.pop(pid, None)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        deadline = time.monotonic() + self.graceful_timeout
+        while time.monotonic() < deadline:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if done:
+                return
+            time.sleep(0.1)
+        logger.warning("Web process %s did not stop within %ss, killing it", pid, self.graceful_timeout)
+        try:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+    def _stop(self) -> None:
+        self._stopping = True
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self._children.pop(pid, None)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self._children and time.monotonic() < deadline:
+            self._reap(respawn=False)
+            time.sleep(0.1)
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self._reap(respawn=False)
+
+
+def serve(
+    app_path: str,
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    workers: Optional[int] = None,
+    loop: Optional[str] = None,
+    http: Optional[str] = None,
+    reuse_port: Optional[bool] = None,
+    backlog: Optional[int] = None,
+    graceful_timeout: Optional[float] = None,
+    preload: Optional[bool] = None,
+    **uvicorn_kwargs: Any,
+) -> None:
+    """Serve the Starlette app at `app_path`. Arguments left as None come from settings"""
+    workers = workers or settings.web_workers
+    graceful_timeout = settings.web_graceful_timeout if graceful_timeout is None else graceful_timeout
+    config = {
+        **uvicorn_kwargs,
+        "host": host or settings.web_host,
+        "port": port or settings.web_port,
+        "loop": resolve_loop(loop or settings.web_loop),
+        "http": resolve_http(http or settings.web_http),
+        "backlog": backlog or settings.web_backlog,
+        "timeout_graceful_shutdown": graceful_timeout,
+    }
+    reuse_port = settings.web_reuse_port if reuse_port is None else reuse_port
+    preload = settings.web_preload if preload is None else preload
+
+    if workers == 1 and not reuse_port:
+        import uvicorn
+
+        uvicorn.Server(uvicorn.Config(import_app(app_path), **config)).run()
+        return
+
+    PreforkServer(
+        lambda: import_app(app_path),
+        config,
+        workers,
+        reuse_port=reuse_port,
+        preload=preload,
+        graceful_timeout=graceful_timeout,
+    ).run()
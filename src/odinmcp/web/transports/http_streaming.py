@@ -1,42 +1,39 @@
 from http import HTTPStatus
+import hashlib
 import json
-from typing import Any, Generic, List, Optional, Type
-from mcp.server.lowlevel.server import LifespanResultT
-from uuid import uuid4
-from mcp.server.fastmcp import FastMCP 
-from starlette.applications import Starlette
+import time
 from starlette.requests import Request
 from starlette.responses import Response
-from starlette.routing import Mount, Route
 from starlette.exceptions import HTTPException
-from starlette.types import Receive, Scope, Send
-from mcp.types import JSONRPCMessage, JSONRPCResponse, InitializeResult, JSONRPCRequest, JSONRPCError, ErrorData, PARSE_ERROR, INVALID_REQUEST, INVALID_PARAMS, INTERNAL_ERROR, LATEST_PROTOCOL_VERSION, LoggingCapability, PromptsCapability, ResourcesCapability, ToolsCapability, JSONRPCNotification
-# from core.config import settings # Assuming settings might be used elsewhere or was a previous import
+from starlette.concurrency import run_in_threadpool
+from mcp.types import JSONRPCMessage, JSONRPCResponse, InitializeResult, JSONRPCRequest, JSONRPCError, ErrorData, PARSE_ERROR, INVALID_REQUEST, LATEST_PROTOCOL_VERSION, JSONRPCNotification, SubscribeRequest
 from mcp.server.lowlevel.server import Server as MCPServer, NotificationOptions
-# from mcp.types import InitializeResult, JSONRPCRequest, JSONRPCResponse # Duplicate, covered above
-from contextlib import AbstractAsyncContextManager, AsyncExitStack, asynccontextmanager
-from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
-from pydantic_settings import BaseSettings, SettingsConfigDict
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.middleware import Middleware
 
 from odinmcp.models.auth import CurrentUser
-from odinmcp.web.middleware.heimdall import HeimdallCurrentUserMiddleware
-from odinmcp.web.middleware.hermod import HermodStreamingMiddleware
 from odinmcp.config import settings
+from odinmcp import metrics
+from odinmcp.tracing import TRACEPARENT_HEADER, TraceContext, start_span
 from odinmcp.constants import (
     MCP_SESSION_ID_HEADER,
     LAST_EVENT_ID_HEADER,
     CONTENT_TYPE_HEADER,
     ACCEPT_HEADER,
+    IDEMPOTENCY_KEY_HEADER,
     CONTENT_TYPE_JSON,
     CONTENT_TYPE_SSE,
     HERMOD_GRIP_HOLD_HEADER,
     HERMOD_GRIP_HOLD_MODE,
     HERMOD_GRIP_CHANNEL_HEADER,
     HERMOD_GRIP_KEEP_ALIVE_HEADER,
+    HERMOD_GRIP_LINK_HEADER,
+    HERMOD_GRIP_LAST_HEADER,
+    LAST_EVENT_ID_QUERY_PARAM,
 )
 from odinmcp.worker import OdinWorker
+from odinmcp.web.validation import ToolCallValidator
+from odinmcp.hermod import HermodEventLog, encode_sse_event, get_hermod_publisher
+from odinmcp.hermod.routing import ROUTING_MODE_REGISTRY, broadcast_channels
+from odinmcp.store.idempotency import get_request_deduplicator
 
 
 class OdinHttpStreamingTransport:
@@ -44,26 +41,38 @@ class OdinHttpStreamingTransport:
         self,
         mcp_server: MCPServer,
         request: Request,
-        worker: OdinWorker   
+        worker: OdinWorker,
+        validator: ToolCallValidator | None = None,
     ):
         
         self.mcp_server = mcp_server
         self.request = request
         self.worker = worker
+        self.validator = validator
         self.supports_hermod_streaming = getattr(request.state, settings.supports_hermod_streaming_state, False)
         self.current_user = getattr(request.state, settings.current_user_state)
         self.channel_id = self.request.headers.get(MCP_SESSION_ID_HEADER, None)
+        # json-rpc method of a POST, for metrics
+        self.rpc_method = ""
     
     
     def get_initialize_result(self) -> InitializeResult:
+        # list changes reach the clients through the broadcast groups
+        list_changed = bool(settings.hermod_broadcast_enabled)
         mcp_initialization_options = self.mcp_server.create_initialization_options(
-            notification_options=NotificationOptions(),
+            notification_options=NotificationOptions(
+                prompts_changed=list_changed, resources_changed=list_changed, tools_changed=list_changed,
+            ),
             experimental_capabilities={},
         )
+        capabilities = mcp_initialization_options.capabilities
+        # the low level server never advertises subscriptions, even with a handler registered
+        if capabilities.resources is not None and SubscribeRequest in self.mcp_server.request_handlers:
+            capabilities.resources.subscribe = True
 
         return InitializeResult(
                 protocolVersion=LATEST_PROTOCOL_VERSION,
-                capabilities=mcp_initialization_options.capabilities,
+                capabilities=capabilities,
                 serverInfo={ 
                     "name": mcp_initialization_options.server_name,
                     "version": mcp_initialization_options.server_version,
@@ -74,6 +83,31 @@ class OdinHttpStreamingTransport:
             
         
     async def get_response(self) -> Response:
+        if not (settings.metrics_enabled or settings.tracing_enabled):
+            return await self._get_response()
+        http_method = self.request.method.upper()
+        # continue the client's trace, or start one here
+        parent = TraceContext.from_traceparent(self.request.headers.get(TRACEPARENT_HEADER, None))
+        started_at = time.perf_counter()
+        status = HTTPStatus.INTERNAL_SERVER_ERROR
+        with start_span(f"http {http_method}", parent) as span:
+            try:
+                response = await self._get_response()
+                status = response.status_code
+                return response
+            except HTTPException as e:
+                status = e.status_code
+                raise
+            finally:
+                metrics.web_request_seconds.observe(
+                    time.perf_counter() - started_at, http_method=http_method, rpc_method=self.rpc_method,
+                )
+                metrics.web_requests.inc(http_method=http_method, rpc_method=self.rpc_method, status=int(status))
+                if span is not None:
+                    span.set_attribute("rpc_method", self.rpc_method)
+                    span.set_attribute("status", int(status))
+
+    async def _get_response(self) -> Response:
         
         method = self.request.method.upper()
         if method == "GET":
@@ -98,7 +132,13 @@ class OdinHttpStreamingTransport:
                 error_code=INVALID_REQUEST
             )
         if self.channel_id: 
-            return self._create_streaming_hold_response(self.channel_id)
+            # replay anything the client missed while it was disconnected before pushpin starts
+            # streaming the channel again. events published between this read and pushpin's subscribe
+            # are caught by the prev-id of the hold: pushpin sees the gap and follows the next link
+            latest_event_id, events = HermodEventLog().resume(self.channel_id, self._last_event_id())
+            content = b"".join(encode_sse_event(data, event_id) for event_id, data in events) or None
+            self._register_hermod_node(self.channel_id)
+            return self._create_streaming_hold_response(self.channel_id, content=content, prev_id=latest_event_id)
         else:
             # TODO: support legacy sse by returning endpoint event
             return self._create_error_response(
@@ -108,14 +148,15 @@ class OdinHttpStreamingTransport:
             )
     
     async def _handle_delete(self) -> Response:
-        # TODO: handle DELETE request. terminate session.
         if not self.channel_id:
             return self._create_error_response(
                 error_message="Session ID is required for DELETE.",
                 status_code=HTTPStatus.BAD_REQUEST, # 400
                 error_code=INVALID_REQUEST
             )
-        self.worker.terminate_session(
+        # a handful of blocking redis round trips (and the first hermod connect). off the event loop
+        await run_in_threadpool(
+            self.worker.terminate_session,
             channel_id=self.channel_id,
             current_user=self.current_user
         )
@@ -151,6 +192,7 @@ class OdinHttpStreamingTransport:
         # 2. should be JSONRPCMessage
         try:
             message = JSONRPCMessage.model_validate(json_data)
+            self.rpc_method = getattr(message.root, "method", "")
             
         except Exception as e:  
             return self._create_error_response(
@@ -162,15 +204,17 @@ class OdinHttpStreamingTransport:
         # 3. check if initialize request
         if isinstance(message.root, JSONRPCRequest) and message.root.method == "initialize":
             req_id = message.root.id
+            initialize_result = self.get_initialize_result().model_dump(by_alias=True, exclude_none=True)
             
             response_message = JSONRPCResponse(
                 id=req_id,
-                result=self.get_initialize_result().model_dump(by_alias=True, exclude_none=True),
+                result=initialize_result,
                 jsonrpc=message.root.jsonrpc or "2.0" 
             )
             
             self.channel_id = self.create_new_user_channel(
-                initialization_params=message.root.params
+                initialization_params=message.root.params,
+                initialize_result=initialize_result,
             )
             return self._create_json_response(
                 response_message,
@@ -186,12 +230,33 @@ class OdinHttpStreamingTransport:
         
             
         if isinstance(message.root, JSONRPCRequest):
-            self.worker.handle_mcp_request(
-                request=message.root, 
-                channel_id=self.channel_id,
-                current_user=self.current_user,
+            error = self.validator.validate(message.root) if self.validator else None
+            if error is not None:
+                # answered here, in the POST response, instead of on the stream by a worker
+                metrics.web_rejected_requests.inc(rpc_method=self.rpc_method)
+                return self._create_json_response(
+                    response_message=JSONRPCError(jsonrpc="2.0", id=message.root.id, error=error),
+                    status_code=HTTPStatus.OK,
+                )
+            # a retry of a request already accepted on this channel. its response comes on the stream
+            deduplicator = get_request_deduplicator()
+            idempotency_key, idempotency_ttl = self._idempotency_key(message.root)
+            if not deduplicator.claim(self.channel_id, idempotency_key, idempotency_ttl):
+                metrics.web_duplicate_requests.inc(rpc_method=self.rpc_method)
+                return self._create_json_response(
+                    response_message=None,
+                    status_code=HTTPStatus.ACCEPTED,
+                )
+            try:
+                self.worker.handle_mcp_request(
+                    request=message.root, 
+                    channel_id=self.channel_id,
+                    current_user=self.current_user,
 
-            )
+                )
+            except Exception:
+                deduplicator.release(self.channel_id, idempotency_key)
+                raise
             return self._create_json_response(
                 response_message=None,
                 status_code=HTTPStatus.ACCEPTED,
@@ -278,30 +343,86 @@ class OdinHttpStreamingTransport:
         channel_id,
         status_code: HTTPStatus = HTTPStatus.ACCEPTED,
         headers: dict[str, str] | None = None,
+        content: bytes | None = None,
+        prev_id: str | None = None,
     ) -> Response:
-        """Create a streaming hold response"""
+        """
+        Create a streaming hold response. Any content is sent to the client before the held stream.
+        With a prev_id (the channel's latest logged event), pushpin checks the prev-id of every item
+        published on the channel and re-fetches the stream from the next link when one was missed
+        """
+        # the session's own channel, plus the broadcast groups it belongs to
+        user_id = getattr(self.current_user, "user_id", None)
+        session_channel = f"{channel_id}; prev-id={prev_id}" if prev_id else channel_id
         response_headers = {
             CONTENT_TYPE_HEADER: CONTENT_TYPE_SSE, 
             HERMOD_GRIP_HOLD_HEADER: HERMOD_GRIP_HOLD_MODE,
-            HERMOD_GRIP_CHANNEL_HEADER: channel_id,
+            HERMOD_GRIP_CHANNEL_HEADER: ", ".join([session_channel, *broadcast_channels(user_id)]),
             HERMOD_GRIP_KEEP_ALIVE_HEADER: f"\\n; format=cstring; timeout={settings.hermod_streaming_keep_alive_timeout}",
             MCP_SESSION_ID_HEADER: channel_id,
             ACCEPT_HEADER: CONTENT_TYPE_JSON,
         }
+        if prev_id:
+            next_link = f"<{self.request.url.path}?{LAST_EVENT_ID_QUERY_PARAM}={prev_id}>; rel=next"
+            if settings.hermod_stream_recover_timeout:
+                next_link += f"; timeout={settings.hermod_stream_recover_timeout}"
+            response_headers[HERMOD_GRIP_LINK_HEADER] = next_link
         
         if headers:
             response_headers.update(headers)
 
         return Response(
-            content=None,
+            content=content,
             status_code=status_code,
             headers=response_headers,
         )
 
+    def _last_event_id(self) -> str | None:
+        """
+        The last event the stream has: what pushpin last delivered on the channel when it follows the
+        next link (Grip-Last), else the link's query parameter, else the client's Last-Event-ID
+        """
+        for entry in self.request.headers.get(HERMOD_GRIP_LAST_HEADER, "").split(","):
+            channel, _, params = entry.partition(";")
+            if channel.strip() != self.channel_id:
+                continue
+            for param in params.split(";"):
+                name, _, value = param.partition("=")
+                if name.strip() == "last-id":
+                    return value.strip()
+        return (
+            self.request.query_params.get(LAST_EVENT_ID_QUERY_PARAM, None)
+            or self.request.headers.get(LAST_EVENT_ID_HEADER, None)
+        )
+
+    def _idempotency_key(self, request: JSONRPCRequest) -> tuple[str, int]:
+        """
+        The client's Idempotency-Key, or the JSON-RPC id (1 and "1" are different ids) and a digest of the
+        request, with the TTL to keep it for. A retry repeats the same request, while a client that restarted
+        its id counter sends a different one under a reused id, so only a short window of those can collide.
+        """
+        key = self.request.headers.get(IDEMPOTENCY_KEY_HEADER, None)
+        if key:
+            return f"key:{key}", settings.idempotency_ttl
+        digest = hashlib.blake2b(
+            request.model_dump_json(by_alias=True, exclude_none=True).encode(), digest_size=8,
+        ).hexdigest()
+        return f"id:{json.dumps(request.id)}:{digest}", settings.idempotency_id_ttl
+
+    def _register_hermod_node(self, channel_id: str) -> None:
+        """Record which hermod node holds the channel's stream, so workers only publish to that node"""
+        router = get_hermod_publisher().router
+        if router.mode != ROUTING_MODE_REGISTRY:
+            return
+        node = self.request.headers.get(settings.hermod_node_header, None)
+        if node:
+            router.register(channel_id, node)
+
     def create_new_user_channel(
         self,
-        initialization_params: dict
+        initialization_params: dict,
+        initialize_result: dict | None = None,
     ) -> str:
         """Create a new user channel"""
         user : CurrentUser = getattr(self.request.state, settings.current_user_state, None)
-        return user.create_hermod_streaming_token(initialization_params)
\ No newline at end of file
+        return user.create_hermod_streaming_token(initialization_params, initialize_result=initialize_result)
\ No newline at end of file
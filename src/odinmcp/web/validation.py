@@ -0,0 +1,74 @@
+"""
+Validation of `tools/call` in the web tier, before the request is enqueued.
+
+An unknown tool or arguments that don't match the tool's signature would otherwise take a broker
+publish, a worker slot and a hermod publish only to fail. They are rejected with INVALID_PARAMS
+in the POST response instead.
+
+Arguments are checked the way the worker checks them (pre-parsed JSON strings, then the tool's
+pydantic argument model), so the web tier never rejects a call the worker would accept.
+"""
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import pydantic
+from mcp.server.fastmcp.tools import Tool, ToolManager
+from mcp.types import INVALID_PARAMS, ErrorData, JSONRPCRequest
+
+
+logger = logging.getLogger(__name__)
+
+TOOLS_CALL_METHOD = "tools/call"
+
+
+class ToolCallValidator:
+
+    def __init__(self, tool_manager: ToolManager):
+        self.tool_manager = tool_manager
+        # tool name -> the tool its argument model was built for. rebuilt once if deferred on forward references
+        self._ready: Dict[str, Tool] = {}
+
+    def validate(self, request: JSONRPCRequest) -> Optional[ErrorData]:
+        """Return the error for an invalid `tools/call`, None for anything else"""
+        if request.method != TOOLS_CALL_METHOD:
+            return None
+        name, arguments = self._parse_params(request.params)
+        if name is None:
+            return ErrorData(code=INVALID_PARAMS, message="Invalid params: tools/call needs a tool name and arguments object")
+
+        tool = self._get_tool(name)
+        if tool is None:
+            return ErrorData(code=INVALID_PARAMS, message=f"Unknown tool: {name}")
+
+        metadata = tool.fn_metadata
+        try:
+            metadata.arg_model.model_validate(metadata.pre_parse_json(arguments))
+        except pydantic.ValidationError as e:
+            return ErrorData(
+                code=INVALID_PARAMS,
+                message=f"Invalid arguments for tool {name}",
+                data=e.errors(include_url=False, include_context=False, include_input=False),
+            )
+        return None
+
+    def _parse_params(self, params: Any) -> Tuple[Optional[str], Dict[str, Any]]:
+        if not isinstance(params, dict):
+            return None, {}
+        name, arguments = params.get("name"), params.get("arguments")
+        if not isinstance(name, str):
+            return None, {}
+        if arguments is None:
+            arguments = {}
+        if not isinstance(arguments, dict):
+            return None, {}
+        return name, arguments
+
+    def _get_tool(self, name: str) -> Optional[Tool]:
+        tool = self.tool_manager.get_tool(name)
+        if tool is None or self._ready.get(name) is tool:
+            return tool
+        arg_model = tool.fn_metadata.arg_model
+        if not arg_model.__pydantic_complete__:
+            arg_model.model_rebuild()
+        self._ready[name] = tool
+        return tool
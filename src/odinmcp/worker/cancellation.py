@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+import redis
+
+from odinmcp import metrics
+from odinmcp.config import settings
+from odinmcp.store import LocalCache, get_redis, redis_key
+
+
+logger = logging.getLogger(__name__)
+
+
+class CancellationRegistry:
+    """
+    Cooperative cancellation of in-flight request tasks.
+
+    `cancel` marks a request task as cancelled (a key with a TTL) and broadcasts its id over redis
+    pub/sub. Every worker process listens on a background thread and cancels the matching asyncio
+    task, which raises CancelledError into the running tool at its next await.
+    Tasks that have not started yet are skipped when they start. The listener remembers the ids it
+    received, which answers for tasks enqueued after it subscribed. Older tasks check the mark in redis.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self._redis = redis_client
+        self._lock = threading.Lock()
+        self._running: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Task, float]] = {}
+        self._listener_pid: Optional[int] = None
+        # cancellations the listener received, and since when (wall clock) it has been subscribed
+        self._received = LocalCache(ttl=settings.cancellation_ttl)
+        self._subscribed_at: Optional[float] = None
+
+    @property
+    def redis(self) -> redis.Redis:
+        return self._redis or get_redis()
+
+    @property
+    def pubsub_channel(self) -> str:
+        return f"{settings.redis_key_prefix}:cancel"
+
+    def _key(self, task_id: str) -> str:
+        return f"{settings.redis_key_prefix}:cancelled:{task_id}"
+
+    def cancel(self, task_id: str) -> None:
+        """Signal every worker to stop the request task"""
+        if not settings.cancellation_enabled:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.set(self._key(task_id), 1, ex=settings.cancellation_ttl)
+            pipe.publish(self.pubsub_channel, task_id)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Could not cancel request task: %s", e)
+
+    def track(self, channel_id: str, task_id: str) -> None:
+        """Remember a pending request task of the channel, so the session can cancel it on DELETE"""
+        if not settings.cancellation_enabled:
+            return
+        key = redis_key("tasks", channel_id)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.sadd(key, task_id)
+            pipe.expire(key, settings.cancellation_ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Could not track request task: %s", e)
+
+    def untrack(self, channel_id: str, task_id: str) -> None:
+        if not settings.cancellation_enabled:
+            return
+        try:
+            self.redis.srem(redis_key("tasks", channel_id), task_id)
+        except redis.RedisError as e:
+            logger.warning("Could not untrack request task: %s", e)
+
+    def cancel_channel(self, channel_id: str) -> List[str]:
+        """Cancel every pending request task of the channel. Returns their ids"""
+        if not settings.cancellation_enabled:
+            return []
+        key = redis_key("tasks", channel_id)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.smembers(key)
+            pipe.delete(key)
+            task_ids = [task_id.decode() if isinstance(task_id, bytes) else task_id for task_id in pipe.execute()[0]]
+            if task_ids:
+                pipe = self.redis.pipeline(transaction=False)
+                for task_id in task_ids:
+                    pipe.set(self._key(task_id), 1, ex=settings.cancellation_ttl)
+                    pipe.publish(self.pubsub_channel, task_id)
+                pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Could not cancel request tasks of channel: %s", e)
+            return []
+        return task_ids
+
+    def is_cancelled(self, task_id: str) -> bool:
+        try:
+            return bool(self.redis.exists(self._key(task_id)))
+        except redis.RedisError as e:
+            logger.warning("Could not check cancellation of task: %s", e)
+            return False
+
+    async def run(self, task_id: str, awaitable: Awaitable, enqueued_at: Optional[float] = None) -> Any:
+        """
+        Run the awaitable as a cancellable asyncio task.
+        Raises CancelledError if the request is (or already was) cancelled.
+        enqueued_at (wall clock) lets a task the listener has heard about since skip the redis check
+        """
+        if not settings.cancellation_enabled:
+            return await awaitable
+        self.start_listener()
+        if not self._listened_since(enqueued_at) and self.is_cancelled(task_id):
+            self._skip(awaitable)
+
+        with self._lock:
+            # checked with the registration, so a cancellation received in between is not lost
+            cancelled = task_id in self._received
+            if not cancelled:
+                task = asyncio.ensure_future(awaitable)
+                self._running[task_id] = (asyncio.get_running_loop(), task, time.monotonic())
+        if cancelled:
+            self._skip(awaitable)
+        try:
+            return await task
+        finally:
+            with self._lock:
+                self._running.pop(task_id, None)
+
+    def _listened_since(self, enqueued_at: Optional[float]) -> bool:
+        """Whether any cancellation of a task enqueued at that time would have reached the listener"""
+        subscribed_at = self._subscribed_at
+        if enqueued_at is None or subscribed_at is None:
+            return False
+        # the web node's clock stamped enqueued_at. allow for skew between the hosts
+        return enqueued_at > subscribed_at + settings.cancellation_clock_skew
+
+    def _skip(self, awaitable: Awaitable) -> None:
+        metrics.cancelled_requests.inc(stage="before_start")
+        # never started, so close it instead of leaving an un-awaited coroutine behind
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise asyncio.CancelledError()
+
+    def record_revoked(self) -> None:
+        """A queued request task was dropped by celery before it started"""
+        metrics.cancelled_requests.inc(stage="queued")
+
+    def _cancel_running(self, task_id: str) -> None:
+        with self._lock:
+            self._received.set(task_id, True)
+            entry = self._running.get(task_id)
+        if entry is None:
+            return
+        loop, task, started_at = entry
+        if loop.is_closed() or task.done():
+            return
+        metrics.cancelled_requests.inc(stage="running")
+        metrics.cancelled_elapsed_seconds.inc(time.monotonic() - started_at)
+        loop.call_soon_threadsafe(task.cancel)
+        logger.info("Cancelled running request task %s", task_id)
+
+    def start_listener(self) -> None:
+        """Listen for cancellations on a background thread, unless this process already does"""
+        # one listener thread per process. threads do not survive a fork, so check the pid
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            self._running = {}
+            self._received.clear()
+            self._subscribed_at = None
+        threading.Thread(target=self._listen, name="odinmcp-cancellation", daemon=True).start()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                subscribed_at = time.time()
+                pubsub.subscribe(self.pubsub_channel)
+                self._subscribed_at = subscribed_at
+                # catch cancellations published before we (re)subscribed
+                with self._lock:
+                    running = list(self._running)
+                for task_id in running:
+                    if self.is_cancelled(task_id):
+                        self._cancel_running(task_id)
+                for message in pubsub.listen():
+                    task_id = message["data"]
+                    self._cancel_running(task_id.decode() if isinstance(task_id, bytes) else task_id)
+            except redis.RedisError as e:
+                # cancellations published until it resubscribes are missed. tasks check redis meanwhile
+                self._subscribed_at = None
+                logger.warning("Cancellation listener lost its connection: %s", e)
+                time.sleep(1)
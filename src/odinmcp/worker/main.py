@@ -1,34 +1,60 @@
+import asyncio
+import atexit
+import gc
 import hashlib
-from typing import Any, Type, Union
-from datetime import timedelta
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Coroutine, List, Type, Union
 from celery.result import AsyncResult
 from mcp.types import (
-    CancelledNotification, ClientRequest, ProgressNotification, ServerRequest, ClientNotification, ServerNotification, ClientResult, ServerResult
+    CallToolResult, CancelledNotification, ClientRequest, ProgressNotification, ClientNotification, ServerResult, TextContent
 )
-from mcp.shared.session import (
-    SendRequestT, SendResultT, SendNotificationT, ReceiveResultT, ProgressFnT
-)
-from mcp.shared.message import MessageMetadata, SessionMessage
 from mcp.server.lowlevel.server import Server as MCPServer
-from celery import Celery, states
-from odinmcp.constants import MCP_CELERY_PROGRESS_STATE
+from celery import Celery, current_task, states
+from celery.signals import task_prerun, task_revoked, worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
+from billiard.process import current_process
+from odinmcp.constants import ENQUEUED_AT_HEADER, MCP_CELERY_PROGRESS_STATE
 from odinmcp.config import settings
+from odinmcp import metrics
+from odinmcp.tracing import TRACEPARENT_HEADER, TraceContext, current_traceparent, start_span
 from mcp.types import JSONRPCRequest, JSONRPCNotification, JSONRPCResponse, JSONRPCError
 from odinmcp.models.auth import CurrentUser
 import json
-from mcp.client.session import ClientSession
-from asgiref.sync import async_to_sync
-from contextlib import AbstractAsyncContextManager, AsyncExitStack, asynccontextmanager
-from mcp.server.lowlevel.server import Server as MCPServer
-from mcp.server.session import ServerSession
-from mcp.server.lowlevel.server import LifespanResultT, request_ctx
-from mcp.server.models import InitializationOptions
-from mcp.types import ErrorData
+from contextlib import AsyncExitStack, contextmanager
+from mcp.server.lowlevel.server import request_ctx
+from mcp.types import ErrorData, RequestParams
 from odinmcp.worker.session import OdinWorkerSession
+from odinmcp.store.blobs import discard, offload, resolve_bytes
+from odinmcp.worker.cancellation import CancellationRegistry
+from odinmcp.worker.pool import get_tool_executor
+from odinmcp.store.liveness import ChannelClosedError, get_channel_liveness
+from odinmcp.store.subscriptions import get_resource_subscriptions
+from odinmcp.hermod import HermodEventLog, get_hermod_publisher
+from odinmcp.hermod.framing import encode_jsonrpc_result
+from odinmcp.store import get_redis
+from odinmcp.store.sessions import get_session_store, is_opaque_session_id
 from mcp.shared.context import RequestContext
 from mcp.shared.exceptions import McpError
 # from celery.task.control import revoke
 
+
+logger = logging.getLogger(__name__)
+
+# parsed and framed once before the pool forks, see warm_up_before_fork
+WARM_UP_REQUEST = '{"jsonrpc":"2.0","id":0,"method":"tools/call","params":{"name":"warm_up","arguments":{}}}'
+
+
+class _ThreadLoop:
+    """A worker thread's event loop and the lifespan held open on it. Kept off the thread local, so shutdown can reach it"""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self.lifespan = None
+
+
 class OdinWorker:
 
     def __init__(
@@ -38,6 +64,14 @@ class OdinWorker:
     ):
         self.mcp_server = mcp_server
         self.current_user_model = current_user_model
+        self.cancellation = CancellationRegistry()
+        self._warm_up_hooks: List[Callable[[], None]] = []
+        # per worker thread: event loop and the lifespan held open on it
+        self._local = threading.local()
+        self._loops: List[_ThreadLoop] = []
+        self._loops_lock = threading.Lock()
+        # the threads pool's threads and the test worker get no shutdown signal: exit the lifespans at exit
+        atexit.register(self._close_event_loops)
         self.worker = self._build_worker()
 
     def get_worker(self):
@@ -45,26 +79,67 @@ class OdinWorker:
 
     
     def handle_mcp_request(self, request: JSONRPCRequest, channel_id: str, current_user: CurrentUser):
+        # deterministic, so a cancellation can find the task without a lookup
+        task_id = self._generate_request_task_id(request.id, current_user, channel_id)
+        self.cancellation.track(channel_id, task_id)
         self.worker.send_task(
             "handle_mcp_request", 
-            args=(request.model_dump_json(by_alias=True, exclude_none=True), channel_id, current_user.model_dump_json(by_alias=True, exclude_none=True))
+            args=(offload(request.model_dump_json(by_alias=True, exclude_none=True)), channel_id, current_user.model_dump_json(by_alias=True, exclude_none=True)),
+            task_id=task_id,
+            headers=self._task_headers(),
+            # sent by name, so celery doesn't know the task ignores its result. without this the web
+            # process subscribes to a result channel per request
+            ignore_result=not settings.celery_store_request_results,
         )
     
     def handle_mcp_notification(self, notification: JSONRPCNotification, channel_id: str, current_user: CurrentUser):
-        self.worker.send_task("handle_mcp_notification", args=(notification.model_dump_json(by_alias=True, exclude_none=True), channel_id, current_user.model_dump_json(by_alias=True, exclude_none=True)))
+        if notification.method == "notifications/cancelled":
+            # cancel right away instead of waiting for a worker to pick up the notification
+            self.cancel_request((notification.params or {}).get("requestId"), channel_id, current_user)
+            if CancelledNotification not in self.mcp_server.notification_handlers:
+                return
+        self.worker.send_task(
+            "handle_mcp_notification",
+            args=(notification.model_dump_json(by_alias=True, exclude_none=True), channel_id, current_user.model_dump_json(by_alias=True, exclude_none=True)),
+            ignore_result=not settings.celery_store_notification_results,
+        )
+
+    def cancel_request(self, request_id: str, channel_id: str, current_user: CurrentUser):
+        """Drop the request task if it is still queued, and stop it if it is running"""
+        if request_id is None:
+            return
+        task_id = self._generate_request_task_id(request_id, current_user, channel_id)
+        self.worker.control.revoke(task_id)
+        self.cancellation.cancel(task_id)
     
     def handle_mcp_response(self, response: Union[JSONRPCResponse, JSONRPCError], channel_id: str, current_user: CurrentUser):
-        self.worker.send_task(
-            "handle_mcp_response", 
-            args=(response.model_dump_json(by_alias=True, exclude_none=True), channel_id, current_user.model_dump_json(by_alias=True, exclude_none=True)),
-            task_id=self._generate_response_task_id(response.id, current_user, channel_id)
+        """
+        Store the client's response as the result the waiting send_request polls for.
+        Written straight to the result backend (one write, expiring with result_expires), no task involved.
+        """
+        self.worker.backend.store_result(
+            self._generate_response_task_id(response.id, current_user, channel_id),
+            result=offload(response.model_dump_json(by_alias=True, exclude_none=True)),
+            state=states.SUCCESS,
         )
 
     def terminate_session(self, channel_id: str, current_user: CurrentUser):
-        self.worker.send_task(
-            "terminate_session", 
-            args=(channel_id, current_user.model_dump_json(by_alias=True, exclude_none=True))
-        )
+        """
+        Tear the session down from the web process. No worker is involved:
+        pending requests are revoked, the event log and route are dropped and hermod closes the stream.
+        """
+        # workers stop picking up and publishing work for this channel
+        get_channel_liveness().mark_closed(channel_id)
+        task_ids = self.cancellation.cancel_channel(channel_id)
+        if task_ids:
+            self.worker.control.revoke(task_ids)
+        HermodEventLog().delete(channel_id)
+        get_resource_subscriptions().remove_channel(channel_id)
+        if is_opaque_session_id(channel_id):
+            get_session_store().delete(channel_id)
+        publisher = get_hermod_publisher()
+        publisher.close(channel_id)
+        publisher.router.forget(channel_id)
 
     def _build_worker(self):
         worker =  Celery(
@@ -72,45 +147,286 @@ class OdinWorker:
             broker=settings.celery_broker,
             backend=settings.celery_backend
         )
-        worker.task(self.task_handle_mcp_request, name="handle_mcp_request")
-        worker.task(self.task_handle_mcp_notification, name="handle_mcp_notification")
+        worker.conf.result_expires = settings.celery_result_expires
+        # fire and forget: a None result per request would be a useless write (and key) per call
+        worker.task(
+            self.task_handle_mcp_request, name="handle_mcp_request",
+            ignore_result=not settings.celery_store_request_results,
+        )
+        worker.task(
+            self.task_handle_mcp_notification, name="handle_mcp_notification",
+            ignore_result=not settings.celery_store_notification_results,
+        )
         worker.task(self.task_handle_mcp_response, name="handle_mcp_response")
-        worker.task(self.task_terminate_session, name="terminate_session")
+        worker.task(
+            self.task_terminate_session, name="terminate_session",
+            ignore_result=not settings.celery_store_notification_results,
+        )
+        task_revoked.connect(self._on_task_revoked, weak=False)
+        worker_process_init.connect(self._start_metrics_server, weak=False)
+        task_prerun.connect(self._start_metrics_server, weak=False)
+        worker_init.connect(self._on_worker_init, weak=False)
+        worker_process_init.connect(self._on_worker_process_init, weak=False)
+        worker_process_shutdown.connect(self._on_worker_process_shutdown, weak=False)
+        worker_shutdown.connect(self._on_worker_process_shutdown, weak=False)
+        # the web tier sends tasks from forked processes (odinmcp web --workers). drop the broker
+        # connection pools inherited from the parent, the same way celery's own pool processes do
+        os.register_at_fork(after_in_child=worker._after_fork)
         return worker
 
+    def _start_metrics_server(self, **kwargs):
+        # one sidecar per pool process. prefork children start theirs on init, other pools on their first task
+        if settings.metrics_enabled and settings.metrics_worker_port:
+            metrics.start_metrics_server(settings.metrics_worker_port + (getattr(current_process(), "index", None) or 0))
+
+    def add_warm_up(self, hook: Callable[[], None]) -> None:
+        """Run the hook in the main worker process, before the pool forks"""
+        self._warm_up_hooks.append(hook)
+
+    def _on_worker_init(self, sender=None, **kwargs):
+        if settings.worker_warm_up_enabled and getattr(sender, "app", None) is self.worker:
+            self.warm_up_before_fork()
+
+    def _on_worker_process_init(self, **kwargs):
+        # prefork children (and the solo pool) only take tasks once this returns
+        if settings.worker_warm_up_enabled:
+            self.warm_up_after_fork()
+
+    def _on_worker_process_shutdown(self, pid=None, **kwargs):
+        # prefork children get worker_process_shutdown. the solo and threads pools run tasks in the
+        # main process, which gets worker_shutdown once no task is running anymore
+        if pid in (None, os.getpid()):
+            self._close_event_loops()
+            get_tool_executor().shutdown()
+
+    def warm_up_before_fork(self) -> None:
+        """
+        Build what every pool process would otherwise build on its first request: tool validators
+        (through the hooks), lazy imports and caches on the parse and framing paths. Then freeze
+        the heap, so the forked processes share it copy on write instead of touching it on gc.
+        """
+        started_at = time.perf_counter()
+        for hook in self._warm_up_hooks:
+            hook()
+        rpc_request = JSONRPCRequest.model_validate_json(WARM_UP_REQUEST)
+        ClientRequest(json.loads(WARM_UP_REQUEST))
+        encode_jsonrpc_result(rpc_request.id, ServerResult(CallToolResult(content=[TextContent(type="text", text="")])))
+        gc.collect()
+        gc.freeze()
+        logger.info("Warmed up before fork in %.1fms", (time.perf_counter() - started_at) * 1000)
+
+    def warm_up_after_fork(self) -> None:
+        """Open the per process connections and the lifespan before the first task"""
+        started_at = time.perf_counter()
+        try:
+            # zero mq drops messages published before the connection is up. connect now, not on the first
+            # response. per node sockets too, when channels are routed to one node
+            get_hermod_publisher().connect()
+        except Exception as e:
+            logger.warning("Could not connect to hermod during warm up: %s", e)
+        try:
+            get_redis().ping()
+        except Exception as e:
+            logger.warning("Could not connect to redis during warm up: %s", e)
+        if settings.cancellation_enabled:
+            # subscribed before the first task, so tasks enqueued from now on skip the redis check
+            self.cancellation.start_listener()
+        if settings.worker_persistent_lifespan and settings.worker_warm_up_lifespan_timeout:
+            try:
+                self._run(asyncio.wait_for(self._lifespan_context(), settings.worker_warm_up_lifespan_timeout))
+            except asyncio.TimeoutError:
+                logger.warning(
+                    "Lifespan not entered within %ss during warm up, leaving it to the first task",
+                    settings.worker_warm_up_lifespan_timeout,
+                )
+            except Exception as e:
+                # retried by the first request
+                logger.warning("Could not enter the lifespan during warm up: %s", e)
+        logger.info("Warmed up after fork in %.1fms", (time.perf_counter() - started_at) * 1000)
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        # one loop per worker thread, kept across tasks. state inherited through a fork is dropped
+        state = getattr(self._local, "state", None)
+        if state is None or state.pid != os.getpid() or state.loop.is_closed():
+            state = self._local.state = _ThreadLoop()
+            with self._loops_lock:
+                self._loops = [other for other in self._loops if other.pid == state.pid and other is not state]
+                self._loops.append(state)
+        return state.loop
+
+    def _run(self, coroutine: Coroutine) -> Any:
+        return self._event_loop().run_until_complete(coroutine)
+
+    async def _lifespan_context(self) -> Any:
+        """The lifespan context of this thread's loop, entered on first use and held until shutdown"""
+        state = self._local.state
+        if state.lifespan is None:
+            entered = asyncio.get_running_loop().create_future()
+            stop = asyncio.Event()
+            # entered and exited by the same task, which some context managers (anyio) require
+            task = asyncio.ensure_future(self._hold_lifespan(entered, stop))
+            try:
+                context = await entered
+            except asyncio.CancelledError:
+                # timed out during warm up: unwind what was entered so far, the next task starts over
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise
+            state.lifespan = (context, stop, task)
+        return state.lifespan[0]
+
+    async def _hold_lifespan(self, entered: asyncio.Future, stop: asyncio.Event) -> None:
+        try:
+            async with self.mcp_server.lifespan(self.mcp_server) as context:
+                entered.set_result(context)
+                await stop.wait()
+        except BaseException as e:
+            if not entered.done():
+                entered.set_exception(e)
+                return
+            raise
+
+    def _close_event_loops(self) -> None:
+        with self._loops_lock:
+            loops, self._loops = self._loops, []
+        for state in loops:
+            # a loop still running a task belongs to a thread that was not stopped, leave it alone
+            if state.pid != os.getpid() or state.loop.is_closed() or state.loop.is_running():
+                continue
+            try:
+                if state.lifespan is not None:
+                    _, stop, task = state.lifespan
+                    stop.set()
+                    state.loop.run_until_complete(task)
+            except Exception as e:
+                logger.warning("Lifespan exit failed: %s", e)
+            finally:
+                state.lifespan = None
+                state.loop.close()
+
+    def _task_headers(self) -> dict | None:
+        headers = {}
+        if settings.metrics_enabled or settings.cancellation_enabled:
+            # lets the worker measure how long the request waited in the broker, and tell whether its
+            # cancellation listener was already subscribed when the request was enqueued
+            headers[ENQUEUED_AT_HEADER] = time.time()
+        traceparent = current_traceparent()
+        if traceparent:
+            headers[TRACEPARENT_HEADER] = traceparent
+        return headers or None
+
+    def _on_task_revoked(self, sender=None, request=None, **kwargs):
+        if getattr(sender, "name", None) == "handle_mcp_request":
+            self.cancellation.record_revoked()
+
+    def _generate_request_task_id(self, request_id: str, current_user: CurrentUser, channel_id: str) -> str:
+        return hashlib.sha256(f"request_{current_user.user_id}_{channel_id}_{request_id}".encode()).hexdigest()
+
     def _generate_response_task_id(self, request_id: str, current_user: CurrentUser, channel_id: str) -> str:
         return hashlib.sha256(f"response_{current_user.user_id}_{channel_id}_{request_id}".encode()).hexdigest()
 
     def task_handle_mcp_request(self, request: str, channel_id: str, current_user: str) -> None:
-        return async_to_sync(self.task_async_handle_mcp_request)(request, channel_id, current_user)
+        enqueued_at = current_task.request.get(ENQUEUED_AT_HEADER) if current_task else None
+        queued_for = time.time() - enqueued_at if enqueued_at else None
+        traceparent = current_task.request.get(TRACEPARENT_HEADER) if current_task else None
+        try:
+            return self._run(self.task_async_handle_mcp_request(
+                resolve_bytes(request), channel_id, current_user, queued_for, traceparent, enqueued_at,
+            ))
+        finally:
+            discard(request)
+            if current_task:
+                self.cancellation.untrack(channel_id, current_task.request.id)
 
-    async def task_async_handle_mcp_request(self, request: str, channel_id: str, current_user: str) -> None:
+    async def task_async_handle_mcp_request(
+        self,
+        request: str,
+        channel_id: str,
+        current_user: str,
+        queued_for: float | None = None,
+        traceparent: str | None = None,
+        enqueued_at: float | None = None,
+    ) -> None:
+        rpc_request = JSONRPCRequest.model_validate_json(request)
+        labels = {
+            "method": rpc_request.method,
+            "tool": (rpc_request.params or {}).get("name", "") if rpc_request.method == "tools/call" else "",
+        }
+        parent = TraceContext.from_traceparent(traceparent)
+        if queued_for is not None:
+            metrics.request_stage_seconds.observe(queued_for, stage="queue", **labels)
+            with start_span("queue", parent, start_time=time.time() - queued_for, **labels):
+                pass
+        with start_span(f"worker {rpc_request.method}", parent, **labels):
+            await self._handle_mcp_request(rpc_request, request, channel_id, current_user, labels, enqueued_at)
+
+    @contextmanager
+    def _stage(self, stage: str, labels: dict):
+        """Time a stage of a request, as a metric and a span"""
+        with metrics.request_stage_seconds.time(stage=stage, **labels), start_span(stage, **labels):
+            yield
+
+    async def _handle_mcp_request(
+        self,
+        rpc_request: JSONRPCRequest,
+        request: str,
+        channel_id: str,
+        current_user: str,
+        labels: dict,
+        enqueued_at: float | None = None,
+    ) -> None:
+        if not get_channel_liveness().is_alive(channel_id):
+            # the session is gone. skip the lifespan and the handler entirely
+            metrics.requests.inc(status="skipped", **labels)
+            return
 
         current_user = self.current_user_model.model_validate_json(current_user)
         async with AsyncExitStack() as stack:
-            lifespan_context = await stack.enter_async_context(self.mcp_server.lifespan(self.mcp_server))
+            with self._stage("lifespan", labels):
+                if settings.worker_persistent_lifespan:
+                    lifespan_context = await self._lifespan_context()
+                else:
+                    lifespan_context = await stack.enter_async_context(self.mcp_server.lifespan(self.mcp_server))
             session = OdinWorkerSession(
                 channel_id,
                 current_user,
                 self.mcp_server.create_initialization_options(),
                 response_task_id_generator=self._generate_response_task_id,
             )
-            rpc_request = JSONRPCRequest.model_validate_json(request)
+            # make sure no coalesced frames are left behind if the request fails early
+            stack.callback(session.flush)
             cli_req = ClientRequest(json.loads(request))
 
             if type(cli_req.root) in self.mcp_server.request_handlers:
                 handler = self.mcp_server.request_handlers[type(cli_req.root)]
                 token = None
+                meta = (rpc_request.params or {}).get("_meta", None)
+                traceparent = current_traceparent()
+                if traceparent:
+                    # lets tools pass the trace on to their own downstream calls
+                    meta = {**(meta or {}), TRACEPARENT_HEADER: traceparent}
                 try:
                     token = request_ctx.set(
                         RequestContext(
                             rpc_request.id,
-                            rpc_request.params.get("_meta", None),
+                            RequestParams.Meta.model_validate(meta) if meta is not None else None,
                             session, 
                             lifespan_context,
                         )
                     ) 
-                    response = await handler(cli_req.root)
+                    with self._stage("handler", labels):
+                        response = await self.cancellation.run(
+                            self._generate_request_task_id(rpc_request.id, current_user, channel_id),
+                            handler(cli_req.root),
+                            enqueued_at=enqueued_at,
+                        )
+                except ChannelClosedError:
+                    metrics.requests.inc(status="channel_closed", **labels)
+                    return
+                except asyncio.CancelledError:
+                    # the client cancelled the request. it does not expect a response
+                    metrics.requests.inc(status="cancelled", **labels)
+                    return
                 except McpError as err:
                     response = err.error
                 except Exception as err:
@@ -124,24 +440,21 @@ class OdinWorker:
             else:
                 response = ErrorData(code=0, message="Handler not found", data=None)
 
-            await session._send_response(response, rpc_request.id)
+            metrics.requests.inc(status=response.code if isinstance(response, ErrorData) else "ok", **labels)
+            try:
+                with self._stage("response", labels):
+                    await session._send_response(response, rpc_request.id)
+            except ChannelClosedError:
+                # the session was deleted while the handler ran
+                return
    
     def task_handle_mcp_notification(self, notification: str, channel_id: str, current_user: str) -> None:
-        return async_to_sync(self.task_async_handle_mcp_notification)(notification, channel_id, current_user)
+        return self._run(self.task_async_handle_mcp_notification(notification, channel_id, current_user))
     
     async def task_async_handle_mcp_notification(self, notification: str, channel_id: str, current_user: str) -> None:
         cli_notif = ClientNotification(json.loads(notification))
         current_user = self.current_user_model.model_validate_json(current_user)
 
-        if isinstance(cli_notif.root, CancelledNotification):
-            cancelled_id = cli_notif.root.params.requestId
-            task_id = self._generate_response_task_id(cancelled_id, current_user, channel_id)
-            task = AsyncResult(task_id)
-            
-            if not (task.successful() or task.failed()):
-                self.worker.control.revoke(task_id)
-            
-
         if isinstance(cli_notif.root, ProgressNotification):
             progress_id = cli_notif.root.params.progressToken
             task_id = self._generate_response_task_id(progress_id, current_user, channel_id)
@@ -161,17 +474,12 @@ class OdinWorker:
             except Exception as err:
                 pass
 
-    def task_handle_mcp_response(self, response: str, channel_id: str, current_user: str) -> None:
-        return async_to_sync(self.task_async_handle_mcp_response)(response, channel_id, current_user)
-    
-    async def task_async_handle_mcp_response(self, response: str, channel_id: str, current_user: str) -> str:
+    def task_handle_mcp_response(self, response: str, channel_id: str, current_user: str) -> str:
+        # responses are stored by the web tier now (handle_mcp_response). kept for tasks enqueued by
+        # web processes of an earlier version during a rolling deploy
         return response
-    
+
     def task_terminate_session(self, channel_id: str, current_user: str) -> None:
-        current_user = self.current_user_model.model_validate_json(current_user)
-        session = OdinWorkerSession(channel_id, current_user, self.mcp_server.create_initialization_options())
-        session.terminate()
-        pass
-        
-        
-        
\ No newline at end of file
+        # sessions are terminated by the web tier now (terminate_session). kept for tasks enqueued by
+        # web processes of an earlier version during a rolling deploy
+        self.terminate_session(channel_id, self.current_user_model.model_validate_json(current_user))
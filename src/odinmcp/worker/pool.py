@@ -0,0 +1,165 @@
+"""
+Process and thread pools for tools declared CPU bound, e.g. `@mcp.tool(executor="process")`.
+
+A synchronous tool runs inline on the worker's event loop and blocks it. Pooled tools are
+submitted to a pool of the current worker process and awaited, so the loop keeps serving other
+requests and the cancellation listener. Pools are created on first use and re-created after a
+fork, so every prefork child has its own. Prefork children are daemonic, which multiprocessing
+refuses to start processes from, so the flag is cleared while pool processes are started.
+"""
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional, Set
+
+from odinmcp.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_PROCESS = "process"
+EXECUTOR_THREAD = "thread"
+EXECUTORS = (EXECUTOR_PROCESS, EXECUTOR_THREAD)
+
+# modules of the process pool tools, imported once by the forkserver instead of by every pool process
+_preload_modules: Set[str] = set()
+# the daemon flag is process wide, so starting pool processes is serialized
+_daemon_lock = threading.Lock()
+
+
+@contextmanager
+def _children_allowed() -> Iterator[None]:
+    """
+    Let a daemonic process (a celery prefork child) start the pool processes. They don't outlive it:
+    the pool is shut down on worker_process_shutdown, and the workers exit once its queues close.
+    A billiard child also carries billiard's authkey type, which multiprocessing can't send to the
+    forkserver or a spawned process, so it is swapped for multiprocessing's own meanwhile.
+    """
+    with _daemon_lock:
+        config = multiprocessing.current_process()._config
+        saved = {key: config.get(key) for key in ("daemon", "authkey")}
+        config["daemon"] = False
+        if saved["authkey"] is not None:
+            config["authkey"] = multiprocessing.process.AuthenticationString(saved["authkey"])
+        try:
+            yield
+        finally:
+            config.update(saved)
+
+
+class ToolExecutor:
+    """The pools of one worker process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._pools: Dict[str, Executor] = {}
+
+    def _pool(self, kind: str) -> Executor:
+        with self._lock:
+            if self._pid != os.getpid():
+                # inherited through a fork: the parent's pool processes and threads are not ours
+                self._pid = os.getpid()
+                self._pools = {}
+            pool = self._pools.get(kind)
+            if pool is None:
+                if kind == EXECUTOR_PROCESS:
+                    context = multiprocessing.get_context(settings.tool_process_pool_start_method)
+                    if context.get_start_method() == "forkserver":
+                        context.set_forkserver_preload(sorted(_preload_modules))
+                    pool = ProcessPoolExecutor(
+                        max_workers=settings.tool_process_pool_size or os.cpu_count(),
+                        mp_context=context,
+                    )
+                else:
+                    pool = ThreadPoolExecutor(
+                        max_workers=settings.tool_thread_pool_size,
+                        thread_name_prefix="odinmcp-tool",
+                    )
+                self._pools[kind] = pool
+            return pool
+
+    async def run(self, kind: str, fn: Callable[..., Any], kwargs: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        """
+        Run fn(**kwargs) in the pool and await the result.
+        Raises TimeoutError after `timeout` seconds. On timeout or cancellation a queued call is
+        dropped, and a running call in the process pool is stopped by replacing the pool.
+        """
+        pool = self._pool(kind)
+        if kind == EXECUTOR_PROCESS:
+            # the process pool starts its processes (and the forkserver) on submit, as they are needed
+            with _children_allowed():
+                future = pool.submit(fn, **kwargs)
+        else:
+            future = pool.submit(fn, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self._stop(kind, pool, future)
+            raise TimeoutError(f"Tool call did not finish within {timeout}s") from None
+        except asyncio.CancelledError:
+            self._stop(kind, pool, future)
+            raise
+
+    def _stop(self, kind: str, pool: Executor, future: Future) -> None:
+        # wait_for cancels the wrapped future, which cancels a call that has not started yet
+        if not future.cancel() and not future.done():
+            self._abandon(kind, pool, future)
+
+    def _abandon(self, kind: str, pool: Executor, future: Future) -> None:
+        if kind != EXECUTOR_PROCESS or not settings.tool_process_pool_kill_on_cancel:
+            # a thread can't be interrupted. it finishes and the result is dropped
+            logger.info("Abandoned a running %s pool call", kind)
+            return
+        with self._lock:
+            if self._pools.get(kind) is pool:
+                del self._pools[kind]
+        # calls running in the same pool fail with BrokenProcessPool
+        processes = list(getattr(pool, "_processes", None) or {})
+        pool.shutdown(wait=False, cancel_futures=True)
+        for pid in processes:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        logger.info("Stopped a running process pool call, replaced the pool")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pools, self._pools = (self._pools if self._pid == os.getpid() else {}), {}
+        for pool in pools.values():
+            # waits for the pool processes to exit: a forked child that exits without joining them hangs in
+            # multiprocessing's exit handler. no task is running anymore when the worker shuts down
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+_tool_executor: Optional[ToolExecutor] = None
+
+
+def get_tool_executor() -> ToolExecutor:
+    global _tool_executor
+    if _tool_executor is None:
+        _tool_executor = ToolExecutor()
+    return _tool_executor
+
+
+def pooled(fn: Callable[..., Any], kind: str, timeout: Optional[float] = None) -> Callable[..., Any]:
+    """Async wrapper running the synchronous fn in the pool of the given kind"""
+    if kind not in EXECUTORS:
+        raise ValueError(f"executor must be one of {', '.join(EXECUTORS)}, got {kind!r}")
+    if kind == EXECUTOR_PROCESS and fn.__module__ != "__main__":
+        _preload_modules.add(fn.__module__)
+
+    @functools.wraps(fn)
+    async def run(**kwargs: Any) -> Any:
+        return await get_tool_executor().run(
+            kind, fn, kwargs, settings.tool_executor_timeout if timeout is None else timeout,
+        )
+
+    return run
@@ -1,43 +1,32 @@
 
-import hashlib
-from typing import Any, Callable, Type
+from typing import Any, Callable
 from datetime import timedelta
+import asyncio
 import uuid
 from mcp.shared.exceptions import McpError
-from mcp.types import (
-    ClientRequest, ProgressNotification, ServerRequest, ClientNotification, ServerNotification, ClientResult, ServerResult
-)
+from mcp.types import LoggingLevel, LoggingMessageNotification, ProgressNotification
 from mcp.shared.session import (
     SendRequestT, SendResultT, SendNotificationT, ReceiveResultT, ProgressFnT, RequestId
 )
-from mcp.shared.message import MessageMetadata, SessionMessage, ServerMessageMetadata
-from mcp.server.lowlevel.server import Server as MCPServer
-from celery import Celery
+from mcp.shared.message import MessageMetadata, SessionMessage
 from odinmcp.constants import MCP_CELERY_PROGRESS_STATE
-from odinmcp.config import settings
 from mcp.types import JSONRPCRequest
-from odinmcp.models.auth import CurrentUser
 import json
-from mcp.client.session import ClientSession
-from asgiref.sync import async_to_sync
-from contextlib import AbstractAsyncContextManager, AsyncExitStack, asynccontextmanager
-from mcp.server.lowlevel.server import Server as MCPServer
 from mcp.server.session import ServerSession
-from mcp.server.lowlevel.server import LifespanResultT
 from mcp.server.models import InitializationOptions
 from mcp.types import InitializeRequestParams, JSONRPCResponse, JSONRPCError, JSONRPCMessage
 from odinmcp.models.auth import CurrentUserT
-from odinmcp.config import settings
-import zmq
-import json
-from mcp.types import ErrorData, JSONRPCNotification
-import requests
+from mcp.types import ErrorData
 import time
-from pydantic import BaseModel
 from celery.result import AsyncResult
-
-
-
+from odinmcp.hermod import get_hermod_publisher
+from odinmcp.store.blobs import discard, resolve_bytes
+from odinmcp.store.liveness import ChannelClosedError, get_channel_liveness
+from odinmcp.store.log_levels import get_channel_log_levels, is_enabled
+from odinmcp.config import settings
+from odinmcp import metrics
+from odinmcp.tracing import start_span
+from odinmcp.hermod.framing import dump_json, encode_jsonrpc_error, encode_jsonrpc_notification, encode_jsonrpc_result
 
 
 class OdinWorkerSession( ServerSession ):
@@ -55,59 +44,38 @@ class OdinWorkerSession( ServerSession ):
         self._current_user = current_user   
         self._channel_id = channel_id
         self._response_task_id_generator = response_task_id_generator
+        self._publisher = get_hermod_publisher()
+        self._liveness = get_channel_liveness()
+        # the channel's logging/setLevel level, looked up on the first log message
+        self._log_level: str | None = None
+        self._log_level_loaded = False
 
         client_params =self._current_user.get_client_params(self._channel_id)
         self._client_params = client_params        
                 
 
-    def get_hermod_socket(self) -> zmq.Socket:
-        zmq_context = zmq.Context()
-        hermod_socket = zmq_context.socket(zmq.PUB)
-        for url in settings.hermod_zero_mq_urls:
-            hermod_socket.connect(url)
-        return hermod_socket
-
-    def terminate(self):
-        hermod_socket = self.get_hermod_socket()
-        item = {
-            "channel": self._channel_id,
-            "formats":{
-                "http-stream": {
-                    "action":"close",
-                }
-            }
-        }
-        # TODO: wait till socket is ready instead of time
-        time.sleep(0.1)
-        hermod_socket.send_multipart(
-            [
-                self._channel_id.encode(),
-                ("J" + json.dumps(item)).encode(),
-            ]
-        )
-        
-        
+    @property
+    def current_user(self) -> CurrentUserT:
+        return self._current_user
+
+    @property
+    def channel_id(self) -> str:
+        return self._channel_id
+
+    def flush(self):
+        self._publisher.flush(self._channel_id)
     
-    def send_sse_message(self, message: SessionMessage) -> None:
-        hermod_socket = self.get_hermod_socket()
-        
-        content = "event: message\ndata: " + message.message.model_dump_json(by_alias=True, exclude_none=True)
-        item = {
-            "channel": self._channel_id,
-            "formats":{
-                "http-stream": {
-                    "content": content +"\n\n"
-                }
-            }
-        }
-        # TODO: wait till socket is ready instead of time
-        time.sleep(0.1)
-        hermod_socket.send_multipart(
-            [
-                self._channel_id.encode(),
-                ("J" + json.dumps(item)).encode(),
-            ]
-        )
+    def send_sse_message(self, message: SessionMessage, flush: bool = False) -> None:
+        self.send_sse_data(dump_json(message.message), flush=flush)
+
+    def send_sse_data(self, data: bytes, flush: bool = False) -> None:
+        """Publish an already serialised JSON-RPC message"""
+        if not self._liveness.is_alive(self._channel_id):
+            # nobody is listening anymore. stop the request instead of publishing into the void
+            raise ChannelClosedError("Channel closed")
+        # coalesced per channel by the publisher, which logs the events of a flush in one round trip
+        # and stamps their ids for Last-Event-ID replay. pass flush to send right away
+        self._publisher.publish_event(self._channel_id, data, flush=flush)
         
     
     async def send_request(
@@ -118,6 +86,20 @@ class OdinWorkerSession( ServerSession ):
         metadata: MessageMetadata = None,
         progress_callback: ProgressFnT | None = None,
     ) -> ReceiveResultT:
+        # a round trip to the client is usually the slowest hop of a tool call
+        with start_span("send_request", method=getattr(request, "root", request).method):
+            return await self._send_request(
+                request, result_type, request_read_timeout_seconds, metadata, progress_callback,
+            )
+
+    async def _send_request(
+        self,
+        request: SendRequestT,
+        result_type: type[ReceiveResultT],
+        request_read_timeout_seconds: timedelta,
+        metadata: MessageMetadata,
+        progress_callback: ProgressFnT | None,
+    ) -> ReceiveResultT:
         
         request_id = str(uuid.uuid4())
         request_data = request.model_dump(by_alias=True, mode="json", exclude_none=True)
@@ -141,13 +123,17 @@ class OdinWorkerSession( ServerSession ):
             message=JSONRPCMessage(jsonrpc_request),
             metadata=metadata,
         )
-        self.send_sse_message(session_message)
+        # the client has to see the request before we start waiting for its response
+        self.send_sse_message(session_message, flush=True)
 
         
         start_time = time.time()
         current_progress = None
+        result = AsyncResult(response_task_id)
+        # the web tier writes the response to the result backend. poll it without blocking the
+        # event loop, often at first (clients answering quickly), backing off for slow ones
+        poll_interval = settings.client_response_poll_min_interval
         while True:
-            result  = AsyncResult(response_task_id)
             if progress_callback is not None:
                 if result.state == MCP_CELERY_PROGRESS_STATE:
                     if current_progress != result.result["progress"]:
@@ -163,10 +149,12 @@ class OdinWorkerSession( ServerSession ):
                 break            
             if time.time() - start_time > request_read_timeout_seconds.total_seconds():
                 raise McpError("Request timeout")
-            time.sleep(0.1)
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, settings.client_response_poll_max_interval)
 
         response: str =  result.result
-        jsonrpc_response = JSONRPCMessage(root=json.loads(response))
+        jsonrpc_response = JSONRPCMessage(root=json.loads(resolve_bytes(response)))
+        discard(response)
         if isinstance(jsonrpc_response.root, JSONRPCError):
             raise McpError(jsonrpc_response.root.error)
         elif isinstance(jsonrpc_response.root, JSONRPCResponse):
@@ -179,42 +167,49 @@ class OdinWorkerSession( ServerSession ):
         
 
 
+    def _log_enabled(self, level: str) -> bool:
+        if not settings.log_level_filter_enabled:
+            return True
+        if not self._log_level_loaded:
+            self._log_level = get_channel_log_levels().get_level(self._channel_id)
+            self._log_level_loaded = True
+        if is_enabled(level, self._log_level):
+            return True
+        metrics.suppressed_log_messages.inc(level=level)
+        return False
+
+    async def send_log_message(
+        self,
+        level: LoggingLevel,
+        data: Any,
+        logger: str | None = None,
+        related_request_id: RequestId | None = None,
+    ) -> None:
+        # checked before the notification is even built
+        if self._log_enabled(level):
+            await super().send_log_message(level, data, logger, related_request_id)
+
     async def send_notification(
         self,
         notification: SendNotificationT,
         related_request_id: RequestId | None = None,
     ) -> None:
-        jsonrpc_notification = JSONRPCNotification(
-            jsonrpc="2.0",
-            **notification.model_dump(by_alias=True, mode="json", exclude_none=True),
-        )
-        session_message = SessionMessage(
-            message=JSONRPCMessage(jsonrpc_notification),
-            metadata=ServerMessageMetadata(related_request_id=related_request_id)
-            if related_request_id
-            else None,
-        )
-        self.send_sse_message(session_message)
+        root = getattr(notification, "root", notification)
+        if isinstance(root, LoggingMessageNotification) and not self._log_enabled(root.params.level):
+            return
+        self.send_sse_data(encode_jsonrpc_notification(notification))
 
     async def _send_response(
         self,
         response: SendResultT | ErrorData,
         request_id: RequestId,
     ) -> None:
+        # serialised straight from the handler result to the frame bytes
         if isinstance(response, ErrorData):
-            jsonrpc_error = JSONRPCError(jsonrpc="2.0", id=request_id, error=response)
-            message = JSONRPCMessage(jsonrpc_error)
+            data = encode_jsonrpc_error(request_id, response)
         else:
-            jsonrpc_response = JSONRPCResponse(
-                jsonrpc="2.0",
-                id=request_id,
-                result=response.model_dump(
-                    by_alias=True, mode="json", exclude_none=True
-                ),
-            )
-            message = JSONRPCMessage(jsonrpc_response)
-        session_message = SessionMessage(message=message)
-        self.send_sse_message(session_message)
+            data = encode_jsonrpc_result(request_id, response)
+        self.send_sse_data(data, flush=True)
 
     
     # Below methods are used with server.run() . Since we are not using server.run() we are not implementing them
@@ -0,0 +1,100 @@
+import asyncio
+import base64
+import json
+
+import httpx
+import pytest
+
+from odinmcp import OdinMCP
+from odinmcp.config import settings
+from odinmcp.store import set_redis
+from odinmcp.store.idempotency import get_request_deduplicator
+from odinmcp.store.liveness import get_channel_liveness
+from odinmcp.store.log_levels import get_channel_log_levels
+from odinmcp.store.sessions import get_session_store
+from odinmcp.store.subscriptions import get_resource_subscriptions
+
+
+PROCESS_LOCAL_STORES = (
+    get_request_deduplicator,
+    get_channel_liveness,
+    get_channel_log_levels,
+    get_session_store,
+    get_resource_subscriptions,
+)
+
+
+@pytest.fixture
+def redis_client():
+    """An in-memory redis used by every store of this process, whose local caches start empty"""
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis()
+    set_redis(client)
+    for store in PROCESS_LOCAL_STORES:
+        store.reset()
+    yield client
+    for store in PROCESS_LOCAL_STORES:
+        store.reset()
+
+
+class McpClient:
+    """Posts JSON-RPC messages to the web app over an initialized session"""
+
+    def __init__(self, client, headers: dict):
+        self.client = client
+        self.headers = headers
+
+    async def initialize(self) -> None:
+        response = await self.post({
+            "jsonrpc": "2.0", "id": 0, "method": "initialize",
+            "params": {"protocolVersion": "2025-03-26", "capabilities": {}, "clientInfo": {"name": "test", "version": "1"}},
+        })
+        self.headers = {**self.headers, "mcp-session-id": response.headers["mcp-session-id"]}
+
+    async def post(self, message: dict, **headers):
+        return await self.client.post("/", json=message, headers={**self.headers, **headers})
+
+    async def call_tool(self, request_id, name: str, arguments: dict, **headers):
+        return await self.post({
+            "jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+            "params": {"name": name, "arguments": arguments},
+        }, **headers)
+
+
+@pytest.fixture
+def mcp_app(redis_client, monkeypatch):
+    """A server whose requests are recorded in app.enqueued instead of sent to celery. Set app.failing to fail them"""
+    monkeypatch.setattr(settings, "hermod_streaming_token_secret", "s" * 40)
+    app = OdinMCP("test", "instructions")
+    app.enqueued = []
+    app.failing = False
+
+    def handle_mcp_request(request, channel_id, current_user):
+        if app.failing:
+            raise RuntimeError("broker down")
+        app.enqueued.append((request.id, request.params["arguments"]))
+
+    monkeypatch.setattr(app.worker, "handle_mcp_request", handle_mcp_request)
+    return app
+
+
+@pytest.fixture
+def run_client(mcp_app):
+    """Runs an async function with an initialized McpClient of the app's web tier"""
+    def run(main):
+        web, _ = mcp_app.sse_app()
+        headers = {
+            settings.user_info_token: base64.b64encode(json.dumps({"user_id": "user", "sid": "sid"}).encode()).decode(),
+            settings.hermod_streaming_header: "true",
+            "Accept": "application/json, text/event-stream",
+        }
+
+        async def session():
+            transport = httpx.ASGITransport(app=web, raise_app_exceptions=False)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                mcp_client = McpClient(client, headers)
+                await mcp_client.initialize()
+                await main(mcp_client)
+
+        asyncio.run(session())
+    return run
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from odinmcp.config import settings
+from odinmcp.hermod.event_log import HermodEventLog
+from odinmcp.store import blobs
+from odinmcp.store.blobs import (
+    FileBlobStore,
+    RedisBlobStore,
+    discard,
+    is_blob_reference,
+    offload,
+    resolve,
+    resolve_bytes,
+)
+
+
+@pytest.fixture(params=["redis", "file"])
+def blob_store(request, redis_client, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "blob_offload_threshold_bytes", 1024)
+    monkeypatch.setattr(settings, "blob_chunk_bytes", 300)
+    store = RedisBlobStore(redis_client) if request.param == "redis" else FileBlobStore(str(tmp_path))
+    monkeypatch.setattr(blobs, "_blob_store", store)
+    return store
+
+
+def test_small_payloads_stay_inline(blob_store):
+    for data in ("x" * 1024, b"x" * 1024):
+        assert offload(data) is data
+        assert resolve(data) is data
+
+
+@pytest.mark.parametrize("data", ["é" * 2000, os.urandom(5000)], ids=["str", "bytes"])
+def test_round_trip(blob_store, data):
+    reference = offload(data)
+    assert type(reference) is type(data)
+    assert is_blob_reference(reference)
+    assert len(reference) < 100
+    raw = data.encode() if isinstance(data, str) else data
+    assert bytes(resolve(reference)) == raw
+    assert resolve_bytes(reference) == raw
+    discard(reference)
+    with pytest.raises(KeyError):
+        resolve(reference)
+    # already gone, or not a reference at all
+    discard(reference)
+    discard(data)
+
+
+def test_event_log_offloads_large_events(blob_store, redis_client):
+    log = HermodEventLog()
+    first_id = log.append("channel", b"small")
+    large = b"a" * 4000
+    event_id = log.append("channel", large)
+    assert [(replayed_id, bytes(data)) for replayed_id, data in log.replay("channel", first_id)] == [(event_id, large)]
+    # the stream only holds the reference
+    ((_, fields),) = redis_client.xrange(next(iter(redis_client.keys("*:events:*"))), min=event_id, max=event_id)
+    assert is_blob_reference(fields[b"data"])
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+
+from odinmcp.config import settings
+from odinmcp.worker.cancellation import CancellationRegistry
+
+
+async def wait_for(condition, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def registry(redis_client):
+    return CancellationRegistry(redis_client)
+
+
+async def listening(registry: CancellationRegistry) -> CancellationRegistry:
+    registry.start_listener()
+    await wait_for(lambda: registry._subscribed_at is not None)
+    return registry
+
+
+async def answer(value=42, delay: float = 0):
+    await asyncio.sleep(delay)
+    return value
+
+
+def test_runs_to_completion(registry):
+    assert asyncio.run(registry.run("task", answer())) == 42
+
+
+def test_cancelled_before_start(registry):
+    registry.cancel("task")
+    coroutine = answer()
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(registry.run("task", coroutine))
+    # closed, never awaited
+    assert coroutine.cr_frame is None
+
+
+def test_cancelled_while_running(registry):
+    async def main():
+        await listening(registry)
+        task = asyncio.ensure_future(registry.run("task", answer(delay=30)))
+        await wait_for(lambda: "task" in registry._running)
+        registry.cancel("task")
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(task, 5)
+        assert not registry._running
+
+    asyncio.run(main())
+
+
+def test_tasks_enqueued_while_listening_skip_redis(registry, monkeypatch):
+    checked = []
+    is_cancelled = registry.is_cancelled
+    monkeypatch.setattr(registry, "is_cancelled", lambda task_id: checked.append(task_id) or is_cancelled(task_id))
+
+    async def main():
+        await listening(registry)
+        enqueued_at = time.time() + settings.cancellation_clock_skew + 1
+        assert await registry.run("new", answer(), enqueued_at=enqueued_at) == 42
+        registry.cancel("cancelled")
+        await wait_for(lambda: "cancelled" in registry._received)
+        with pytest.raises(asyncio.CancelledError):
+            await registry.run("cancelled", answer(), enqueued_at=enqueued_at)
+        assert checked == []
+        # enqueued before the listener subscribed: only redis knows
+        assert await registry.run("old", answer(), enqueued_at=time.time() - 60) == 42
+        assert checked == ["old"]
+
+    asyncio.run(main())
+
+
+def test_cancel_channel(registry):
+    registry.track("channel", "a")
+    registry.track("channel", "b")
+    registry.track("other", "c")
+    registry.untrack("channel", "b")
+    assert registry.cancel_channel("channel") == ["a"]
+    assert registry.is_cancelled("a")
+    assert not registry.is_cancelled("c")
+    assert registry.cancel_channel("channel") == []
+
+
+def test_disabled(registry, monkeypatch):
+    monkeypatch.setattr(settings, "cancellation_enabled", False)
+    registry.cancel("task")
+    assert asyncio.run(registry.run("task", answer())) == 42
+    assert registry._listener_pid is None
@@ -0,0 +1,58 @@
+import redis
+
+from odinmcp.config import settings
+from odinmcp.hermod.event_log import EMPTY_LOG_ID, HermodEventLog
+from odinmcp.store import redis_key
+
+
+UNREACHABLE_REDIS = redis.Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.1)
+
+
+def test_batches_chain_up(redis_client):
+    log = HermodEventLog()
+    first = log.append_batch({"a": [b"1", b"2"], "b": [b"x"], "c": []})
+    assert set(first) == {"a", "b"}
+    previous_id, (id_1, id_2) = first["a"]
+    assert previous_id == EMPTY_LOG_ID
+    assert id_1 < id_2
+    previous_id, event_ids = log.append_batch({"a": [b"3"]})["a"]
+    assert previous_id == id_2
+    assert first["b"][0] == EMPTY_LOG_ID
+    assert 0 < redis_client.ttl(redis_key("events", "a")) <= settings.hermod_event_log_ttl
+
+
+def test_resume_replays_after_the_last_event_id(redis_client):
+    log = HermodEventLog()
+    assert log.resume("a") == (EMPTY_LOG_ID, [])
+    ids = [log.append("a", data) for data in (b"1", b"2", b"3")]
+    assert log.resume("a") == (ids[-1], [])
+    latest_id, events = log.resume("a", ids[0])
+    assert latest_id == ids[-1]
+    assert [(event_id, bytes(data)) for event_id, data in events] == [(ids[1], b"2"), (ids[2], b"3")]
+    assert log.resume("a", ids[-1]) == (ids[-1], [])
+    # not a stream id: nothing to replay, the stream starts from the latest event
+    assert log.resume("a", "bogus") == (ids[-1], [])
+    assert [event_id for event_id, _ in log.replay("a", ids[1])] == [ids[2]]
+
+
+def test_delete(redis_client):
+    log = HermodEventLog()
+    log.append("a", b"1")
+    log.delete("a")
+    assert log.resume("a") == (EMPTY_LOG_ID, [])
+
+
+def test_disabled(redis_client, monkeypatch):
+    monkeypatch.setattr(settings, "hermod_event_log_enabled", False)
+    log = HermodEventLog()
+    assert log.append("a", b"1") is None
+    assert log.resume("a", "1-0") == (None, [])
+    assert redis_client.keys() == []
+
+
+def test_redis_down_loses_resumability_not_messages():
+    log = HermodEventLog(UNREACHABLE_REDIS)
+    assert log.append_batch({"a": [b"1", b"2"]}) == {"a": (None, [None, None])}
+    assert log.resume("a", "1-0") == (None, [])
+    assert log.replay("a", "1-0") == []
+    log.delete("a")
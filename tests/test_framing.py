@@ -0,0 +1,91 @@
+import json
+from typing import Any, Tuple
+
+import pytest
+from mcp.types import CallToolResult, ErrorData, LoggingMessageNotification, TextContent
+
+from odinmcp.config import settings
+from odinmcp.hermod.framing import (
+    encode_http_stream_close,
+    encode_http_stream_content,
+    encode_jsonrpc_error,
+    encode_jsonrpc_notification,
+    encode_jsonrpc_result,
+    encode_sse_event,
+)
+
+
+def parse_tnetstring(data: bytes, offset: int = 0) -> Tuple[Any, int]:
+    colon = data.index(b":", offset)
+    end = colon + 1 + int(data[offset:colon])
+    payload, kind = data[colon + 1:end], data[end:end + 1]
+    if kind == b",":
+        return payload, end + 1
+    assert kind == b"}", kind
+    item, position = {}, 0
+    while position < len(payload):
+        key, position = parse_tnetstring(payload, position)
+        item[key.decode()], position = parse_tnetstring(payload, position)
+    return item, end + 1
+
+
+def parse_grip_item(item: bytes) -> dict:
+    """The item as a dict of str, whichever format it was published in"""
+    if item[:1] == b"J":
+        return json.loads(item[1:])
+    assert item[:1] == b"T"
+    parsed, end = parse_tnetstring(item, 1)
+    assert end == len(item)
+    return json.loads(json.dumps(parsed, default=bytes.decode))
+
+
+@pytest.fixture(params=["tnetstring", "json"])
+def publish_format(request, monkeypatch):
+    monkeypatch.setattr(settings, "hermod_publish_format", request.param)
+    return request.param
+
+
+def test_sse_event():
+    assert encode_sse_event(b'{"a":1}') == b'event: message\ndata: {"a":1}\n\n'
+    assert encode_sse_event(b'{"a":1}', "5-0") == b'id: 5-0\nevent: message\ndata: {"a":1}\n\n'
+
+
+def test_jsonrpc_messages():
+    result = CallToolResult(content=[TextContent(type="text", text="héllo")])
+    assert json.loads(encode_jsonrpc_result("r-1", result)) == {
+        "jsonrpc": "2.0", "id": "r-1", "result": result.model_dump(by_alias=True, exclude_none=True),
+    }
+    assert json.loads(encode_jsonrpc_error(7, ErrorData(code=-32601, message="nope"))) == {
+        "jsonrpc": "2.0", "id": 7, "error": {"code": -32601, "message": "nope"},
+    }
+    notification = LoggingMessageNotification(
+        method="notifications/message", params={"level": "info", "data": "x"},
+    )
+    assert json.loads(encode_jsonrpc_notification(notification)) == {
+        "jsonrpc": "2.0", "method": "notifications/message", "params": {"level": "info", "data": "x"},
+    }
+
+
+def test_http_stream_content(publish_format):
+    # payloads holding the tnetstring delimiters and multi byte characters
+    frames = [encode_sse_event('{"text":"1:a,}é"}'.encode()), encode_sse_event(b"{}", "2-0")]
+    item = encode_http_stream_content(b"chan", frames, meta={"traceparent": "00-ab-cd-01"}, item_id="2-0", prev_id="1-0")
+    assert item[:1] == (b"T" if publish_format == "tnetstring" else b"J")
+    assert parse_grip_item(item) == {
+        "channel": "chan",
+        "id": "2-0",
+        "prev-id": "1-0",
+        "meta": {"traceparent": "00-ab-cd-01"},
+        "formats": {"http-stream": {"content": b"".join(frames).decode()}},
+    }
+
+
+def test_http_stream_content_without_ids(publish_format):
+    item = parse_grip_item(encode_http_stream_content(b"chan", [b"a", b"b"]))
+    assert item == {"channel": "chan", "formats": {"http-stream": {"content": "ab"}}}
+
+
+def test_http_stream_close(publish_format):
+    assert parse_grip_item(encode_http_stream_close(b"chan")) == {
+        "channel": "chan", "formats": {"http-stream": {"action": "close"}},
+    }
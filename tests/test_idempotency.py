@@ -0,0 +1,59 @@
+import redis
+
+from odinmcp.config import settings
+from odinmcp.store.idempotency import RequestDeduplicator
+
+
+def test_claim_and_release(redis_client):
+    web_1, web_2 = RequestDeduplicator(), RequestDeduplicator()
+    assert web_1.claim("channel", "key")
+    assert not web_1.claim("channel", "key")
+    # a retry reaching another web process
+    assert not web_2.claim("channel", "key")
+    assert web_2.claim("other channel", "key")
+    web_1.release("channel", "key")
+    assert web_2.claim("channel", "key")
+
+
+def test_claim_ttl(redis_client):
+    deduplicator = RequestDeduplicator()
+    deduplicator.claim("channel", "long")
+    deduplicator.claim("channel", "short", ttl=5)
+    ttls = sorted(redis_client.ttl(key) for key in redis_client.keys())
+    assert 0 < ttls[0] <= 5 < ttls[1] <= settings.idempotency_ttl
+
+
+def test_fails_open():
+    deduplicator = RequestDeduplicator(redis.Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.1))
+    assert deduplicator.claim("channel", "key")
+    assert deduplicator.claim("channel", "key")
+    deduplicator.release("channel", "key")
+
+
+def test_disabled(redis_client, monkeypatch):
+    monkeypatch.setattr(settings, "idempotency_enabled", False)
+    deduplicator = RequestDeduplicator()
+    assert deduplicator.claim("channel", "key")
+    assert deduplicator.claim("channel", "key")
+    assert redis_client.keys() == []
+
+
+def test_retried_posts(mcp_app, run_client):
+    @mcp_app.tool()
+    def add(a: int) -> int:
+        return a
+
+    async def main(client):
+        statuses = [(await client.call_tool(request_id, "add", {"a": 1})).status_code for request_id in (1, 1, "1")]
+        assert statuses == [202, 202, 202]
+        # same id, different request: a client that restarted its id counter
+        assert (await client.call_tool(1, "add", {"a": 2})).status_code == 202
+        assert (await client.call_tool(2, "add", {"a": 1}, **{"Idempotency-Key": "k"})).status_code == 202
+        assert (await client.call_tool(3, "add", {"a": 1}, **{"Idempotency-Key": "k"})).status_code == 202
+        mcp_app.failing = True
+        assert (await client.call_tool(4, "add", {"a": 1})).status_code == 500
+        mcp_app.failing = False
+        assert (await client.call_tool(4, "add", {"a": 1})).status_code == 202
+
+    run_client(main)
+    assert mcp_app.enqueued == [(1, {"a": 1}), ("1", {"a": 1}), (1, {"a": 2}), (2, {"a": 1}), (4, {"a": 1})]
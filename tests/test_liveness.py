@@ -0,0 +1,60 @@
+import time
+
+import redis
+
+from odinmcp.config import settings
+from odinmcp.store.liveness import ChannelLiveness
+
+
+def test_closed_channels(redis_client):
+    web, worker = ChannelLiveness(), ChannelLiveness()
+    assert worker.is_alive("a")
+    web.mark_closed("a")
+    assert not web.is_alive("a")
+    # a worker that saw the channel open keeps its answer for channel_liveness_cache_ttl
+    assert worker.is_alive("a")
+    assert not ChannelLiveness().is_alive("a")
+    assert ChannelLiveness().is_alive("b")
+    assert 0 < redis_client.ttl(next(iter(redis_client.keys()))) <= settings.channel_liveness_ttl
+
+
+def test_cache_expires(redis_client, monkeypatch):
+    monkeypatch.setattr(settings, "channel_liveness_cache_ttl", 0.05)
+    worker = ChannelLiveness()
+    assert worker.is_alive("a")
+    ChannelLiveness().mark_closed("a")
+    time.sleep(0.1)
+    assert not worker.is_alive("a")
+
+
+def test_alive_channels_in_one_round_trip(redis_client, monkeypatch):
+    ChannelLiveness().mark_closed("b")
+    ChannelLiveness().mark_closed("d")
+    liveness = ChannelLiveness()
+    assert liveness.is_alive("a")
+    lookups = []
+    mget = redis_client.mget
+    monkeypatch.setattr(redis_client, "mget", lambda keys: lookups.append(len(keys)) or mget(keys))
+    assert liveness.alive_channels(["a", "b", "c", "d"]) == ["a", "c"]
+    # "a" was cached
+    assert lookups == [3]
+    assert liveness.alive_channels(["d", "c"]) == ["c"]
+    assert lookups == [3]
+
+
+def test_fails_open():
+    liveness = ChannelLiveness(redis.Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.1))
+    liveness.mark_closed("a")
+    assert liveness.is_alive("b")
+    assert liveness.alive_channels(["b", "c"]) == ["b", "c"]
+    # closed through this process, whatever redis says
+    assert liveness.alive_channels(["a", "b"]) == ["b"]
+
+
+def test_disabled(redis_client, monkeypatch):
+    monkeypatch.setattr(settings, "channel_liveness_enabled", False)
+    liveness = ChannelLiveness()
+    liveness.mark_closed("a")
+    assert liveness.is_alive("a")
+    assert liveness.alive_channels(["a"]) == ["a"]
+    assert redis_client.keys() == []
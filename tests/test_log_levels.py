@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+import redis
+from mcp.server.models import InitializationOptions
+from mcp.types import ServerCapabilities
+
+from odinmcp.config import settings
+from odinmcp.models.auth import CurrentUser
+from odinmcp.store.log_levels import ChannelLogLevels, get_channel_log_levels, is_enabled
+from odinmcp.worker.session import OdinWorkerSession
+
+
+class RecordingPublisher:
+    def __init__(self):
+        self.events = []
+
+    def publish_event(self, channel_id: str, data: bytes, flush: bool = False) -> None:
+        self.events.append(json.loads(data))
+
+
+@pytest.fixture
+def session(redis_client):
+    session = OdinWorkerSession(
+        "channel",
+        CurrentUser(user_id="user", sid="sid"),
+        InitializationOptions(server_name="test", server_version="1", capabilities=ServerCapabilities()),
+        lambda request_id, current_user, channel_id: "task",
+    )
+    session._publisher = RecordingPublisher()
+    return session
+
+
+def send_logs(session: OdinWorkerSession) -> list:
+    async def main():
+        for level in ("debug", "info", "warning", "error"):
+            await session.send_log_message(level, level)
+
+    asyncio.run(main())
+    return [event["params"]["level"] for event in session._publisher.events]
+
+
+def test_is_enabled():
+    assert is_enabled("debug", None)
+    assert is_enabled("warning", "warning")
+    assert is_enabled("emergency", "warning")
+    assert not is_enabled("info", "warning")
+
+
+def test_levels_are_shared_through_redis(redis_client):
+    web, worker = ChannelLogLevels(), ChannelLogLevels()
+    assert worker.get_level("channel") is None
+    web.set_level("channel", "error")
+    assert web.get_level("channel") == "error"
+    assert ChannelLogLevels().get_level("channel") == "error"
+    assert ChannelLogLevels().get_level("other") is None
+
+
+def test_default_level(redis_client, monkeypatch):
+    monkeypatch.setattr(settings, "log_level_default", "info")
+    levels = ChannelLogLevels()
+    assert levels.get_level("channel") == "info"
+    levels.set_level("channel", "debug")
+    assert levels.get_level("channel") == "debug"
+
+
+def test_fails_open(monkeypatch):
+    monkeypatch.setattr(settings, "log_level_default", "warning")
+    levels = ChannelLogLevels(redis.Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.1))
+    levels.set_level("channel", "debug")
+    assert levels.get_level("channel") == "debug"
+    assert levels.get_level("other") == "warning"
+
+
+def test_session_drops_messages_below_the_level(session):
+    get_channel_log_levels().set_level("channel", "warning")
+    assert send_logs(session) == ["warning", "error"]
+
+
+def test_session_without_a_level(session):
+    assert send_logs(session) == ["debug", "info", "warning", "error"]
+
+
+def test_filter_disabled(session, monkeypatch):
+    monkeypatch.setattr(settings, "log_level_filter_enabled", False)
+    get_channel_log_levels().set_level("channel", "error")
+    assert send_logs(session) == ["debug", "info", "warning", "error"]
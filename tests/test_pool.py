@@ -0,0 +1,32 @@
+import asyncio
+
+import billiard
+import pytest
+
+from odinmcp.worker.pool import EXECUTOR_PROCESS, get_tool_executor, pooled
+
+
+def square(x: int) -> int:
+    return x * x
+
+
+def run_pooled_tool(results) -> None:
+    try:
+        results.put(asyncio.run(pooled(square, EXECUTOR_PROCESS)(x=7)))
+    except BaseException as e:
+        results.put(repr(e))
+    finally:
+        get_tool_executor().shutdown()
+
+
+@pytest.mark.parametrize("daemon", [True, False])
+def test_process_pool_in_billiard_child(daemon):
+    # celery's prefork children are daemonic billiard processes
+    results = billiard.Queue()
+    parent = billiard.Process(target=run_pooled_tool, args=(results,), daemon=daemon)
+    parent.start()
+    try:
+        assert results.get(timeout=30) == 49
+    finally:
+        parent.join(timeout=30)
+    assert parent.exitcode == 0
@@ -0,0 +1,68 @@
+from collections import Counter
+
+import pytest
+
+from odinmcp.config import settings
+from odinmcp.hermod.routing import (
+    ROUTING_MODE_BROADCAST,
+    ROUTING_MODE_HASH,
+    ROUTING_MODE_REGISTRY,
+    HermodRouter,
+    deployment_channel,
+    user_channel,
+)
+
+
+URLS = [f"tcp://hermod-{n}:5560" for n in range(4)]
+CHANNELS = [f"channel-{n}" for n in range(2000)]
+
+
+@pytest.fixture
+def routing_mode(monkeypatch):
+    def set_mode(mode: str) -> None:
+        monkeypatch.setattr(settings, "hermod_routing_mode", mode)
+    return set_mode
+
+
+def test_broadcast(routing_mode):
+    routing_mode(ROUTING_MODE_BROADCAST)
+    assert HermodRouter(URLS).nodes_for("channel") == URLS
+
+
+def test_rendezvous_hashing(routing_mode):
+    routing_mode(ROUTING_MODE_HASH)
+    router = HermodRouter(URLS)
+    owners = {channel: router.nodes_for(channel) for channel in CHANNELS}
+    assert all(len(nodes) == 1 for nodes in owners.values())
+    # stable across routers, whatever the order of the urls
+    assert {channel: HermodRouter(URLS[::-1]).hash_node(channel) for channel in CHANNELS} == {
+        channel: nodes[0] for channel, nodes in owners.items()
+    }
+    load = Counter(nodes[0] for nodes in owners.values())
+    assert set(load) == set(URLS)
+    assert min(load.values()) > len(CHANNELS) / len(URLS) / 2
+    # removing a node only moves the channels it owned
+    smaller = HermodRouter(URLS[:-1])
+    moved = [channel for channel in CHANNELS if smaller.hash_node(channel) != owners[channel][0]]
+    assert moved and all(owners[channel] == [URLS[-1]] for channel in moved)
+
+
+def test_broadcast_groups_reach_every_node(routing_mode):
+    routing_mode(ROUTING_MODE_HASH)
+    router = HermodRouter(URLS)
+    assert router.nodes_for(deployment_channel()) == URLS
+    assert router.nodes_for(user_channel("user@example.com")) == URLS
+
+
+def test_registry(routing_mode, redis_client):
+    routing_mode(ROUTING_MODE_REGISTRY)
+    router = HermodRouter(URLS)
+    assert router.nodes_for("channel") == URLS
+    assert not router.register("channel", "tcp://elsewhere:5560")
+    assert router.register("channel", URLS[2])
+    assert router.nodes_for("channel") == [URLS[2]]
+    # another process finds the route in redis
+    assert HermodRouter(URLS).nodes_for("channel") == [URLS[2]]
+    router.forget("channel")
+    assert router.nodes_for("channel") == URLS
+    assert HermodRouter(URLS).lookup("channel") is None
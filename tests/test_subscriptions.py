@@ -0,0 +1,83 @@
+import json
+import time
+
+import pytest
+import zmq
+
+from odinmcp import OdinMCP
+from odinmcp.hermod import fanout
+from odinmcp.hermod.event_log import HermodEventLog
+from odinmcp.hermod.publisher import HermodPublisher
+from odinmcp.store.liveness import get_channel_liveness
+from odinmcp.store.subscriptions import ResourceSubscriptions, get_resource_subscriptions
+from tests.test_framing import parse_grip_item
+
+
+URI = "data://report"
+
+
+@pytest.fixture
+def hermod(redis_client, monkeypatch):
+    """A socket standing in for pushpin, receiving what the fan out publishes"""
+    receiver = zmq.Context.instance().socket(zmq.XSUB)
+    port = receiver.bind_to_random_port("tcp://127.0.0.1")
+    publisher = HermodPublisher([f"tcp://127.0.0.1:{port}"])
+    publisher.connect()
+    # subscribe to everything, like pushpin. the publisher drops messages until the subscription arrives
+    receiver.send(b"\x01")
+    time.sleep(0.2)
+    monkeypatch.setattr(fanout, "get_hermod_publisher", lambda: publisher)
+    yield receiver
+    receiver.close(linger=0)
+
+
+def receive_items(receiver: zmq.Socket) -> dict:
+    items = {}
+    while receiver.poll(500):
+        channel, item = receiver.recv_multipart()
+        items[channel.decode()] = parse_grip_item(item)
+    return items
+
+
+def test_subscribe_and_unsubscribe(redis_client):
+    subscriptions = ResourceSubscriptions()
+    for channel_id in ("b", "a", "c"):
+        subscriptions.subscribe(URI, channel_id)
+    subscriptions.subscribe("data://other", "a")
+    assert subscriptions.subscribers(URI) == ["a", "b", "c"]
+    subscriptions.unsubscribe(URI, "b")
+    assert subscriptions.subscribers(URI) == ["a", "c"]
+    subscriptions.remove_channel("a")
+    assert subscriptions.subscribers(URI) == ["c"]
+    assert subscriptions.subscribers("data://other") == []
+    # another process reads the same index
+    assert ResourceSubscriptions().subscribers(URI) == ["c"]
+
+
+def test_publish_to_channels_skips_closed_channels(hermod):
+    get_channel_liveness().mark_closed("closed")
+    data = b'{"jsonrpc":"2.0","method":"notifications/resources/updated","params":{"uri":"data://report"}}'
+    assert fanout.publish_to_channels(["a", "closed", "b"], data) == ["a", "b"]
+    items = receive_items(hermod)
+    assert set(items) == {"a", "b"}
+    log = HermodEventLog()
+    for channel_id, item in items.items():
+        latest_id, _ = log.resume(channel_id)
+        # one event per channel, logged with the id its SSE frame carries
+        assert item["id"] == latest_id
+        assert item["formats"]["http-stream"]["content"] == f"id: {latest_id}\nevent: message\ndata: {data.decode()}\n\n"
+    assert fanout.publish_to_channels(["closed"], data) == []
+
+
+def test_notify_resource_updated(hermod):
+    app = OdinMCP("test", "instructions")
+    assert app.notify_resource_updated(URI) == 0
+    get_resource_subscriptions().subscribe(URI, "a")
+    get_resource_subscriptions().subscribe(URI, "b")
+    assert app.notify_resource_updated(URI) == 2
+    items = receive_items(hermod)
+    assert set(items) == {"a", "b"}
+    data = items["a"]["formats"]["http-stream"]["content"].split("data: ", 1)[1]
+    assert json.loads(data) == {
+        "jsonrpc": "2.0", "method": "notifications/resources/updated", "params": {"uri": URI},
+    }
@@ -0,0 +1,76 @@
+import pytest
+from mcp.types import INVALID_PARAMS, JSONRPCRequest
+
+from odinmcp.config import settings
+from odinmcp.web.validation import ToolCallValidator
+
+
+@pytest.fixture
+def validator(mcp_app):
+    @mcp_app.tool()
+    def total(values: list[int], scale: float = 1.0) -> float:
+        return sum(values) * scale
+
+    return ToolCallValidator(mcp_app._tool_manager)
+
+
+def request(method: str = "tools/call", **params) -> JSONRPCRequest:
+    return JSONRPCRequest(jsonrpc="2.0", id=1, method=method, params=params)
+
+
+@pytest.mark.parametrize("arguments", [
+    {"values": [1, 2]},
+    {"values": [1, 2], "scale": 2},
+    # clients that send structured arguments as JSON strings are accepted, as by the worker
+    {"values": "[1, 2]"},
+])
+def test_valid_calls(validator, arguments):
+    assert validator.validate(request(name="total", arguments=arguments)) is None
+
+
+def test_other_methods_pass(validator):
+    assert validator.validate(request("tools/list")) is None
+    assert validator.validate(request("resources/read", uri="data://x")) is None
+
+
+def test_unknown_tool(validator):
+    error = validator.validate(request(name="missing", arguments={}))
+    assert (error.code, error.message) == (INVALID_PARAMS, "Unknown tool: missing")
+
+
+@pytest.mark.parametrize("params", [{}, {"name": 1}, {"name": "total", "arguments": [1]}])
+def test_malformed_params(validator, params):
+    assert validator.validate(request(**params)).code == INVALID_PARAMS
+
+
+@pytest.mark.parametrize("arguments, location", [
+    ({}, ["values"]),
+    ({"values": ["a"]}, ["values", 0]),
+    ({"values": [1], "scale": "big"}, ["scale"]),
+])
+def test_invalid_arguments(validator, arguments, location):
+    error = validator.validate(request(name="total", arguments=arguments))
+    assert error.code == INVALID_PARAMS
+    assert [list(detail["loc"]) for detail in error.data] == [location]
+
+
+def test_rejected_in_the_post_response(mcp_app, run_client, validator):
+    async def main(client):
+        response = await client.call_tool(1, "total", {"values": "nope"})
+        assert response.status_code == 200
+        assert response.json()["error"]["code"] == INVALID_PARAMS
+        assert (await client.call_tool(2, "missing", {})).json()["error"]["message"] == "Unknown tool: missing"
+        assert (await client.call_tool(3, "total", {"values": [1]})).status_code == 202
+
+    run_client(main)
+    assert mcp_app.enqueued == [(3, {"values": [1]})]
+
+
+def test_disabled(mcp_app, run_client, validator, monkeypatch):
+    monkeypatch.setattr(settings, "edge_validation_enabled", False)
+
+    async def main(client):
+        assert (await client.call_tool(1, "missing", {})).status_code == 202
+
+    run_client(main)
+    assert mcp_app.enqueued == [(1, {})]